@@ -0,0 +1,174 @@
+# src/api/admission.py
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being scored."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Deadline-aware, priority-ordered admission gate for the scoring path.
+
+    At most `max_concurrency` requests are scored at once. Others wait in a
+    bounded priority queue (highest priority first, FIFO among equals).
+    A request is shed when the queue is full, when its estimated completion
+    time (queued work ahead of it at the observed service times) exceeds its
+    deadline, or when its deadline expires while waiting. Service time is
+    tracked separately for single rows and, per row, for batches, since
+    per-request overhead dominates single-row scoring.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        Requests scored concurrently.
+    max_queue_depth : int
+        Requests allowed to wait for a slot.
+    ewma_alpha : float, optional
+        Smoothing factor of the per-row service time estimate.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_depth: int, ewma_alpha: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.ewma_alpha = ewma_alpha
+
+        self._in_flight = 0
+        self._waiters = []  # (-priority, seq, rows, future)
+        self._seq = itertools.count()
+        self._service_single = None
+        self._service_per_row = None
+
+        self.admitted = 0
+        self.degraded = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "expired": 0}
+        self.max_observed_depth = 0
+
+    def _estimate(self, rows: int) -> float:
+        single, per_row = self._service_single, self._service_per_row
+        if rows == 1:
+            return single if single is not None else (per_row or 0.0)
+        if per_row is None:
+            return (single or 0.0) * rows
+        return per_row * rows
+
+    def _work_ahead(self, priority: float) -> float:
+        return sum(
+            self._estimate(r) for p, _, r, f in self._waiters if -p >= priority and not f.done()
+        )
+
+    def _reject(self, reason: str):
+        self.shed[reason] += 1
+        retry_after = self._work_ahead(float("-inf")) / self.max_concurrency
+        raise AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, priority: float = 0.0, rows: int = 1, deadline_ms: float = None):
+        """
+        Wait for a scoring slot or raise `AdmissionRejected`.
+        """
+        now = time.monotonic()
+        deadline = None if deadline_ms is None else now + deadline_ms / 1000.0
+
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            if deadline is not None and now + self._estimate(rows) > deadline:
+                self._reject("deadline")
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue_depth:
+            self._reject("queue_full")
+
+        if deadline is not None:
+            wait = self._work_ahead(priority) / self.max_concurrency
+            if now + wait + self._estimate(rows) > deadline:
+                self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), rows, future))
+        self.max_observed_depth = max(self.max_observed_depth, len(self._waiters))
+
+        try:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # The slot was handed over just as the deadline expired.
+                self._release_slot()
+            else:
+                future.cancel()
+            self._discard_cancelled()
+            self._reject("expired")
+        except asyncio.CancelledError:
+            # Client went away; never leave a handed-over slot behind.
+            if future.done():
+                self._release_slot()
+            else:
+                future.cancel()
+            self._discard_cancelled()
+            raise
+
+        self.admitted += 1
+
+    def _discard_cancelled(self):
+        self._waiters = [w for w in self._waiters if not w[3].done()]
+        heapq.heapify(self._waiters)
+
+    def _release_slot(self):
+        while self._waiters:
+            _, _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot directly to the next waiter.
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def release(self, rows: int, service_seconds: float):
+        """
+        Return a slot and update the service time estimate.
+        """
+        if rows == 1:
+            self._service_single = self._ewma(self._service_single, service_seconds)
+        else:
+            self._service_per_row = self._ewma(self._service_per_row, service_seconds / rows)
+        self._release_slot()
+
+    def _ewma(self, current, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.ewma_alpha * (sample - current)
+
+    @asynccontextmanager
+    async def slot(self, priority: float = 0.0, rows: int = 1, deadline_ms: float = None):
+        """
+        Hold a scoring slot for the duration of the block.
+        """
+        await self.acquire(priority, rows, deadline_ms)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(rows, time.perf_counter() - start)
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": sum(1 for w in self._waiters if not w[3].done()),
+            "max_queue_depth": self.max_queue_depth,
+            "max_observed_queue_depth": self.max_observed_depth,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "degraded": self.degraded,
+            "shed": dict(self.shed),
+            "service_ms_single": (self._service_single or 0.0) * 1000,
+            "service_ms_per_batch_row": (self._service_per_row or 0.0) * 1000,
+        }
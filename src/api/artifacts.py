@@ -0,0 +1,75 @@
+# src/api/artifacts.py
+import joblib
+from pathlib import Path
+import logging
+
+from src.data.features import artifact_pipeline
+from .schemas import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent.parent  # Project root
+MODEL_PATH = ROOT / "models" / "final_xgb_with_threshold.joblib"
+SCALER_PATH = ROOT / "models" / "scaler.joblib"
+
+
+def load_artifact_file(path: Path, scaler_path: Path = None) -> dict:
+    """
+    Load one model artifact, handling different saved formats.
+
+    Shared by the API and the offline scoring tools so a given artifact is
+    always scored the same way. Artifacts that bundle neither a feature
+    pipeline nor a scaler use the standalone scaler at `scaler_path`
+    (`SCALER_PATH` for the deployed model) when it exists.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Model file not found: {path}")
+
+    artifact = joblib.load(path)
+    logger.info(f"Loaded model artifact type: {type(artifact)}")
+
+    # Case 1: It's a dict with model and threshold
+    if isinstance(artifact, dict):
+        model = artifact.get("model") or artifact.get("clf") or artifact.get("estimator")
+        threshold = artifact.get("threshold", 0.5)
+        scaler = artifact.get("scaler")
+        pipeline = artifact.get("feature_pipeline")
+        version = artifact.get("model_version")
+        logger.info(f"Extracted model and custom threshold: {threshold}")
+    else:
+        # Case 2: It's the raw model (no threshold wrapper)
+        model, threshold, scaler, pipeline, version = artifact, 0.5, None, None, None
+        logger.info("Loaded raw model, using default threshold 0.5")
+
+    if pipeline is not None:
+        logger.info("Using feature pipeline bundled with the model artifact")
+    elif scaler is not None:
+        logger.info("Using scaler bundled with the model artifact")
+    elif scaler_path is not None and Path(scaler_path).exists():
+        scaler = joblib.load(scaler_path)
+        logger.info(f"Scaler loaded from {scaler_path}")
+    else:
+        logger.info("No scaler found — assuming model doesn't need scaling")
+
+    # Unversioned artifacts are identified by their file name in the audit log
+    artifact = {
+        "model": model,
+        "threshold": float(threshold),
+        "scaler": scaler,
+        "feature_pipeline": pipeline,
+        "model_version": str(version) if version is not None else path.stem,
+    }
+    artifact["transform"] = feature_transform(artifact)
+    return artifact
+
+
+def feature_transform(artifact: dict):
+    """
+    Compile an artifact's feature pipeline into the serving transform.
+
+    Artifacts without a bundled pipeline fall back to an equivalent one
+    built from their scaler; returns None when the model takes raw features.
+    """
+    pipeline = artifact_pipeline(artifact)
+    return None if pipeline is None else pipeline.compile(FEATURE_COLUMNS)
@@ -0,0 +1,181 @@
+# src/api/benchmark.py
+"""
+Compare the HTTP endpoints with the WebSocket scoring channel.
+
+Usage:
+    python -m src.api.benchmark --url http://localhost:8000 -n 2000
+    python -m src.api.benchmark --synthetic-params models/synthetic_params.npz
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from .client import FraudClient
+
+SAMPLE_TRANSACTION = {
+    "Time": 0.0,
+    "V1": -1.359807, "V2": -0.072781, "V3": 2.536347, "V4": 1.378155,
+    "V5": -0.338321, "V6": 0.462388, "V7": 0.239599, "V8": 0.098698,
+    "V9": 0.363787, "V10": 0.090794, "V11": -0.551600, "V12": -0.617801,
+    "V13": -0.991390, "V14": -0.311169, "V15": 1.468177, "V16": -0.470401,
+    "V17": 0.207971, "V18": 0.025791, "V19": 0.403993, "V20": 0.251412,
+    "V21": -0.018307, "V22": 0.277838, "V23": -0.110474, "V24": 0.066928,
+    "V25": 0.128539, "V26": -0.189115, "V27": 0.133558, "V28": -0.021053,
+    "Amount": 149.62,
+}
+
+
+def _summary(name: str, n: int, elapsed: float, latencies_ms) -> dict:
+    latencies_ms = np.asarray(latencies_ms)
+    return {
+        "mode": name,
+        "requests": n,
+        "requests_per_second": n / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def benchmark_http(url: str, transactions: list, concurrency: int = 1) -> dict:
+    """
+    Send one `/predict` request per transaction over keep-alive sessions.
+    """
+    sessions = [requests.Session() for _ in range(concurrency)]
+
+    def run(worker: int):
+        latencies = []
+        for payload in transactions[worker::concurrency]:
+            start = time.perf_counter()
+            sessions[worker].post(f"{url}/predict", json=payload).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [lat for worker in pool.map(run, range(concurrency)) for lat in worker]
+    elapsed = time.perf_counter() - start
+
+    return _summary(f"http x{concurrency}", len(transactions), elapsed, latencies)
+
+
+def benchmark_http_batch(url: str, transactions: list, batch_size: int = 100) -> dict:
+    """
+    Send transactions to `/predict-batch` in fixed-size chunks.
+
+    Latency is reported per chunk.
+    """
+    session = requests.Session()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(transactions), batch_size):
+        t0 = time.perf_counter()
+        session.post(f"{url}/predict-batch", json=transactions[i:i + batch_size]).raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    return _summary(f"http batch {batch_size}", len(transactions), elapsed, latencies)
+
+
+def benchmark_client(url: str, transactions: list, chunk_size: int = 100, concurrency: int = 4) -> dict:
+    """
+    Score all transactions with `FraudClient` (parallel `/predict-batch` chunks).
+
+    With chunks in flight concurrently, the reported latencies are the
+    intervals between chunk completions.
+    """
+    latencies = []
+    last = [time.perf_counter()]
+
+    def on_progress(done, total):
+        now = time.perf_counter()
+        latencies.append((now - last[0]) * 1000)
+        last[0] = now
+
+    with FraudClient(url, chunk_size=chunk_size, max_concurrency=concurrency) as client:
+        start = time.perf_counter()
+        last[0] = start
+        client.predict_batch(transactions, progress=on_progress)
+        elapsed = time.perf_counter() - start
+
+    return _summary(f"client {chunk_size} x{concurrency}", len(transactions), elapsed, latencies)
+
+
+async def _websocket_run(ws_url: str, transactions: list, max_in_flight: int):
+    import websockets
+
+    sent_at = {}
+    latencies = []
+    window = asyncio.Semaphore(max_in_flight)
+
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        async def sender():
+            for i, payload in enumerate(transactions):
+                await window.acquire()
+                sent_at[i] = time.perf_counter()
+                await ws.send(json.dumps({"id": i, "transaction": payload}))
+
+        async def receiver():
+            while len(latencies) < len(transactions):
+                for result in json.loads(await ws.recv()):
+                    if "error" in result:
+                        raise RuntimeError(result["error"])
+                    latencies.append((time.perf_counter() - sent_at.pop(result["id"])) * 1000)
+                    window.release()
+
+        start = time.perf_counter()
+        await asyncio.gather(sender(), receiver())
+        return time.perf_counter() - start, latencies
+
+
+def benchmark_websocket(url: str, transactions: list, max_in_flight: int = 64) -> dict:
+    """
+    Pipeline transactions over one `/ws/predict` connection.
+    """
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://") + "/ws/predict"
+    elapsed, latencies = asyncio.run(_websocket_run(ws_url, transactions, max_in_flight))
+    return _summary(f"websocket in-flight {max_in_flight}", len(transactions), elapsed, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--in-flight", type=int, default=64)
+    parser.add_argument(
+        "--synthetic-params", type=Path,
+        help="Send distinct synthetic transactions instead of repeating SAMPLE_TRANSACTION",
+    )
+    args = parser.parse_args()
+
+    if args.synthetic_params:
+        from src.data.synthetic import generate_transactions, load_synthetic_params
+
+        params = load_synthetic_params(args.synthetic_params)
+        frame = generate_transactions(params, args.requests, include_label=False).astype("float64")
+        transactions = frame.to_dict(orient="records")
+    else:
+        transactions = [SAMPLE_TRANSACTION] * args.requests
+    results = [
+        benchmark_http(args.url, transactions, concurrency=1),
+        benchmark_http(args.url, transactions, concurrency=args.concurrency),
+        benchmark_http_batch(args.url, transactions),
+        benchmark_client(args.url, transactions, concurrency=args.concurrency),
+        benchmark_websocket(args.url, transactions, max_in_flight=args.in_flight),
+    ]
+
+    for r in results:
+        print(
+            f"{r['mode']:<28} {r['requests_per_second']:>9.1f} req/s   "
+            f"p50 {r['p50_ms']:>7.2f} ms   p99 {r['p99_ms']:>7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
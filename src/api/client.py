@@ -0,0 +1,274 @@
+# src/api/client.py
+"""
+Python client for the scoring API.
+
+`FraudClient` keeps a pooled keep-alive session and splits large batches
+into `/predict-batch` sub-requests sent with bounded concurrency, retrying
+transient failures with exponential backoff. `AsyncFraudClient` offers the
+same interface on asyncio, built on `httpx`.
+
+Example:
+    with FraudClient("http://localhost:8000") as client:
+        scores = client.predict_frame(df, progress=lambda done, total: print(done, total))
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from .schemas import FEATURE_COLUMNS
+
+# Responses worth retrying: overload, admission shedding and gateway errors
+RETRY_STATUSES = {429, 502, 503, 504}
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _retry_delay(attempt: int, backoff_factor: float, retry_after: Optional[str]) -> float:
+    """
+    Exponential backoff with full jitter; a server `Retry-After` takes precedence.
+    """
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, backoff_factor * 2 ** attempt)
+
+
+def _chunks(records: list, chunk_size: int) -> list:
+    return [(i, records[i:i + chunk_size]) for i in range(0, len(records), chunk_size)]
+
+
+def _records(df: pd.DataFrame) -> list:
+    """
+    Keep only the model features, in order, so extra CSV columns (e.g. `Class`) are not sent.
+
+    A `transaction_id` column is kept so delayed labels can be joined later.
+    """
+    columns = FEATURE_COLUMNS + (["transaction_id"] if "transaction_id" in df.columns else [])
+    return df[columns].to_dict(orient="records")
+
+
+def _frame(predictions: list, index) -> pd.DataFrame:
+    return pd.DataFrame(predictions, index=index)[["fraud_probability", "is_fraud"]]
+
+
+class FraudClient:
+    """
+    Pooled, batching client for the scoring API.
+
+    Parameters
+    ----------
+    base_url : str
+        API root, e.g. ``http://localhost:8000``.
+    chunk_size : int, optional
+        Transactions per `/predict-batch` sub-request.
+    max_concurrency : int, optional
+        Sub-requests in flight at once; also the connection pool size.
+    max_retries : int, optional
+        Retries per request on connection errors and `RETRY_STATUSES`.
+    backoff_factor : float, optional
+        Base of the exponential backoff, in seconds.
+    timeout : float, optional
+        Per-request timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        chunk_size: int = 1000,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path: str, payload) -> dict:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                time.sleep(_retry_delay(attempt, self.backoff_factor, None))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                time.sleep(_retry_delay(attempt, self.backoff_factor, response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def health(self) -> dict:
+        response = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def predict(self, transaction: dict) -> dict:
+        """
+        Score one transaction with `/predict`.
+        """
+        return self._post("/predict", transaction)
+
+    def cases(self, **params) -> dict:
+        """
+        One page of the case queue; `params` are the `/cases` query parameters.
+        """
+        response = self.session.get(f"{self.base_url}/cases", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def update_cases(self, case_ids: list, status: str, assignee: str = None, note: str = None) -> dict:
+        return self._post("/cases/status", {"case_ids": case_ids, "status": status, "assignee": assignee, "note": note})
+
+    def predict_batch(self, records: list[dict], progress: Optional[ProgressCallback] = None) -> list[dict]:
+        """
+        Score any number of transactions; results keep the input order.
+
+        `progress(done, total)` is called after every completed chunk.
+        """
+        results = [None] * len(records)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {
+                pool.submit(self._post, "/predict-batch", chunk): (start, len(chunk))
+                for start, chunk in _chunks(records, self.chunk_size)
+            }
+            try:
+                for future in as_completed(futures):
+                    start, size = futures[future]
+                    results[start:start + size] = future.result()["predictions"]
+                    done += size
+                    if progress is not None:
+                        progress(done, len(records))
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return results
+
+    def predict_frame(self, df: pd.DataFrame, progress: Optional[ProgressCallback] = None) -> pd.DataFrame:
+        """
+        Score a transaction frame; returns `fraud_probability` and `is_fraud` on the same index.
+        """
+        return _frame(self.predict_batch(_records(df), progress), df.index)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncFraudClient:
+    """
+    Asyncio counterpart of `FraudClient`, built on `httpx.AsyncClient`.
+
+    Parameters are the same as for `FraudClient`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        chunk_size: int = 1000,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30.0,
+    ):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("AsyncFraudClient requires httpx: pip install httpx") from e
+
+        self._httpx = httpx
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    async def _post(self, path: str, payload) -> dict:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.post(path, json=payload)
+            except self._httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt, self.backoff_factor, None))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                await asyncio.sleep(_retry_delay(attempt, self.backoff_factor, response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def health(self) -> dict:
+        response = await self.client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    async def predict(self, transaction: dict) -> dict:
+        return await self._post("/predict", transaction)
+
+    async def predict_batch(self, records: list[dict], progress: Optional[ProgressCallback] = None) -> list[dict]:
+        results = [None] * len(records)
+        done = 0
+        window = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(start: int, chunk: list):
+            nonlocal done
+            async with window:
+                predictions = (await self._post("/predict-batch", chunk))["predictions"]
+            results[start:start + len(chunk)] = predictions
+            done += len(chunk)
+            if progress is not None:
+                progress(done, len(records))
+
+        tasks = [asyncio.create_task(run(start, chunk)) for start, chunk in _chunks(records, self.chunk_size)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return results
+
+    async def predict_frame(self, df: pd.DataFrame, progress: Optional[ProgressCallback] = None) -> pd.DataFrame:
+        return _frame(await self.predict_batch(_records(df), progress), df.index)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
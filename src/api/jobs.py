@@ -0,0 +1,314 @@
+# src/api/jobs.py
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+
+from .admission import AdmissionController, AdmissionRejected
+from .schemas import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# Below every online request (online priority is the transaction amount)
+JOB_PRIORITY = -1.0
+ACTIVE_STATUSES = ("queued", "preparing", "running")
+RESULT_SCHEMA = pa.schema([("row", pa.int64()), ("fraud_probability", pa.float64()), ("is_fraud", pa.bool_())])
+# Upload bytes gathered before each write in the threadpool
+UPLOAD_WRITE_BYTES = 1024 ** 2
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+def _write_json(path: Path, payload: dict):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload))
+    os.replace(tmp, path)
+
+
+def _prepare_input(upload: Path, fmt: str, output: Path, chunk_size: int):
+    """
+    Convert an upload into parquet with exactly one row group per chunk.
+    """
+    if fmt == "csv":
+        batches = pacsv.open_csv(upload)
+    else:
+        batches = pq.ParquetFile(upload).iter_batches(batch_size=chunk_size)
+
+    schema = pa.schema([(name, pa.float64()) for name in FEATURE_COLUMNS])
+    pending, pending_rows = [], 0
+    with pq.ParquetWriter(output, schema) as writer:
+        def flush(table: pa.Table):
+            writer.write_table(table, row_group_size=chunk_size)
+
+        for batch in batches:
+            missing = set(FEATURE_COLUMNS) - set(batch.schema.names)
+            if missing:
+                raise ValueError(f"Missing columns: {sorted(missing)}")
+            batch = pa.Table.from_batches([batch]).select(FEATURE_COLUMNS).cast(schema)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= chunk_size:
+                table = pa.concat_tables(pending)
+                flush(table.slice(0, chunk_size))
+                rest = table.slice(chunk_size)
+                pending, pending_rows = [rest], rest.num_rows
+        if pending_rows:
+            flush(pa.concat_tables(pending))
+
+
+class BatchJobManager:
+    """
+    Persistent, resumable batch scoring jobs.
+
+    Each job lives in its own directory: the upload, the input converted to
+    parquet with one row group per chunk, `job.json` with its state, and
+    one result file per scored chunk. A chunk's result is written under a
+    temporary name and renamed, so its presence marks the chunk as done;
+    on startup unfinished jobs resume and only missing chunks are scored.
+
+    Chunks of all jobs share `max_concurrency` slots and enter the online
+    admission queue at `JOB_PRIORITY`, below every online request, so jobs
+    use spare capacity instead of starving interactive traffic.
+
+    Parameters
+    ----------
+    jobs_dir : pathlib.Path
+        Root directory of job state.
+    score_fn : callable
+        `score_fn(frame) -> (probabilities, is_fraud)`, run in the threadpool.
+    admission : AdmissionController
+        The online admission gate.
+    max_concurrency : int, optional
+        Job chunks scored at once across all jobs.
+    chunk_size : int, optional
+        Rows per chunk.
+    max_upload_bytes : int, optional
+        Largest accepted upload; larger ones raise `UploadTooLarge`.
+    """
+
+    def __init__(
+        self,
+        jobs_dir: Path,
+        score_fn,
+        admission: AdmissionController,
+        max_concurrency: int = 1,
+        chunk_size: int = 10_000,
+        max_upload_bytes: int = 1024 ** 3,
+    ):
+        self.jobs_dir = Path(jobs_dir)
+        self.score_fn = score_fn
+        self.admission = admission
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self.max_upload_bytes = max_upload_bytes
+        self._slots = None
+        self._tasks = {}
+
+    def _dir(self, job_id: str) -> Path:
+        if not JOB_ID_PATTERN.match(job_id):
+            raise KeyError(job_id)
+        return self.jobs_dir / job_id
+
+    def _save(self, job: dict):
+        _write_json(self._dir(job["job_id"]) / "job.json", job)
+
+    def _load(self, job_id: str) -> dict:
+        path = self._dir(job_id) / "job.json"
+        if not path.exists():
+            raise KeyError(job_id)
+        return json.loads(path.read_text())
+
+    def get(self, job_id: str) -> dict:
+        """
+        Return the job state with its progress, or raise `KeyError`.
+        """
+        job = self._load(job_id)
+        if job["status"] == "completed":
+            job["progress"] = 1.0
+        elif job.get("n_chunks"):
+            done = self._done_chunks(job_id)
+            job["chunks_done"] = len(done)
+            job["progress"] = len(done) / job["n_chunks"]
+        return job
+
+    def _done_chunks(self, job_id: str) -> set:
+        chunk_dir = self._dir(job_id) / "chunks"
+        if not chunk_dir.exists():
+            return set()
+        return {int(p.stem) for p in chunk_dir.glob("*.parquet")}
+
+    async def submit(self, stream, fmt: str) -> dict:
+        """
+        Persist an uploaded file from an async byte stream and queue its job.
+
+        Disk writes run in the threadpool, so a large upload never blocks
+        the event loop; one over `max_upload_bytes` is discarded.
+        """
+        if fmt not in ("csv", "parquet"):
+            raise ValueError("format must be 'csv' or 'parquet'")
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        await run_in_threadpool(job_dir.mkdir, parents=True)
+        try:
+            await self._write_upload(stream, job_dir / f"upload.{fmt}")
+        except BaseException:
+            await run_in_threadpool(shutil.rmtree, job_dir, ignore_errors=True)
+            raise
+
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "format": fmt,
+            "chunk_size": self.chunk_size,
+            "created_at": time.time(),
+        }
+        self._save(job)
+        self._launch(job_id)
+        return job
+
+    async def _write_upload(self, stream, path: Path):
+        size, written, buffered = 0, 0, []
+        with await run_in_threadpool(open, path, "wb") as f:
+            async for data in stream:
+                size += len(data)
+                if size > self.max_upload_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {self.max_upload_bytes} bytes")
+                buffered.append(data)
+                if size - written >= UPLOAD_WRITE_BYTES:
+                    await run_in_threadpool(f.write, b"".join(buffered))
+                    written, buffered = size, []
+            if buffered:
+                await run_in_threadpool(f.write, b"".join(buffered))
+
+    def _launch(self, job_id: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def resume(self):
+        """
+        Restart every job left unfinished by a previous process.
+        """
+        if not self.jobs_dir.exists():
+            return
+        for state in self.jobs_dir.glob("*/job.json"):
+            job = json.loads(state.read_text())
+            if job["status"] in ACTIVE_STATUSES and job["job_id"] not in self._tasks:
+                logger.info(f"Resuming batch job {job['job_id']}")
+                self._launch(job["job_id"])
+
+    async def stop(self):
+        """
+        Cancel running jobs; they resume from their finished chunks on the next start.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job_id: str):
+        job_dir = self._dir(job_id)
+        # Pre-fork workers share the jobs directory; only one may run a job
+        with await run_in_threadpool(open, job_dir / "lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            await self._run_locked(job_id, job_dir)
+
+    async def _run_locked(self, job_id: str, job_dir: Path):
+        job = self._load(job_id)
+        if job["status"] not in ACTIVE_STATUSES:
+            return
+        try:
+            input_path = job_dir / "input.parquet"
+            upload = job_dir / f"upload.{job['format']}"
+            if not input_path.exists():
+                job["status"] = "preparing"
+                self._save(job)
+                tmp = job_dir / "input.parquet.tmp"
+                await run_in_threadpool(_prepare_input, upload, job["format"], tmp, job["chunk_size"])
+                os.replace(tmp, input_path)
+            upload.unlink(missing_ok=True)
+
+            metadata = pq.ParquetFile(input_path).metadata
+            job["n_rows"], job["n_chunks"] = metadata.num_rows, metadata.num_row_groups
+            job["status"] = "running"
+            self._save(job)
+            (job_dir / "chunks").mkdir(exist_ok=True)
+
+            pending = sorted(set(range(job["n_chunks"])) - self._done_chunks(job_id))
+            await asyncio.gather(
+                *(self._score_chunk(job_dir, input_path, i, job["chunk_size"]) for i in pending)
+            )
+
+            await run_in_threadpool(self._merge_results, job_dir, job["n_chunks"])
+            job.update(status="completed", completed_at=time.time())
+            self._save(job)
+            logger.info(f"Batch job {job_id} completed ({job['n_rows']} rows)")
+        except asyncio.CancelledError:
+            # State on disk is consistent; the job resumes on the next start
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job_id} failed: {e}")
+            job.update(status="failed", error=str(e))
+            self._save(job)
+
+    async def _score_chunk(self, job_dir: Path, input_path: Path, index: int, chunk_size: int):
+        async with self._slots:
+            while True:
+                try:
+                    async with self.admission.slot(priority=JOB_PRIORITY, rows=chunk_size):
+                        await run_in_threadpool(self._score_chunk_sync, job_dir, input_path, index, chunk_size)
+                    return
+                except AdmissionRejected as e:
+                    await asyncio.sleep(max(e.retry_after, 0.1))
+
+    def _score_chunk_sync(self, job_dir: Path, input_path: Path, index: int, chunk_size: int):
+        frame = pq.ParquetFile(input_path).read_row_group(index).to_pandas()
+        start_row = index * chunk_size
+        probs, flags = self.score_fn(frame)
+        result = pa.table({
+            "row": pa.array(range(start_row, start_row + len(frame)), type=pa.int64()),
+            "fraud_probability": pa.array(probs, type=pa.float64()),
+            "is_fraud": pa.array(flags, type=pa.bool_()),
+        }, schema=RESULT_SCHEMA)
+        path = job_dir / "chunks" / f"{index:06d}.parquet"
+        tmp = path.with_name(f".{path.name}.tmp")
+        pq.write_table(result, tmp)
+        os.replace(tmp, path)
+
+    def _merge_results(self, job_dir: Path, n_chunks: int):
+        tmp = job_dir / "result.parquet.tmp"
+        chunk_dir = job_dir / "chunks"
+        with pq.ParquetWriter(tmp, RESULT_SCHEMA) as writer:
+            for i in range(n_chunks):
+                writer.write_table(pq.read_table(chunk_dir / f"{i:06d}.parquet"))
+        os.replace(tmp, job_dir / "result.parquet")
+        shutil.rmtree(chunk_dir)
+
+    def result_path(self, job_id: str) -> Path:
+        """
+        Path of a completed job's results, or raise `KeyError` / `RuntimeError`.
+        """
+        job = self.get(job_id)
+        if job["status"] != "completed":
+            raise RuntimeError(f"Job is {job['status']}")
+        return self._dir(job_id) / "result.parquet"
@@ -1,11 +1,31 @@
 # src/api/main.py
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-import pandas as pd
-import numpy as np  # Add this
-from .schemas import Transaction, PredictionResponse, BatchPredictionResponse
-from .utils import MODEL, THRESHOLD, SCALER  # Import the loaded globals
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from .schemas import Transaction, PredictionResponse, BatchPredictionResponse, FeedbackLabel, CaseUpdate
+from .utils import (  # Import the loaded globals
+    THRESHOLD, DRIFT_MONITOR, AUDIT_LOG, MODEL_ROUTER, ANOMALY_DETECTOR, RULE_ENGINE, FEEDBACK_STORE, CASE_STORE,
+    ADMISSION_DEFAULT_DEADLINE_MS,
+    PROFILER_ADMIN_TOKEN, PROFILE_OUTPUT_DIR, PROFILE_MAX_SECONDS,
+    BATCH_JOBS_DIR, BATCH_JOB_MAX_CONCURRENCY, BATCH_JOB_CHUNK_SIZE, BATCH_JOB_MAX_UPLOAD_BYTES,
+)
+from .admission import AdmissionRejected
+from .jobs import BatchJobManager, UploadTooLarge
+from .scoring import ADMISSION, Scored, score_frame, score_routed, score_degraded
+from .streaming import serve_scoring_channel
+from src.utils.profiling import SamplingProfiler
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import asyncio
+import functools
+import hmac
+import io
 import logging
+import math
+import os
+import random
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,73 +36,337 @@ app = FastAPI(
     version="1.0.0"
 )
 
+JOBS = BatchJobManager(
+    BATCH_JOBS_DIR,
+    score_fn=score_frame,
+    admission=ADMISSION,
+    max_concurrency=BATCH_JOB_MAX_CONCURRENCY,
+    chunk_size=BATCH_JOB_CHUNK_SIZE,
+    max_upload_bytes=BATCH_JOB_MAX_UPLOAD_BYTES,
+)
+
+# Active profiling session, if any; only read on the request path
+PROFILER: Optional[SamplingProfiler] = None
+PROFILE_TAG_FRACTION = 0.0
+
 @app.on_event("startup")
 async def startup_event():
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.start()
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.start()
+    if FEEDBACK_STORE is not None:
+        FEEDBACK_STORE.start()
+    if CASE_STORE is not None:
+        CASE_STORE.start()
+    JOBS.resume()
     logger.info("API startup complete - ready for predictions")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await JOBS.stop()
+    if DRIFT_MONITOR is not None:
+        DRIFT_MONITOR.stop()
+    if AUDIT_LOG is not None:
+        # Flushes buffered decisions and closes the current file
+        AUDIT_LOG.stop()
+    if FEEDBACK_STORE is not None:
+        FEEDBACK_STORE.stop()
+    if CASE_STORE is not None:
+        CASE_STORE.stop()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "model_threshold": THRESHOLD}
 
-@app.post("/predict", response_model=PredictionResponse)
-async def predict(transaction: Transaction):
+@app.get("/drift")
+async def drift_report():
+    if DRIFT_MONITOR is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is not configured")
+
+    snapshot = DRIFT_MONITOR.snapshot()
+    if snapshot is None:
+        return {"status": "pending", "interval_seconds": DRIFT_MONITOR.interval_seconds}
+    return snapshot
+
+def _deadline_ms(header_value: Optional[float]) -> Optional[float]:
+    if header_value is not None:
+        return header_value
+    return ADMISSION_DEFAULT_DEADLINE_MS or None
+
+async def _shed(error: AdmissionRejected, records: list[dict]):
+    """Answer a shed request from the degraded fast path, or reject it."""
+    # Inference and rules stay off the event loop, which is busiest exactly now
+    degraded = await run_in_threadpool(score_degraded, records)
+    if degraded is None:
+        raise HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+        )
+    ADMISSION.degraded += 1
+    return degraded
+
+def _profiler_for(x_profile: Optional[str]) -> Optional[SamplingProfiler]:
+    """Return the tagged-mode profiler if this request should be sampled."""
+    profiler = PROFILER
+    if profiler is None or not profiler.tagged_only:
+        return None
+    if x_profile or random.random() < PROFILE_TAG_FRACTION:
+        return profiler
+    return None
+
+async def _score_admitted(
+    records: list[dict],
+    priority: float,
+    deadline_ms: Optional[float],
+    profiler: Optional[SamplingProfiler] = None,
+    route_key: Optional[str] = None,
+):
+    """Score records under admission control; returns the scored rows and a message."""
+    score = score_routed if profiler is None else functools.partial(profiler.run_tagged, score_routed)
     try:
-        df = pd.DataFrame([transaction.dict()])
+        async with ADMISSION.slot(priority=priority, rows=len(records), deadline_ms=deadline_ms):
+            scored = await run_in_threadpool(score, records, route_key)
+        return scored, None
+    except AdmissionRejected as e:
+        return await _shed(e, records), f"Degraded fast-path decision ({e.reason})"
+
+def _responses(scored: Scored, message: Optional[str]) -> list[PredictionResponse]:
+    n = len(scored.probs)
+    anomaly = [None] * n if scored.anomaly is None else scored.anomaly
+    rules = [None] * n if scored.rule is None else scored.rule
+    results = []
+    for prob, flag, score, rule in zip(scored.probs, scored.flags, anomaly, rules):
+        response = PredictionResponse(
+            fraud_probability=round(float(prob), 4),
+            is_fraud=bool(flag),
+            anomaly_score=None if score is None else round(float(score), 4),
+            rule=rule,
+        )
+        if message:
+            response.message = message
+        results.append(response)
+    return results
+
+@app.get("/metrics")
+async def metrics():
+    report = {"admission": ADMISSION.metrics()}
+    if AUDIT_LOG is not None:
+        report["audit"] = AUDIT_LOG.metrics()
+    if MODEL_ROUTER is not None:
+        report["model_cache"] = MODEL_ROUTER.cache.metrics()
+    if ANOMALY_DETECTOR is not None:
+        report["anomaly"] = ANOMALY_DETECTOR.metrics()
+    if RULE_ENGINE is not None:
+        report["rules"] = RULE_ENGINE.metrics()
+    if FEEDBACK_STORE is not None:
+        report["feedback"] = FEEDBACK_STORE.metrics()
+    if CASE_STORE is not None:
+        report["cases"] = CASE_STORE.metrics()
+    return report
+
+@app.post("/admin/profile")
+async def capture_profile(
+    seconds: float = 10.0,
+    mode: str = "all",
+    tag_fraction: float = 0.0,
+    interval_ms: float = 5.0,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Sample this worker's stacks for `seconds` and write collapsed stacks to disk.
 
-        # Apply scaling if scaler exists
-        if SCALER is not None:
-            df = pd.DataFrame(SCALER.transform(df), columns=df.columns)
+    In `tagged` mode only the scoring of requests sent with an `X-Profile`
+    header, plus a random `tag_fraction` of the others, is sampled.
+    """
+    global PROFILER, PROFILE_TAG_FRACTION
 
-        # Predict probability
-        if hasattr(MODEL, "predict_proba"):
-            prob = float(MODEL.predict_proba(df)[0][1])
-        else:
-            raise AttributeError("Model does not support predict_proba")
+    if not PROFILER_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not hmac.compare_digest(x_admin_token or "", PROFILER_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if mode not in ("all", "tagged"):
+        raise HTTPException(status_code=400, detail="mode must be 'all' or 'tagged'")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if PROFILER is not None:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
 
-        is_fraud = prob >= THRESHOLD
+    profiler = SamplingProfiler(interval=interval_ms / 1000, tagged_only=mode == "tagged")
+    PROFILER, PROFILE_TAG_FRACTION = profiler, tag_fraction
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        PROFILER, PROFILE_TAG_FRACTION = None, 0.0
+
+    name = f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{mode}.collapsed"
+    path = await run_in_threadpool(profiler.write_collapsed, PROFILE_OUTPUT_DIR / name)
+    logger.info(f"Profile with {profiler.samples} samples written to {path}")
+    return {"path": str(path), **profiler.summary()}
 
-        return PredictionResponse(
-            fraud_probability=round(prob, 4),
-            is_fraud=is_fraud
+@app.post("/predict", response_model=PredictionResponse)
+async def predict(
+    transaction: Transaction,
+    x_request_deadline_ms: Optional[float] = Header(None),
+    x_profile: Optional[str] = Header(None),
+    x_route_key: Optional[str] = Header(None),
+):
+    try:
+        scored, message = await _score_admitted(
+            [transaction.dict()],
+            priority=transaction.Amount,
+            deadline_ms=_deadline_ms(x_request_deadline_ms),
+            profiler=_profiler_for(x_profile),
+            route_key=x_route_key,
         )
+        return _responses(scored, message)[0]
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.post("/predict-batch", response_model=BatchPredictionResponse)
-async def predict_batch(transactions: list[Transaction]):
+async def predict_batch(
+    transactions: list[Transaction],
+    x_request_deadline_ms: Optional[float] = Header(None),
+    x_profile: Optional[str] = Header(None),
+    x_route_key: Optional[str] = Header(None),
+):
     try:
         if not transactions:
             raise HTTPException(status_code=400, detail="Empty transaction list")
 
-        # Convert list of transactions to DataFrame
-        df = pd.DataFrame([t.dict() for t in transactions])
+        # Batches are prioritized by their largest transaction
+        scored, message = await _score_admitted(
+            [t.dict() for t in transactions],
+            priority=max(t.Amount for t in transactions),
+            deadline_ms=_deadline_ms(x_request_deadline_ms),
+            profiler=_profiler_for(x_profile),
+            route_key=x_route_key,
+        )
+        return BatchPredictionResponse(predictions=_responses(scored, message))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
 
-        # Apply scaling if scaler exists
-        if SCALER is not None:
-            df = pd.DataFrame(SCALER.transform(df), columns=df.columns)
+@app.post("/feedback")
+async def ingest_feedback(labels: list[FeedbackLabel]):
+    """Join delayed labels (e.g. chargebacks) to logged predictions by transaction ID."""
+    if FEEDBACK_STORE is None:
+        raise HTTPException(status_code=404, detail="Feedback evaluation is not configured")
+    if not labels:
+        raise HTTPException(status_code=400, detail="Empty label list")
+    try:
+        return await run_in_threadpool(
+            FEEDBACK_STORE.ingest_labels,
+            [item.transaction_id for item in labels],
+            [item.label for item in labels],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Predict probabilities
-        if hasattr(MODEL, "predict_proba"):
-            probs = MODEL.predict_proba(df)[:, 1]
-        else:
-            raise AttributeError("Model does not support predict_proba")
+@app.get("/feedback/metrics")
+async def feedback_metrics(window_hours: float = 168.0):
+    """Precision, recall, F1 and ROC AUC of labeled predictions scored in the last `window_hours`."""
+    if FEEDBACK_STORE is None:
+        raise HTTPException(status_code=404, detail="Feedback evaluation is not configured")
+    return await run_in_threadpool(FEEDBACK_STORE.rolling_metrics, window_hours * 3600)
 
-        # Apply threshold to get binary predictions
-        predictions = probs >= THRESHOLD
+def _case_store():
+    if CASE_STORE is None:
+        raise HTTPException(status_code=404, detail="The case queue is not configured")
+    return CASE_STORE
 
-        # Build response list
-        results = [
-            PredictionResponse(
-                fraud_probability=round(float(prob), 4),
-                is_fraud=bool(pred)
-            )
-            for prob, pred in zip(probs, predictions)
-        ]
+@app.get("/cases")
+async def list_cases(
+    status: Optional[str] = None,
+    sort: str = "created_at",
+    descending: bool = True,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """One page of flagged-transaction cases; pass `next_cursor` back to get the next page."""
+    store = _case_store()
+    try:
+        page = await run_in_threadpool(store.query, status, sort, descending, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"counts": await run_in_threadpool(store.counts), **page}
 
-        return BatchPredictionResponse(predictions=results)
+@app.get("/cases/{case_id}")
+async def get_case(case_id: int):
+    try:
+        return await run_in_threadpool(_case_store().get, case_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Case not found")
 
-    except Exception as e:
-        logger.error(f"Batch prediction error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
\ No newline at end of file
+@app.post("/cases/status")
+async def update_cases(update: CaseUpdate):
+    """Move cases to a new status, e.g. after review."""
+    store = _case_store()
+    try:
+        updated = await run_in_threadpool(
+            store.update_status, update.case_ids, update.status, update.assignee, update.note
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"updated": updated}
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request, format: str = "csv"):
+    """Upload a CSV or parquet file as the raw request body and queue it for scoring."""
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > JOBS.max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {JOBS.max_upload_bytes} bytes")
+    try:
+        job = await JOBS.submit(request.stream(), format)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    try:
+        return JOBS.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+def _csv_chunks(path):
+    """Stream a parquet result as CSV, one row group at a time."""
+    parquet = pq.ParquetFile(path)
+    for i in range(parquet.num_row_groups):
+        buffer = io.BytesIO()
+        options = pacsv.WriteOptions(include_header=i == 0)
+        pacsv.write_csv(parquet.read_row_group(i), buffer, write_options=options)
+        yield buffer.getvalue()
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, format: str = "parquet"):
+    try:
+        path = JOBS.result_path(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "csv":
+        return StreamingResponse(
+            _csv_chunks(path),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{job_id}.csv"'},
+        )
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{job_id}.parquet")
+
+@app.websocket("/ws/predict")
+async def predict_stream(websocket: WebSocket):
+    await serve_scoring_channel(websocket)
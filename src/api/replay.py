@@ -0,0 +1,251 @@
+# src/api/replay.py
+"""
+Replay historical transactions through the scoring path.
+
+Rows are released at their recorded `Time` offsets divided by `--speed`
+(or as fast as possible with `--asap`), scored in-process or against a
+running API, and summarized as throughput, latency percentiles and alert
+volume per window of event time.
+
+Usage:
+    python -m src.api.replay data/processed/test.parquet --speed 100
+    python -m src.api.replay data/processed/test.parquet --asap --url http://localhost:8000
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data.load import iter_credit_card_batches
+
+from .artifacts import SCALER_PATH, load_artifact_file
+from .schemas import FEATURE_COLUMNS
+
+# Maps a frame of FEATURE_COLUMNS to (probabilities, is_fraud flags)
+Scorer = Callable[[pd.DataFrame], tuple]
+
+
+def deployed_scorer(threshold: Optional[float] = None) -> Scorer:
+    """
+    Score in-process with the deployed artifact, as `/predict` does.
+
+    Screening rules apply; a `threshold` override re-thresholds the
+    resulting probabilities, so `flag` rules then no longer force alerts.
+    """
+    from .scoring import score_frame
+
+    def score(batch: pd.DataFrame):
+        probs, flags = score_frame(batch)
+        return probs, flags if threshold is None else probs >= threshold
+
+    return score
+
+
+def artifact_scorer(artifact_path: Path, threshold: Optional[float] = None) -> Scorer:
+    """
+    Score in-process with a candidate artifact, using its feature pipeline (or the API scaler) and threshold.
+    """
+    artifact = load_artifact_file(Path(artifact_path), scaler_path=SCALER_PATH)
+    model, transform = artifact["model"], artifact["transform"]
+    threshold = artifact["threshold"] if threshold is None else threshold
+
+    def score(batch: pd.DataFrame):
+        X = batch[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        if transform is not None:
+            X = transform(X)
+        probs = model.predict_proba(X)[:, 1]
+        return probs, probs >= threshold
+
+    return score
+
+
+def api_scorer(url: str, threshold: Optional[float] = None, chunk_size: int = 1000) -> Scorer:
+    """
+    Score against a running API; `threshold` re-thresholds the returned probabilities.
+    """
+    from .client import FraudClient
+
+    client = FraudClient(url, chunk_size=chunk_size, max_concurrency=1)
+
+    def score(batch: pd.DataFrame):
+        if len(batch) == 1:
+            predictions = [client.predict(batch.iloc[0].to_dict())]
+        else:
+            predictions = client.predict_batch(batch.to_dict(orient="records"))
+        probs = np.array([p["fraud_probability"] for p in predictions])
+        if threshold is not None:
+            return probs, probs >= threshold
+        return probs, np.array([p["is_fraud"] for p in predictions])
+
+    return score
+
+
+def replay(
+    path: Path,
+    scorer: Scorer,
+    speed: Optional[float] = 1.0,
+    max_batch: int = 1000,
+    concurrency: int = 4,
+    window_seconds: float = 3600.0,
+    filters=None,
+) -> dict:
+    """
+    Stream a parquet dataset through `scorer` following its `Time` column.
+
+    Every row is due at `(Time - Time[0]) / speed` seconds after the start
+    (immediately when `speed` is None). Rows already due are scored together
+    in batches of at most `max_batch`, with up to `concurrency` batches in
+    flight; the dispatcher blocks beyond that, so a scorer that cannot keep
+    up shows as growing latency rather than unbounded memory. Latency is
+    measured from a row's due time to its result, so queueing is included.
+
+    Returns
+    -------
+    dict
+        Summary statistics and a `timeline` frame with transactions, alerts
+        and p99 latency per `window_seconds` of event time.
+    """
+    in_flight = threading.Semaphore(concurrency)
+    lock = threading.Lock()
+    results = []  # (event_time, due, done, flags) per batch
+    errors = []
+
+    def run(batch: pd.DataFrame, due: np.ndarray):
+        try:
+            _, flags = scorer(batch)
+            done = time.perf_counter() - start
+            with lock:
+                results.append((batch["Time"].to_numpy(), due, done, np.asarray(flags, dtype=bool)))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            in_flight.release()
+
+    t0 = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for chunk in iter_credit_card_batches(path, columns=FEATURE_COLUMNS, filters=filters):
+            chunk = chunk[FEATURE_COLUMNS].reset_index(drop=True)
+            times = chunk["Time"].to_numpy()
+            if t0 is None and len(times):
+                t0 = times[0]
+            due = np.zeros(len(chunk)) if speed is None else (times - t0) / speed
+
+            i = 0
+            while i < len(chunk) and not errors:
+                now = time.perf_counter() - start
+                if due[i] > now:
+                    time.sleep(due[i] - now)
+                    now = time.perf_counter() - start
+                j = min(max(np.searchsorted(due, now, side="right"), i + 1), i + max_batch)
+                in_flight.acquire()
+                pool.submit(run, chunk.iloc[i:j], due[i:j])
+                i = j
+            if errors:
+                break
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    return _replay_report(results, elapsed, speed, window_seconds)
+
+
+def _replay_report(results: list, elapsed: float, speed: Optional[float], window_seconds: float) -> dict:
+    if not results:
+        raise ValueError("No rows were replayed")
+
+    event_time = np.concatenate([r[0] for r in results])
+    latency_ms = np.concatenate([(r[2] - r[1]) * 1000 for r in results])
+    flags = np.concatenate([r[3] for r in results])
+
+    order = np.argsort(event_time, kind="stable")
+    event_time, latency_ms, flags = event_time[order], latency_ms[order], flags[order]
+
+    window = np.floor((event_time - event_time[0]) / window_seconds).astype(np.int64)
+    timeline = (
+        pd.DataFrame({"window": window, "alerts": flags, "latency_ms": latency_ms})
+        .groupby("window")
+        .agg(
+            transactions=("alerts", "size"),
+            alerts=("alerts", "sum"),
+            p99_ms=("latency_ms", lambda x: np.percentile(x, 99)),
+        )
+    )
+    timeline.index = event_time[0] + timeline.index * window_seconds
+    timeline.index.name = "window_start"
+    timeline["alert_rate"] = timeline["alerts"] / timeline["transactions"]
+
+    span = event_time[-1] - event_time[0]
+    return {
+        "rows": len(event_time),
+        "speed": speed,
+        "elapsed_seconds": elapsed,
+        "offered_rows_per_second": len(event_time) * speed / span if speed and span > 0 else None,
+        "rows_per_second": len(event_time) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(latency_ms, 50)),
+            "p95": float(np.percentile(latency_ms, 95)),
+            "p99": float(np.percentile(latency_ms, 99)),
+            "max": float(latency_ms.max()),
+        },
+        "alerts": int(flags.sum()),
+        "alert_rate": float(flags.mean()),
+        "timeline": timeline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", type=Path, help="Parquet file or directory with FEATURE_COLUMNS")
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1.0, help="Multiple of real time")
+    pace.add_argument("--asap", action="store_true", help="Ignore arrival gaps")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Score against a running API instead of in-process")
+    target.add_argument("--artifact", type=Path, help="Candidate model artifact to score in-process")
+    parser.add_argument("--threshold", type=float, help="Override the decision threshold")
+    parser.add_argument("--max-batch", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--window", type=float, default=3600.0, help="Timeline window in event seconds")
+    parser.add_argument("--timeline-output", type=Path, help="Write the timeline as CSV")
+    args = parser.parse_args()
+
+    if args.url:
+        scorer = api_scorer(args.url, args.threshold)
+    elif args.artifact:
+        scorer = artifact_scorer(args.artifact, args.threshold)
+    else:
+        scorer = deployed_scorer(args.threshold)
+
+    report = replay(
+        args.data,
+        scorer,
+        speed=None if args.asap else args.speed,
+        max_batch=args.max_batch,
+        concurrency=args.concurrency,
+        window_seconds=args.window,
+    )
+
+    latency = report["latency_ms"]
+    print(f"Replayed {report['rows']} rows in {report['elapsed_seconds']:.1f} s")
+    if report["offered_rows_per_second"] is not None:
+        print(f"Offered load:       {report['offered_rows_per_second']:.1f} rows/s")
+    print(f"Sustained:          {report['rows_per_second']:.1f} rows/s")
+    print(
+        f"Latency (ms):       p50 {latency['p50']:.2f}   p95 {latency['p95']:.2f}   "
+        f"p99 {latency['p99']:.2f}   max {latency['max']:.2f}"
+    )
+    print(f"Alerts:             {report['alerts']} ({report['alert_rate']:.4%})")
+    print(report["timeline"].to_string())
+
+    if args.timeline_output:
+        report["timeline"].to_csv(args.timeline_output)
+
+
+if __name__ == "__main__":
+    main()
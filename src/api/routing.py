@@ -0,0 +1,150 @@
+# src/api/routing.py
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    """
+    Memory-bounded LRU cache of loaded model artifacts with single-flight loading.
+
+    Concurrent misses on the same artifact wait for one load instead of
+    each reading it from disk. When the cached total exceeds `max_bytes`,
+    least recently used artifacts are evicted (the most recent one is
+    always kept). Sizes are estimated from the artifact file size, which
+    tracks the unpickled size closely for tree ensembles.
+
+    Parameters
+    ----------
+    loader : callable
+        `loader(path) -> artifact dict`.
+    max_bytes : int
+        Budget for all cached artifacts.
+    """
+
+    def __init__(self, loader, max_bytes: int):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (artifact, nbytes)
+        self._loading = {}  # path -> Future
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _stat(self, path: Path) -> dict:
+        return self._stats.setdefault(path.name, {
+            "hits": 0, "misses": 0, "coalesced": 0, "loads": 0, "evictions": 0,
+            "load_seconds_total": 0.0, "load_seconds_last": None,
+        })
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, path: Path) -> dict:
+        """
+        Return the artifact at `path`, loading it at most once at a time.
+        """
+        path = Path(path)
+        with self._lock:
+            stat = self._stat(path)
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+                stat["hits"] += 1
+                return entry[0]
+
+            future = self._loading.get(path)
+            owner = future is None
+            if owner:
+                future = self._loading[path] = Future()
+                stat["misses"] += 1
+            else:
+                stat["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            artifact = self.loader(path)
+            nbytes = path.stat().st_size
+        except BaseException as e:
+            with self._lock:
+                del self._loading[path]
+            future.set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._entries[path] = (artifact, nbytes)
+            del self._loading[path]
+            stat["loads"] += 1
+            stat["load_seconds_total"] += elapsed
+            stat["load_seconds_last"] = elapsed
+            while self.cached_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted, _ = self._entries.popitem(last=False)
+                self._stat(evicted)["evictions"] += 1
+                logger.info(f"Evicted model artifact {evicted.name}")
+        future.set_result(artifact)
+        logger.info(f"Loaded model artifact {path.name} in {elapsed * 1000:.0f} ms")
+        return artifact
+
+    def metrics(self) -> dict:
+        with self._lock:
+            cached = {path.name for path in self._entries}
+            models = {}
+            for name, stat in self._stats.items():
+                requests = stat["hits"] + stat["misses"] + stat["coalesced"]
+                models[name] = {
+                    **stat,
+                    "hit_rate": stat["hits"] / requests if requests else None,
+                    "cached": name in cached,
+                }
+            return {
+                "cached_bytes": self.cached_bytes,
+                "max_bytes": self.max_bytes,
+                "models": models,
+            }
+
+
+class ModelRouter:
+    """
+    Map a request's routing key (e.g. card product and region) to a model.
+
+    Routes are read from a JSON file of the form::
+
+        {"routes": {"gold:eu": {"artifact": "gold_eu.joblib", "threshold": 0.4}}}
+
+    `artifact` is relative to the routes file and `threshold` optionally
+    overrides the artifact's own. Unknown or missing keys use the deployed
+    default model.
+    """
+
+    def __init__(self, routes: dict, base_dir: Path, cache: ArtifactCache):
+        self.routes = routes
+        self.base_dir = Path(base_dir)
+        self.cache = cache
+
+    @classmethod
+    def from_file(cls, path: Path, cache: ArtifactCache):
+        config = json.loads(Path(path).read_text())
+        return cls(config.get("routes", {}), Path(path).parent, cache)
+
+    def resolve(self, route_key: str):
+        """
+        Return the routed artifact with the route's threshold applied, or None for the default.
+        """
+        route = self.routes.get(route_key) if route_key else None
+        if route is None:
+            return None
+
+        artifact = self.cache.get(self.base_dir / route["artifact"])
+        if route.get("threshold") is not None:
+            artifact = {**artifact, "threshold": float(route["threshold"])}
+        return artifact
@@ -0,0 +1,289 @@
+# src/api/rules.py
+import ast
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Decisive actions answer without the model; "flag" forces an alert on top of it
+ACTIONS = ("block", "allow", "flag")
+NO_DECISION, ALLOW, BLOCK = -1, 0, 1
+
+_COMPARISONS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+_ARITHMETIC = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod)
+
+
+def _constant(node: ast.AST):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _constant(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    raise ValueError(f"Expected a number, got {ast.unparse(node)!r}")
+
+
+def _combine(op: ast.operator, values: list) -> ast.AST:
+    result = values[0]
+    for value in values[1:]:
+        result = ast.BinOp(left=result, op=op, right=value)
+    return result
+
+
+def _to_numpy(node: ast.AST, columns: dict) -> ast.AST:
+    """
+    Rewrite a rule expression into elementwise NumPy operations on column arrays.
+
+    Only feature names, numbers, arithmetic, comparisons, `in` with a
+    literal list, `and` / `or` / `not` and `abs` are accepted, so a rule
+    can never run arbitrary code.
+    """
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ValueError(f"Unknown feature {node.id!r}")
+        return ast.Subscript(value=ast.Name(id="X", ctx=ast.Load()), slice=ast.Constant(columns[node.id]), ctx=ast.Load())
+
+    if isinstance(node, ast.Constant):
+        _constant(node)
+        return node
+
+    if isinstance(node, ast.BoolOp):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return _combine(op, [_to_numpy(value, columns) for value in node.values])
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _to_numpy(node.operand, columns)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=operand)
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(op=node.op, operand=operand)
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _ARITHMETIC):
+        return ast.BinOp(left=_to_numpy(node.left, columns), op=node.op, right=_to_numpy(node.right, columns))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "abs" and len(node.args) == 1:
+        return _numpy_call("abs", [_to_numpy(node.args[0], columns)])
+
+    if isinstance(node, ast.Compare):
+        parts, left = [], _to_numpy(node.left, columns)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(comparator, (ast.List, ast.Tuple, ast.Set)):
+                    raise ValueError("`in` needs a literal list of values")
+                values = ast.Constant(tuple(_constant(element) for element in comparator.elts))
+                part = _numpy_call("isin", [left, values])
+                if isinstance(op, ast.NotIn):
+                    part = ast.UnaryOp(op=ast.Invert(), operand=part)
+            elif isinstance(op, _COMPARISONS):
+                right = _to_numpy(comparator, columns)
+                part = ast.Compare(left=left, ops=[op], comparators=[right])
+                left = right
+            else:
+                raise ValueError(f"Unsupported comparison in {ast.unparse(node)!r}")
+            parts.append(part)
+        return _combine(ast.BitAnd(), parts)
+
+    raise ValueError(f"Unsupported expression {ast.unparse(node)!r}")
+
+
+def _numpy_call(name: str, args: list) -> ast.Call:
+    func = ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr=name, ctx=ast.Load())
+    return ast.Call(func=func, args=args, keywords=[])
+
+
+def _eval_masks(code, columns: np.ndarray):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return eval(code, {"__builtins__": {}, "np": np}, {"X": columns})
+
+
+def _check_mask(mask: ast.AST, dummy: np.ndarray):
+    """
+    Run one compiled rule on a dummy matrix and require a boolean mask.
+
+    Type errors such as ``"not Amount"`` only show when the rule runs, so
+    they are caught here instead of on every scored batch.
+    """
+    code = compile(ast.fix_missing_locations(ast.Expression(body=mask)), "<rule>", "eval")
+    try:
+        result = np.asarray(_eval_masks(code, dummy))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"cannot be evaluated: {e}") from e
+    if result.dtype != bool or result.shape not in ((), dummy.shape[1:]):
+        raise ValueError(f"must be a boolean condition, got {result.dtype} values")
+
+
+def compile_rules(rules: list, feature_columns: list):
+    """
+    Compile rule expressions into one code object returning a tuple of masks.
+
+    Parameters
+    ----------
+    rules : list of dict
+        Rules with `name`, `when` (a Python-like boolean expression over
+        feature names, e.g. ``"Amount > 5000 and V14 < -10"``) and `action`.
+    feature_columns : list of str
+        Column order of the feature matrices the rules will see.
+
+    Returns
+    -------
+    code
+        Evaluated with the transposed feature matrix bound to `X`.
+
+    Raises
+    ------
+    ValueError
+        If a rule is invalid, including one that fails when run (e.g.
+        ``"not Amount"``) or does not yield a boolean mask; each rule is
+        run once on a dummy matrix to catch these.
+    """
+    columns = {name: i for i, name in enumerate(feature_columns)}
+    dummy = np.zeros((len(feature_columns), 2))
+    names = set()
+    masks = []
+    for rule in rules:
+        name = rule.get("name")
+        if not name or name in names:
+            raise ValueError(f"Rules need unique names, got {name!r}")
+        if rule.get("action") not in ACTIONS:
+            raise ValueError(f"Rule {name!r}: action must be one of {ACTIONS}")
+        names.add(name)
+        try:
+            mask = _to_numpy(ast.parse(rule["when"], mode="eval").body, columns)
+            _check_mask(mask, dummy)
+            masks.append(mask)
+        except (SyntaxError, KeyError, ValueError) as e:
+            raise ValueError(f"Rule {name!r}: {e}") from e
+
+    tree = ast.Expression(body=ast.Tuple(elts=masks, ctx=ast.Load()))
+    return compile(ast.fix_missing_locations(tree), "<rules>", "eval")
+
+
+class RuleEngine:
+    """
+    Declarative screening rules evaluated before the model.
+
+    Rules are read from a JSON file of the form::
+
+        {"rules": [
+            {"name": "amount_cap", "when": "Amount > 20000", "action": "block"},
+            {"name": "micro_payment", "when": "Amount < 0.5", "action": "allow"},
+            {"name": "v14_extreme", "when": "V14 < -15", "action": "flag"}
+        ]}
+
+    All rules are compiled into one expression over the feature columns
+    and evaluated in a single vectorized pass per batch. `block` and
+    `allow` decide a row without the model (the first matching decisive
+    rule in file order wins); `flag` rows are still scored but always
+    alerted. Hit counts are kept per rule name.
+
+    The file is checked for changes at most every `reload_seconds` on the
+    scoring path and recompiled when it changes; an invalid file is logged
+    and the previous rules stay active.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        Rules file.
+    feature_columns : list of str
+        Column order of the feature matrices passed to `evaluate`.
+    reload_seconds : float, optional
+        Minimum interval between modification checks.
+    """
+
+    def __init__(self, path: Path, feature_columns: list, reload_seconds: float = 5.0):
+        self.path = Path(path)
+        self.feature_columns = list(feature_columns)
+        self.reload_seconds = reload_seconds
+        self.hits = Counter()
+        self.rows_evaluated = 0
+        self.rows_decided = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._ruleset = self._compile()
+
+    def _compile(self):
+        rules = json.loads(self.path.read_text()).get("rules", [])
+        code = compile_rules(rules, self.feature_columns)
+        logger.info(f"Compiled {len(rules)} screening rule(s) from {self.path}")
+        return rules, code
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_seconds or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._ruleset = self._compile()
+                self.reloads += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"Keeping previous screening rules: {e}")
+        finally:
+            self._lock.release()
+
+    @property
+    def rules(self) -> list:
+        return self._ruleset[0]
+
+    def evaluate(self, X: np.ndarray):
+        """
+        Apply the rules to a raw feature matrix.
+
+        Returns
+        -------
+        decision : numpy.ndarray of int8
+            `BLOCK`, `ALLOW` or `NO_DECISION` per row.
+        flagged : numpy.ndarray of bool
+            Rows matched by a `flag` rule.
+        rule : numpy.ndarray of object
+            Name of the deciding rule, else of the first matching flag rule, else None.
+        """
+        self._maybe_reload()
+        rules, code = self._ruleset
+        n = len(X)
+        masks = _eval_masks(code, np.ascontiguousarray(X.T))
+
+        decision = np.full(n, NO_DECISION, dtype=np.int8)
+        flagged = np.zeros(n, dtype=bool)
+        rule = np.full(n, None, dtype=object)
+        counts = {}
+        # Apply in reverse so earlier rules overwrite later ones; decisive rules go last
+        for decisive in (False, True):
+            for spec, mask in zip(reversed(rules), reversed(masks)):
+                if (spec["action"] != "flag") != decisive:
+                    continue
+                mask = np.broadcast_to(np.asarray(mask, dtype=bool), (n,))
+                counts[spec["name"]] = int(mask.sum())
+                if not counts[spec["name"]]:
+                    continue
+                rule[mask] = spec["name"]
+                if decisive:
+                    decision[mask] = BLOCK if spec["action"] == "block" else ALLOW
+                else:
+                    flagged |= mask
+
+        with self._lock:
+            self.hits.update(counts)
+            self.rows_evaluated += n
+            self.rows_decided += int((decision != NO_DECISION).sum())
+        return decision, flagged, rule
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "rules": len(self.rules),
+                "reloads": self.reloads,
+                "rows_evaluated": self.rows_evaluated,
+                "rows_decided": self.rows_decided,
+                "hits": {spec["name"]: self.hits[spec["name"]] for spec in self.rules},
+            }
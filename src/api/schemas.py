@@ -1,8 +1,12 @@
 # src/api/schemas.py
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+
+FEATURE_COLUMNS = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount"]
 
 class Transaction(BaseModel):
+    # Optional ID joining the prediction to a delayed label (e.g. a chargeback)
+    transaction_id: Optional[str] = None
     Time: float
     V1: float
     V2: float
@@ -37,7 +41,19 @@ class Transaction(BaseModel):
 class PredictionResponse(BaseModel):
     fraud_probability: float
     is_fraud: bool
+    anomaly_score: Optional[float] = None
+    rule: Optional[str] = None
     message: str = "Transaction processed successfully"
 
+class FeedbackLabel(BaseModel):
+    transaction_id: str
+    label: int
+
+class CaseUpdate(BaseModel):
+    case_ids: List[int]
+    status: str
+    assignee: Optional[str] = None
+    note: Optional[str] = None
+
 class BatchPredictionResponse(BaseModel):
     predictions: List[PredictionResponse]
\ No newline at end of file
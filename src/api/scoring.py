@@ -0,0 +1,262 @@
+# src/api/scoring.py
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from .admission import AdmissionController
+from .artifacts import feature_transform
+from .rules import BLOCK, NO_DECISION
+from .schemas import FEATURE_COLUMNS
+from .utils import (
+    MODEL, THRESHOLD, TRANSFORM, MODEL_VERSION, DRIFT_MONITOR, AUDIT_LOG, MODEL_ROUTER,
+    ANOMALY_DETECTOR, ANOMALY_LEARN, RULE_ENGINE, FEEDBACK_STORE, CASE_STORE,
+    ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE_DEPTH,
+)
+
+ADMISSION = AdmissionController(ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE_DEPTH)
+
+# The cheap first stage of a cascade doubles as the degraded fast path.
+FAST_MODEL = getattr(MODEL, "fast_model", None)
+
+# Positions of the detector's features in the raw feature matrix
+ANOMALY_COLUMNS = None if ANOMALY_DETECTOR is None else [
+    FEATURE_COLUMNS.index(f) for f in ANOMALY_DETECTOR.features_
+]
+
+
+class Scored(NamedTuple):
+    """Per-row outcome of scoring a batch."""
+    probs: np.ndarray
+    flags: np.ndarray
+    anomaly: Optional[np.ndarray] = None
+    rule: Optional[np.ndarray] = None
+
+
+def _features(records) -> np.ndarray:
+    """
+    Raw feature matrix in `FEATURE_COLUMNS` order.
+
+    Request records are read straight into an array; DataFrames (batch
+    jobs, replays) are reordered by name.
+    """
+    if isinstance(records, np.ndarray):
+        return records
+    if isinstance(records, pd.DataFrame):
+        return records[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    return np.array([[record.get(c) for c in FEATURE_COLUMNS] for record in records], dtype=np.float64)
+
+
+def _transaction_ids(records) -> Optional[np.ndarray]:
+    """
+    Transaction IDs of request records or a DataFrame, or None when there are none.
+    """
+    if isinstance(records, np.ndarray):
+        return None
+    if isinstance(records, pd.DataFrame):
+        return records["transaction_id"].to_numpy(dtype=object) if "transaction_id" in records else None
+    return np.array([record.get("transaction_id") for record in records], dtype=object)
+
+
+def _subset(ids: Optional[np.ndarray], rows: np.ndarray) -> Optional[np.ndarray]:
+    return None if ids is None else ids[rows]
+
+
+def _prepare(records: list[dict], transform=TRANSFORM):
+    """
+    Build the raw feature matrix and the model input.
+    """
+    raw = _features(records)
+    return raw, raw if transform is None else transform(raw)
+
+
+def resolve_route(route_key: str = None):
+    """
+    Return the artifact routed to by `route_key`, or None for the deployed model.
+
+    May load the artifact, so call it off the event loop.
+    """
+    if MODEL_ROUTER is None:
+        return None
+    return MODEL_ROUTER.resolve(route_key)
+
+
+def _artifact_transform(artifact: dict):
+    if "transform" not in artifact:
+        # Artifacts built outside `load_artifact_file`
+        artifact["transform"] = feature_transform(artifact)
+    return artifact["transform"]
+
+
+def _score(records: list[dict], artifact: dict = None, ids: Optional[np.ndarray] = None):
+    start = time.perf_counter()
+    if artifact is None:
+        model, transform, version = MODEL, TRANSFORM, MODEL_VERSION
+    else:
+        model, transform, version = artifact["model"], _artifact_transform(artifact), artifact["model_version"]
+    raw, X = _prepare(records, transform)
+
+    if not hasattr(model, "predict_proba"):
+        raise AttributeError("Model does not support predict_proba")
+    probs = model.predict_proba(X)[:, 1]
+
+    if DRIFT_MONITOR is not None and artifact is None:
+        DRIFT_MONITOR.observe(raw, probs)
+
+    if AUDIT_LOG is not None:
+        latency_ms = (time.perf_counter() - start) * 1000
+        threshold = THRESHOLD if artifact is None else artifact["threshold"]
+        ids = _transaction_ids(records) if ids is None else ids
+        AUDIT_LOG.record(raw, probs, is_fraud(probs, artifact), threshold, version, latency_ms, transaction_ids=ids)
+
+    return raw, probs
+
+
+def score_records(records: list[dict], artifact: dict = None) -> np.ndarray:
+    """
+    Score raw transaction records and return fraud probabilities.
+
+    This is the scoring core shared by the HTTP and WebSocket endpoints:
+    scaling, model inference, drift monitoring and decision auditing happen
+    here. Features go through the same compiled pipeline as in training.
+    `artifact` selects a routed model instead of the deployed one;
+    drift is only tracked against the deployed model's reference.
+    """
+    return _score(records, artifact)[1]
+
+
+def is_fraud(probs: np.ndarray, artifact: dict = None) -> np.ndarray:
+    """
+    Apply the decision threshold of the deployed or routed model.
+    """
+    return probs >= (THRESHOLD if artifact is None else artifact["threshold"])
+
+
+def score_anomaly(raw: np.ndarray, flags: np.ndarray):
+    """
+    Unsupervised anomaly scores of raw feature rows, or None without a detector.
+
+    Rows the supervised model does not flag feed the detector's live
+    window, so it follows legitimate traffic without waiting for labels.
+    """
+    if ANOMALY_DETECTOR is None:
+        return None
+    learn = ~flags if ANOMALY_LEARN else np.zeros(len(flags), dtype=bool)
+    return ANOMALY_DETECTOR.score_partial_fit(raw[:, ANOMALY_COLUMNS], learn)
+
+
+def _screened(records: list[dict], score_fn):
+    """
+    Apply the screening rules, then `score_fn(raw, ids) -> (probs, flags)` to the undecided rows.
+
+    Blocked rows get probability 1 and allowed rows 0 without reaching the
+    model; rows matched by a `flag` rule are alerted whatever their score.
+    Returns the raw feature matrix, probabilities, flags and deciding rules.
+    """
+    raw = _features(records)
+    # Transaction IDs are only needed to audit decisions
+    ids = None if AUDIT_LOG is None else _transaction_ids(records)
+    if RULE_ENGINE is None:
+        probs, flags = score_fn(raw, ids)
+        return raw, probs, flags, None
+
+    start = time.perf_counter()
+    decision, flagged, rule = RULE_ENGINE.evaluate(raw)
+    pending = decision == NO_DECISION
+    probs = (decision == BLOCK).astype(np.float64)
+    flags = decision == BLOCK
+
+    decided = ~pending
+    if AUDIT_LOG is not None and decided.any():
+        latency_ms = (time.perf_counter() - start) * 1000
+        AUDIT_LOG.record(
+            raw[decided], probs[decided], flags[decided], THRESHOLD, "rules", latency_ms,
+            path="rules", transaction_ids=_subset(ids, decided),
+        )
+
+    if pending.all():
+        probs, flags = score_fn(raw, ids)
+    elif pending.any():
+        probs[pending], flags[pending] = score_fn(raw[pending], _subset(ids, pending))
+    flags |= flagged
+    return raw, probs, flags, rule
+
+
+def _record_outcome(records: list[dict], raw: np.ndarray, scored: Scored, model_version: str):
+    """
+    Log decisions for delayed-label evaluation and open cases for flagged rows.
+    """
+    if isinstance(records, pd.DataFrame) or (FEEDBACK_STORE is None and CASE_STORE is None):
+        return
+    ids = [record.get("transaction_id") for record in records]
+    if FEEDBACK_STORE is not None:
+        FEEDBACK_STORE.record_predictions(ids, scored.probs, scored.flags, model_version)
+    if CASE_STORE is not None:
+        CASE_STORE.record(raw, scored.probs, scored.flags, model_version, ids, scored.rule, scored.anomaly)
+
+
+def _model_scorer(artifact: dict = None):
+    """
+    `score_fn` for `_screened` that scores with the deployed or routed model.
+    """
+    def score(raw, ids):
+        probs = _score(raw, artifact, ids)[1]
+        return probs, is_fraud(probs, artifact)
+
+    return score
+
+
+def score_routed(records: list[dict], route_key: str = None) -> Scored:
+    """
+    Screen, route, score and threshold records, adding anomaly scores.
+    """
+    artifact = resolve_route(route_key)
+    raw, probs, flags, rule = _screened(records, _model_scorer(artifact))
+    scored = Scored(probs, flags, score_anomaly(raw, flags), rule)
+    _record_outcome(records, raw, scored, MODEL_VERSION if artifact is None else artifact["model_version"])
+    return scored
+
+
+def score_frame(frame: pd.DataFrame, route_key: str = None):
+    """
+    Screen, route, score and threshold a DataFrame of transactions.
+
+    Batch jobs and replays get the same decisions as `/predict-batch`, but
+    offline rows neither feed the anomaly detector's live window nor open
+    cases. Returns the probabilities and is_fraud flags.
+    """
+    _, probs, flags, _ = _screened(frame, _model_scorer(resolve_route(route_key)))
+    return probs, flags
+
+
+def _score_fast(raw: np.ndarray, ids: Optional[np.ndarray] = None):
+    start = time.perf_counter()
+    raw, X = _prepare(raw)
+    probs = FAST_MODEL.predict_proba(X)[:, 1]
+    flags = probs >= MODEL.lower
+
+    if AUDIT_LOG is not None:
+        latency_ms = (time.perf_counter() - start) * 1000
+        AUDIT_LOG.record(
+            raw, probs, flags, MODEL.lower, MODEL_VERSION, latency_ms, path="degraded", transaction_ids=ids,
+        )
+
+    return probs, flags
+
+
+def score_degraded(records: list[dict]) -> Optional[Scored]:
+    """
+    Screen and score with the fast path only, or return None if there is none.
+
+    Rows the fast model cannot clear with confidence are flagged, so a
+    degraded answer never lets a transaction through that the cascade
+    would have sent to the full model. Screening rules still apply.
+    """
+    if FAST_MODEL is None:
+        return None
+
+    raw, probs, flags, rule = _screened(records, _score_fast)
+    scored = Scored(probs, flags, rule=rule)
+    _record_outcome(records, raw, scored, MODEL_VERSION)
+    return scored
@@ -0,0 +1,201 @@
+# src/api/serve.py
+"""
+Pre-fork production server for the scoring API.
+
+The parent process imports the app (loading the model, threshold and
+scaler once), freezes the heap and forks N workers that share the loaded
+artifacts copy-on-write and accept on one listening socket. Each worker
+gets a fixed OpenMP/BLAS thread budget so workers do not oversubscribe
+the cores.
+
+Usage:
+    python -m src.api.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import psutil
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _limit_threads(n_threads: int):
+    """
+    Pin the native thread pools of the current worker to `n_threads`.
+    """
+    from threadpoolctl import threadpool_limits
+
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(n_threads)
+    threadpool_limits(n_threads)
+
+    from .utils import MODEL
+
+    # XGBoost uses its own `n_jobs` rather than the OpenMP default when set.
+    if hasattr(MODEL, "set_params") and "n_jobs" in MODEL.get_params():
+        MODEL.set_params(n_jobs=n_threads)
+
+
+def worker_memory_report(pids) -> dict:
+    """
+    Report resident, proportional and unique memory per worker in MiB.
+
+    PSS splits shared pages between the processes that map them, so the sum
+    of PSS over the parent and workers is the real footprint; USS is what a
+    worker would free on exit.
+    """
+    report = {}
+    for pid in pids:
+        try:
+            info = psutil.Process(pid).memory_full_info()
+        except psutil.Error:
+            continue
+        report[pid] = {
+            "rss_mib": info.rss / 2**20,
+            "pss_mib": getattr(info, "pss", float("nan")) / 2**20,
+            "uss_mib": info.uss / 2**20,
+        }
+    return report
+
+
+def _log_memory(parent_pid: int, worker_pids):
+    report = worker_memory_report([parent_pid, *worker_pids])
+    for pid, mem in report.items():
+        role = "parent" if pid == parent_pid else "worker"
+        logger.info(
+            f"{role} {pid}: rss={mem['rss_mib']:.1f} MiB pss={mem['pss_mib']:.1f} MiB "
+            f"uss={mem['uss_mib']:.1f} MiB"
+        )
+    total_pss = sum(mem["pss_mib"] for mem in report.values())
+    logger.info(f"Total PSS across {len(report)} processes: {total_pss:.1f} MiB")
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    # IPPROTO_TCP must be explicit: asyncio only enables TCP_NODELAY on accepted
+    # sockets whose proto is TCP, and Nagle's algorithm adds ~40 ms per response.
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(config: uvicorn.Config, sock: socket.socket, n_threads: int):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    _limit_threads(n_threads)
+
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(config: uvicorn.Config, sock: socket.socket, n_threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(config, sock, n_threads)
+        except Exception:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"Started worker {pid} with {n_threads} thread(s)")
+    return pid
+
+
+def serve(host: str, port: int, workers: int, threads_per_worker: int, memory_report_interval: float):
+    """
+    Load artifacts once, fork `workers` processes and supervise them.
+
+    Dead workers are replaced; SIGTERM/SIGINT are forwarded to all workers.
+    """
+    # Size native thread pools before any library creates them, so the
+    # parent does not fork while holding a full-width pool.
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads_per_worker))
+
+    # Importing the app loads the model artifacts in the parent only.
+    from .main import app
+
+    # Move everything allocated so far out of the GC's reach so that
+    # collections in the workers do not touch (and copy) shared pages.
+    gc.collect()
+    gc.freeze()
+
+    config = uvicorn.Config(app, log_level="info")
+    sock = _bind(host, port)
+    logger.info(f"Listening on {host}:{port} with {workers} worker(s)")
+
+    pids = {_spawn(config, sock, threads_per_worker) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    parent_pid = os.getpid()
+    next_report = time.monotonic() + min(5.0, memory_report_interval)
+
+    while pids:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+
+        if pid:
+            pids.discard(pid)
+            if not stopping:
+                logger.warning(f"Worker {pid} exited with status {status}; restarting")
+                pids.add(_spawn(config, sock, threads_per_worker))
+            continue
+
+        if memory_report_interval > 0 and time.monotonic() >= next_report and not stopping:
+            _log_memory(parent_pid, pids)
+            next_report = time.monotonic() + memory_report_interval
+
+        time.sleep(0.2)
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", str(cpus))))
+    parser.add_argument(
+        "--threads-per-worker", type=int, default=int(os.environ.get("API_THREADS_PER_WORKER", "0")),
+        help="Native threads per worker (default: cores / workers, at least 1)",
+    )
+    parser.add_argument(
+        "--memory-report-interval", type=float, default=60.0,
+        help="Seconds between per-worker memory reports (0 disables)",
+    )
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+    serve(args.host, args.port, args.workers, threads, args.memory_report_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# src/api/streaming.py
+import asyncio
+import json
+import logging
+import os
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from .admission import AdmissionRejected
+from .schemas import Transaction
+from .scoring import ADMISSION, score_degraded, score_routed
+
+logger = logging.getLogger(__name__)
+
+# Requests scored together in one model call.
+WS_MAX_BATCH = int(os.environ.get("WS_MAX_BATCH", "256"))
+# Requests accepted but not yet scored; reading stops when full (backpressure).
+WS_MAX_IN_FLIGHT = int(os.environ.get("WS_MAX_IN_FLIGHT", "1024"))
+# Concurrent scoring tasks per connection.
+WS_SCORERS = int(os.environ.get("WS_SCORERS", "2"))
+
+
+def _results(ids: list, scored, message: str = None) -> list:
+    results = [
+        {"id": request_id, "fraud_probability": round(float(prob), 4), "is_fraud": bool(flag)}
+        for request_id, prob, flag in zip(ids, scored.probs, scored.flags)
+    ]
+    if scored.anomaly is not None:
+        for result, score in zip(results, scored.anomaly):
+            result["anomaly_score"] = round(float(score), 4)
+    if scored.rule is not None:
+        for result, rule in zip(results, scored.rule):
+            if rule is not None:
+                result["rule"] = rule
+    if message:
+        for result in results:
+            result["message"] = message
+    return results
+
+
+def _parse_message(message: str, route_key: str = None):
+    """
+    Parse a client frame into `(id, record, route_key)` items and per-item errors.
+
+    A frame is either one `{"id": ..., "transaction": {...}}` object or a
+    JSON array of them. An item's optional `"route_key"` overrides the
+    connection's `route_key`.
+    """
+    try:
+        payload = json.loads(message)
+    except json.JSONDecodeError as e:
+        return [], [{"id": None, "error": f"Invalid JSON: {e}"}]
+
+    items = payload if isinstance(payload, list) else [payload]
+    accepted, errors = [], []
+    for item in items:
+        request_id = item.get("id") if isinstance(item, dict) else None
+        try:
+            transaction = Transaction(**item["transaction"])
+        except (KeyError, TypeError, ValidationError) as e:
+            errors.append({"id": request_id, "error": f"Invalid transaction: {e}"})
+            continue
+        item_route_key = item.get("route_key", route_key)
+        if item_route_key is not None and not isinstance(item_route_key, str):
+            errors.append({"id": request_id, "error": "route_key must be a string"})
+            continue
+        accepted.append((request_id, transaction.dict(), item_route_key))
+    return accepted, errors
+
+
+async def serve_scoring_channel(websocket: WebSocket):
+    """
+    Serve a persistent scoring channel on an accepted WebSocket.
+
+    Clients may keep many correlation-tagged requests in flight. Pending
+    requests are drained in micro-batches of up to `WS_MAX_BATCH`, scored
+    off the event loop, and answered as soon as their batch is done, so
+    results can arrive out of order. Every server frame is a JSON array of
+    `{"id", "fraud_probability", "is_fraud"}` or `{"id", "error"}` objects.
+    Batches shed by admission control are answered from the degraded fast
+    path, with a `message`, when the deployed model has one.
+
+    Requests are routed like HTTP ones: by the `X-Route-Key` header of the
+    handshake, overridden per request by a `"route_key"` field. A
+    micro-batch is scored in one call per route key.
+    """
+    route_key = websocket.headers.get("x-route-key")
+    await websocket.accept()
+
+    queue = asyncio.Queue(maxsize=WS_MAX_IN_FLIGHT)
+    send_lock = asyncio.Lock()
+
+    async def send(results):
+        async with send_lock:
+            await websocket.send_text(json.dumps(results))
+
+    async def score(ids: list, records: list, key: str = None) -> list:
+        try:
+            async with ADMISSION.slot(
+                priority=max(record["Amount"] for record in records), rows=len(records)
+            ):
+                # Resolving the route may load an artifact, so it runs in the threadpool too
+                scored = await run_in_threadpool(score_routed, records, key)
+            return _results(ids, scored)
+        except AdmissionRejected as e:
+            # Shed batches get the degraded fast-path answer, as over HTTP
+            degraded = await run_in_threadpool(score_degraded, records)
+            if degraded is None:
+                return [{"id": request_id, "error": str(e)} for request_id in ids]
+            ADMISSION.degraded += 1
+            return _results(ids, degraded, f"Degraded fast-path decision ({e.reason})")
+        except Exception as e:
+            logger.error(f"Streaming prediction error: {str(e)}")
+            return [{"id": request_id, "error": f"Prediction failed: {str(e)}"} for request_id in ids]
+
+    async def scorer():
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < WS_MAX_BATCH and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            groups = {}
+            for request_id, record, key in batch:
+                ids, records = groups.setdefault(key, ([], []))
+                ids.append(request_id)
+                records.append(record)
+            for key, (ids, records) in groups.items():
+                await send(await score(ids, records, key))
+
+    workers = [asyncio.create_task(scorer()) for _ in range(WS_SCORERS)]
+    try:
+        while True:
+            accepted, errors = _parse_message(await websocket.receive_text(), route_key)
+            if errors:
+                await send(errors)
+            for item in accepted:
+                await queue.put(item)
+    except WebSocketDisconnect:
+        logger.info("Scoring channel closed by client")
+    finally:
+        for worker in workers:
+            worker.cancel()
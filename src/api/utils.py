@@ -2,47 +2,191 @@
 import joblib
 from pathlib import Path
 import logging
+import os
+
+from src.monitoring.audit import AuditLogWriter
+from src.monitoring.cases import CaseStore
+from src.monitoring.drift import DriftMonitor, load_drift_reference
+from src.monitoring.feedback import FeedbackStore
+from .artifacts import MODEL_PATH, ROOT, SCALER_PATH, load_artifact_file
+from .routing import ArtifactCache, ModelRouter
+from .rules import RuleEngine
+from .schemas import FEATURE_COLUMNS
 
 logger = logging.getLogger(__name__)
 
-ROOT = Path(__file__).resolve().parent.parent.parent  # Project root
-MODEL_PATH = ROOT / "models" / "final_xgb_with_threshold.joblib"
-SCALER_PATH = ROOT / "models" / "scaler.joblib"
+DRIFT_REFERENCE_PATH = ROOT / "models" / "drift_reference.npz"
+DRIFT_INTERVAL_SECONDS = float(os.environ.get("DRIFT_INTERVAL_SECONDS", "60"))
+
+# Decision audit log, written only when a directory is configured
+AUDIT_LOG_DIR = os.environ.get("AUDIT_LOG_DIR", "")
+AUDIT_BUFFER_ROWS = int(os.environ.get("AUDIT_BUFFER_ROWS", "8192"))
+AUDIT_MAX_PENDING_BUFFERS = int(os.environ.get("AUDIT_MAX_PENDING_BUFFERS", "8"))
+AUDIT_MAX_FILE_ROWS = int(os.environ.get("AUDIT_MAX_FILE_ROWS", "1000000"))
+AUDIT_ROTATE_SECONDS = float(os.environ.get("AUDIT_ROTATE_SECONDS", "3600"))
+
+# On-demand profiling; the admin endpoint is disabled unless a token is set
+PROFILER_ADMIN_TOKEN = os.environ.get("PROFILER_ADMIN_TOKEN", "")
+PROFILE_OUTPUT_DIR = Path(os.environ.get("PROFILE_OUTPUT_DIR", str(ROOT / "reports" / "profiles")))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "300"))
+
+# Asynchronous batch jobs
+BATCH_JOBS_DIR = Path(os.environ.get("BATCH_JOBS_DIR", str(ROOT / "data" / "jobs")))
+# Job chunks scored at once, across all jobs, so online traffic keeps capacity
+BATCH_JOB_MAX_CONCURRENCY = int(os.environ.get("BATCH_JOB_MAX_CONCURRENCY", "1"))
+BATCH_JOB_CHUNK_SIZE = int(os.environ.get("BATCH_JOB_CHUNK_SIZE", "10000"))
+BATCH_JOB_MAX_UPLOAD_BYTES = int(os.environ.get("BATCH_JOB_MAX_UPLOAD_BYTES", str(1024 ** 3)))
+
+# Per-portfolio model routing; disabled unless the routes file exists
+MODEL_ROUTES_PATH = Path(os.environ.get("MODEL_ROUTES_PATH", str(ROOT / "models" / "routes.json")))
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# Unsupervised anomaly scores; disabled unless the detector has been fitted
+ANOMALY_MODEL_PATH = Path(os.environ.get("ANOMALY_MODEL_PATH", str(ROOT / "models" / "anomaly_detector.joblib")))
+# Keep learning from transactions the supervised model does not flag
+ANOMALY_LEARN = os.environ.get("ANOMALY_LEARN", "1") == "1"
+
+# Delayed-label feedback index (empty = disabled)
+FEEDBACK_DB_PATH = os.environ.get("FEEDBACK_DB_PATH", "")
+FEEDBACK_BUCKET_SECONDS = float(os.environ.get("FEEDBACK_BUCKET_SECONDS", "3600"))
+# Predictions, labels and metric buckets older than this are pruned (0 = keep forever)
+FEEDBACK_RETENTION_DAYS = float(os.environ.get("FEEDBACK_RETENTION_DAYS", "90"))
+
+# Analyst case queue of flagged transactions (empty = disabled)
+CASES_DB_PATH = os.environ.get("CASES_DB_PATH", "")
+
+# Screening rules applied before the model; hot-reloaded when the file changes
+RULES_PATH = Path(os.environ.get("RULES_PATH", str(ROOT / "models" / "rules.json")))
+RULES_RELOAD_SECONDS = float(os.environ.get("RULES_RELOAD_SECONDS", "5"))
+
+# Admission control
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", str(os.cpu_count() or 1)))
+ADMISSION_MAX_QUEUE_DEPTH = int(os.environ.get("ADMISSION_MAX_QUEUE_DEPTH", "256"))
+# Deadline applied when a request carries no X-Request-Deadline-Ms header (0 = none)
+ADMISSION_DEFAULT_DEADLINE_MS = float(os.environ.get("ADMISSION_DEFAULT_DEADLINE_MS", "0"))
 
 def load_artifacts():
-    """Load model artifact and scaler, handling different saved formats."""
-    if not MODEL_PATH.exists():
-        raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
-
-    artifact = joblib.load(MODEL_PATH)
-    logger.info(f"Loaded model artifact type: {type(artifact)}")
-
-    # Case 1: It's a dict with model and threshold
-    if isinstance(artifact, dict):
-        model = artifact.get("model") or artifact.get("clf") or artifact.get("estimator")
-        threshold = artifact.get("threshold", 0.5)
-        logger.info(f"Extracted model and custom threshold: {threshold}")
-    else:
-        # Case 2: It's the raw model (no threshold wrapper)
-        model = artifact
-        threshold = 0.5
-        logger.info("Loaded raw model, using default threshold 0.5")
-
-    # Load scaler if exists
-    scaler = None
-    if SCALER_PATH.exists():
-        scaler = joblib.load(SCALER_PATH)
-        logger.info("Scaler loaded successfully")
-    else:
-        logger.info("No scaler found — assuming model doesn't need scaling")
-
-    return model, float(threshold), scaler
+    """Load the deployed model artifact and its feature transform."""
+    artifact = load_artifact_file(MODEL_PATH, scaler_path=SCALER_PATH)
+    return artifact["model"], artifact["threshold"], artifact["scaler"], artifact["transform"], artifact["model_version"]
 
 
 # Load once at import time
 try:
-    MODEL, THRESHOLD, SCALER = load_artifacts()
-    logger.info(f"API artifacts loaded: Model ready | Threshold = {THRESHOLD} | Scaler = {'Yes' if SCALER else 'No'}")
+    MODEL, THRESHOLD, SCALER, TRANSFORM, MODEL_VERSION = load_artifacts()
+    logger.info(f"API artifacts loaded: Model {MODEL_VERSION} ready | Threshold = {THRESHOLD} | Feature transform = {'Yes' if TRANSFORM else 'No'}")
 except Exception as e:
     logger.error(f"Failed to load model artifacts: {e}")
-    raise
\ No newline at end of file
+    raise
+
+
+def load_drift_monitor():
+    """Create the drift monitor if a training reference has been saved."""
+    if not DRIFT_REFERENCE_PATH.exists():
+        logger.info("No drift reference found — drift monitoring disabled (write one with `make drift_reference`)")
+        return None
+
+    reference = load_drift_reference(DRIFT_REFERENCE_PATH)
+    logger.info(f"Drift monitor loaded for {len(reference['features'])} features")
+    return DriftMonitor(reference, FEATURE_COLUMNS, interval_seconds=DRIFT_INTERVAL_SECONDS)
+
+
+DRIFT_MONITOR = load_drift_monitor()
+
+
+def load_audit_log():
+    """Create the decision audit writer if an output directory is configured."""
+    if not AUDIT_LOG_DIR:
+        logger.info("AUDIT_LOG_DIR not set — decision audit log disabled")
+        return None
+
+    logger.info(f"Writing decision audit log to {AUDIT_LOG_DIR}")
+    return AuditLogWriter(
+        Path(AUDIT_LOG_DIR),
+        FEATURE_COLUMNS,
+        buffer_rows=AUDIT_BUFFER_ROWS,
+        max_pending_buffers=AUDIT_MAX_PENDING_BUFFERS,
+        max_file_rows=AUDIT_MAX_FILE_ROWS,
+        rotate_seconds=AUDIT_ROTATE_SECONDS,
+    )
+
+
+AUDIT_LOG = load_audit_log()
+
+
+def _load_routed_artifact(path: Path) -> dict:
+    artifact = load_artifact_file(path)
+    if artifact["transform"] is None:
+        # Same fallback as the deployed model
+        artifact["scaler"], artifact["transform"] = SCALER, TRANSFORM
+    return artifact
+
+
+def load_model_router():
+    """Create the model router if a routes file is present."""
+    if not MODEL_ROUTES_PATH.exists():
+        logger.info("No model routes found — all requests use the deployed model")
+        return None
+
+    router = ModelRouter.from_file(MODEL_ROUTES_PATH, ArtifactCache(_load_routed_artifact, MODEL_CACHE_MAX_BYTES))
+    logger.info(f"Model routing enabled for {len(router.routes)} route(s)")
+    return router
+
+
+MODEL_ROUTER = load_model_router()
+
+
+def load_anomaly_detector():
+    """Load the streaming anomaly detector if one has been fitted."""
+    if not ANOMALY_MODEL_PATH.exists():
+        logger.info("No anomaly detector found — anomaly scores disabled")
+        return None
+
+    detector = joblib.load(ANOMALY_MODEL_PATH)
+    logger.info(f"Anomaly detector loaded for {len(detector.features_)} features")
+    return detector
+
+
+ANOMALY_DETECTOR = load_anomaly_detector()
+
+
+def load_rule_engine():
+    """Compile the screening rules if a rules file is present."""
+    if not RULES_PATH.exists():
+        logger.info("No screening rules found — all transactions go to the model")
+        return None
+
+    return RuleEngine(RULES_PATH, FEATURE_COLUMNS, reload_seconds=RULES_RELOAD_SECONDS)
+
+
+RULE_ENGINE = load_rule_engine()
+
+
+def load_feedback_store():
+    """Open the feedback index if a database path is configured."""
+    if not FEEDBACK_DB_PATH:
+        logger.info("FEEDBACK_DB_PATH not set — delayed-label evaluation disabled")
+        return None
+
+    logger.info(f"Recording predictions with transaction IDs to {FEEDBACK_DB_PATH}")
+    return FeedbackStore(
+        Path(FEEDBACK_DB_PATH),
+        bucket_seconds=FEEDBACK_BUCKET_SECONDS,
+        retention_seconds=FEEDBACK_RETENTION_DAYS * 86400 or None,
+    )
+
+
+FEEDBACK_STORE = load_feedback_store()
+
+
+def load_case_store():
+    """Open the case store if a database path is configured."""
+    if not CASES_DB_PATH:
+        logger.info("CASES_DB_PATH not set — case queue disabled")
+        return None
+
+    logger.info(f"Recording flagged transactions as cases in {CASES_DB_PATH}")
+    return CaseStore(Path(CASES_DB_PATH), FEATURE_COLUMNS)
+
+
+CASE_STORE = load_case_store()
@@ -8,6 +8,7 @@ RAW_DATA_PATH = Path('../data/raw/creditcard.csv')
 
 DATA_INTERIM_DIR = Path('../data/interim/')
 DATA_PROCESSED_DIR = Path('../data/processed/')
+DATA_CACHE_DIR = Path('../data/cache/')
 MODELS_DIR = Path('../models/')
 
 # Dataset 
@@ -0,0 +1,202 @@
+import hashlib
+import inspect
+import json
+import shutil
+import uuid
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Bump to invalidate every cached stage regardless of the stage code hashes.
+CACHE_FORMAT_VERSION = 1
+
+_MANIFEST = "manifest.json"
+_SERIES_COLUMN = "__series__"
+
+
+def fingerprint_data(obj) -> str:
+  """
+  Compute a content hash for a DataFrame, Series or ndarray.
+
+  Values, index, column names and dtypes all contribute to the hash so that
+  any change in the input data produces a different fingerprint.
+
+  Parameters
+  ----------
+  obj : pandas.DataFrame, pandas.Series or numpy.ndarray
+    Data to fingerprint.
+
+  Returns
+  ----------
+  str
+    Hex digest identifying the content of `obj`.
+  """
+  h = hashlib.sha256()
+
+  if isinstance(obj, (pd.DataFrame, pd.Series)):
+    h.update(type(obj).__name__.encode())
+    h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    if isinstance(obj, pd.DataFrame):
+      h.update(repr(list(obj.columns)).encode())
+      h.update(repr([str(dtype) for dtype in obj.dtypes]).encode())
+    else:
+      h.update(repr(obj.name).encode())
+      h.update(str(obj.dtype).encode())
+  elif isinstance(obj, np.ndarray):
+    h.update(str(obj.dtype).encode())
+    h.update(repr(obj.shape).encode())
+    h.update(np.ascontiguousarray(obj).tobytes())
+  else:
+    raise TypeError(f"Cannot fingerprint object of type {type(obj).__name__}")
+
+  return h.hexdigest()
+
+
+def code_fingerprint(func) -> str:
+  """
+  Hash the source code of a stage function.
+
+  Editing the function body invalidates every cache entry produced by it.
+  """
+  try:
+    source = inspect.getsource(func)
+  except (OSError, TypeError):
+    source = f"{func.__module__}.{func.__qualname__}"
+  return hashlib.sha256(source.encode()).hexdigest()
+
+
+class StageCache:
+  """
+  Content-addressed on-disk cache for preprocessing stage outputs.
+
+  Each entry lives in its own directory named after the stage key. DataFrames
+  and Series are stored as parquet, ndarrays as npy and any other object
+  (e.g. a fitted scaler) as joblib. A manifest is written last so that an
+  interrupted write is never mistaken for a valid entry.
+
+  Parameters
+  ----------
+  cache_dir : pathlib.Path
+    Root directory holding the cache entries.
+  """
+
+  def __init__(self, cache_dir: Path):
+    self.cache_dir = Path(cache_dir)
+    self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+  def stage_key(self, stage_name: str, func, inputs: list, params: dict) -> str:
+    """
+    Derive the cache key of a stage.
+
+    Parameters
+    ----------
+    stage_name : str
+      Human readable stage name.
+    func : callable
+      Function implementing the stage; its source is part of the key.
+    inputs : list of str
+      Fingerprints of the stage inputs. For chained stages these are the
+      keys of the upstream stages, so data is only hashed once.
+    params : dict
+      JSON-serializable stage parameters.
+
+    Returns
+    ----------
+    str
+      Hex digest identifying the stage output.
+    """
+    payload = json.dumps(
+      {
+        "format": CACHE_FORMAT_VERSION,
+        "stage": stage_name,
+        "code": code_fingerprint(func),
+        "inputs": list(inputs),
+        "params": params,
+      },
+      sort_keys=True,
+      default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+  def _entry_dir(self, key: str) -> Path:
+    return self.cache_dir / key
+
+  def has(self, key: str) -> bool:
+    """
+    Check whether a complete entry exists for `key`.
+    """
+    return (self._entry_dir(key) / _MANIFEST).exists()
+
+  def save(self, key: str, outputs: dict):
+    """
+    Persist the named outputs of a stage under `key`.
+    """
+    tmp_dir = self.cache_dir / f".tmp-{key}-{uuid.uuid4().hex}"
+    tmp_dir.mkdir(parents=True)
+
+    manifest = {}
+    for name, value in outputs.items():
+      if isinstance(value, pd.DataFrame):
+        value.to_parquet(tmp_dir / f"{name}.parquet")
+        manifest[name] = {"kind": "frame"}
+      elif isinstance(value, pd.Series):
+        column = _SERIES_COLUMN if value.name is None else str(value.name)
+        value.to_frame(name=column).to_parquet(tmp_dir / f"{name}.parquet")
+        manifest[name] = {"kind": "series", "name": value.name}
+      elif isinstance(value, np.ndarray):
+        np.save(tmp_dir / f"{name}.npy", value, allow_pickle=False)
+        manifest[name] = {"kind": "array"}
+      else:
+        joblib.dump(value, tmp_dir / f"{name}.joblib")
+        manifest[name] = {"kind": "object"}
+
+    (tmp_dir / _MANIFEST).write_text(json.dumps(manifest))
+
+    entry_dir = self._entry_dir(key)
+    if entry_dir.exists():
+      shutil.rmtree(tmp_dir)
+      return
+    tmp_dir.rename(entry_dir)
+
+  def load(self, key: str, names=None) -> dict:
+    """
+    Load the outputs stored under `key`.
+
+    Parameters
+    ----------
+    key : str
+      Stage key.
+    names : iterable of str, optional
+      Subset of outputs to load. All outputs are loaded by default.
+
+    Returns
+    ----------
+    dict
+      Mapping of output name to value.
+    """
+    entry_dir = self._entry_dir(key)
+    manifest = json.loads((entry_dir / _MANIFEST).read_text())
+    names = manifest.keys() if names is None else names
+
+    outputs = {}
+    for name in names:
+      kind = manifest[name]["kind"]
+      if kind == "frame":
+        outputs[name] = pd.read_parquet(entry_dir / f"{name}.parquet")
+      elif kind == "series":
+        series = pd.read_parquet(entry_dir / f"{name}.parquet").iloc[:, 0]
+        series.name = manifest[name]["name"]
+        outputs[name] = series
+      elif kind == "array":
+        outputs[name] = np.load(entry_dir / f"{name}.npy")
+      else:
+        outputs[name] = joblib.load(entry_dir / f"{name}.joblib")
+    return outputs
+
+  def path(self, key: str, name: str) -> Path:
+    """
+    Return the on-disk path of an object output stored under `key`.
+    """
+    return self._entry_dir(key) / f"{name}.joblib"
@@ -0,0 +1,322 @@
+"""
+Declarative feature pipeline shared by training and serving.
+
+Usage:
+  python -m src.data.features fit data/raw/transactions.parquet --output models/feature_pipeline.joblib --derived
+  python -m src.data.features transform data/raw/transactions.parquet data/features/transactions.parquet \
+    --pipeline models/feature_pipeline.joblib
+"""
+import argparse
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.api.schemas import FEATURE_COLUMNS
+from src.data.load import iter_credit_card_batches
+
+
+def _log1p(x: np.ndarray, out: np.ndarray):
+  np.log1p(np.maximum(x, 0), out=out)
+
+
+def _hour_of_day(t: np.ndarray, out: np.ndarray):
+  # `Time` is seconds since the first transaction of the capture
+  np.floor_divide(t, 3600, out=out)
+  np.mod(out, 24, out=out)
+
+
+def _hour_sin(t: np.ndarray, out: np.ndarray):
+  np.multiply(t, 2 * np.pi / 86400, out=out)
+  np.sin(out, out=out)
+
+
+def _hour_cos(t: np.ndarray, out: np.ndarray):
+  np.multiply(t, 2 * np.pi / 86400, out=out)
+  np.cos(out, out=out)
+
+
+# Derived-feature operations: `op(column, out)` writes into a preallocated column
+OPERATIONS = {
+  "log1p": _log1p,
+  "hour_of_day": _hour_of_day,
+  "hour_sin": _hour_sin,
+  "hour_cos": _hour_cos,
+}
+
+DEFAULT_DERIVED = [
+  {"name": "log_amount", "op": "log1p", "column": "Amount"},
+  {"name": "hour_of_day", "op": "hour_of_day", "column": "Time"},
+]
+
+
+class FeaturePipeline:
+  """
+  Column order, derived features and standardization as one serializable spec.
+
+  The output is `columns` in order followed by one column per `derived`
+  entry, all standardized with statistics learned by `fit` or streamed
+  through `partial_fit`. `compile` turns the fitted spec into a function
+  from a raw feature matrix to the model input that only indexes,
+  applies the operations into a preallocated array and scales in place,
+  so serving needs no DataFrame. Training runs the same compiled function
+  over DataFrames or parquet chunks, so both sides share one code path.
+
+  Parameters
+  ----------
+  columns : list of str, optional
+    Raw columns passed through to the output; defaults to the API features.
+  derived : list of dict, optional
+    Entries `{"name", "op", "column"}` with `op` a key of `OPERATIONS`.
+  scale : bool, optional
+    Standardize the output columns.
+  """
+
+  def __init__(self, columns: list = None, derived: list = None, scale: bool = True):
+    self.columns = list(columns or FEATURE_COLUMNS)
+    self.derived = [dict(d) for d in (derived or [])]
+    self.scale = scale
+    for d in self.derived:
+      if d["op"] not in OPERATIONS:
+        raise ValueError(f"Unknown feature operation {d['op']!r}")
+      if d["column"] not in self.columns:
+        raise ValueError(f"Derived feature {d['name']!r} reads unknown column {d['column']!r}")
+
+    n = len(self.output_columns)
+    self.n_samples_ = 0
+    self.mean_ = np.zeros(n)
+    self.var_ = np.ones(n)
+    self.scale_ = np.ones(n)
+
+  @classmethod
+  def from_scaler(cls, scaler, columns: list = None):
+    """
+    Wrap a fitted `StandardScaler` (legacy artifacts) as an equivalent pipeline.
+    """
+    if columns is None:
+      columns = getattr(scaler, "feature_names_in_", None)
+    pipeline = cls(None if columns is None else list(columns))
+    pipeline.n_samples_ = int(np.max(scaler.n_samples_seen_))
+    pipeline.mean_ = np.asarray(scaler.mean_, dtype=np.float64)
+    pipeline.var_ = np.asarray(scaler.var_, dtype=np.float64)
+    pipeline.scale_ = np.asarray(scaler.scale_, dtype=np.float64)
+    return pipeline
+
+  @property
+  def output_columns(self) -> list:
+    return self.columns + [d["name"] for d in self.derived]
+
+  def spec(self) -> dict:
+    """
+    JSON-serializable spec and fitted statistics.
+    """
+    return {
+      "columns": self.columns,
+      "derived": self.derived,
+      "scale": self.scale,
+      "n_samples": self.n_samples_,
+      "mean": self.mean_.tolist(),
+      "var": self.var_.tolist(),
+    }
+
+  @classmethod
+  def from_spec(cls, spec: dict):
+    pipeline = cls(spec["columns"], spec["derived"], spec["scale"])
+    pipeline.n_samples_ = spec["n_samples"]
+    pipeline.mean_ = np.asarray(spec["mean"], dtype=np.float64)
+    pipeline.var_ = np.asarray(spec["var"], dtype=np.float64)
+    pipeline.scale_ = _scale_from_var(pipeline.var_)
+    return pipeline
+
+  def _raw(self, X) -> np.ndarray:
+    if isinstance(X, pd.DataFrame):
+      return X[self.columns].to_numpy(dtype=np.float64)
+    return np.asarray(X, dtype=np.float64)
+
+  def compile(self, source_columns: list = None):
+    """
+    Build the fixed-shape transform `f(raw) -> model input`.
+
+    Parameters
+    ----------
+    source_columns : list of str, optional
+      Column layout of the raw matrices `f` will receive; defaults to
+      `columns`. Serving passes the API feature order.
+
+    Returns
+    -------
+    callable
+      Maps an (n, len(source_columns)) array to (n, len(output_columns)) float64.
+    """
+    source = list(source_columns or self.columns)
+    passthrough = np.array([source.index(c) for c in self.columns], dtype=np.intp)
+    operations = [(OPERATIONS[d["op"]], source.index(d["column"])) for d in self.derived]
+    n_pass, n_out = len(passthrough), len(self.output_columns)
+    scale = self.scale
+    mean, scale_ = self.mean_.copy(), self.scale_.copy()
+
+    def transform(raw: np.ndarray) -> np.ndarray:
+      raw = np.asarray(raw, dtype=np.float64)
+      out = np.empty((len(raw), n_out), dtype=np.float64)
+      np.take(raw, passthrough, axis=1, out=out[:, :n_pass])
+      if operations:
+        derived = np.empty((len(operations), len(raw)), dtype=np.float64)
+        for j, (operation, column) in enumerate(operations):
+          operation(raw[:, column], derived[j])
+        out[:, n_pass:] = derived.T
+      if scale:
+        # Same arithmetic as StandardScaler.transform, so legacy artifacts score identically
+        out -= mean
+        out /= scale_
+      return out
+
+    return transform
+
+  def _unscaled(self, X) -> np.ndarray:
+    scale, self.scale = self.scale, False
+    try:
+      return self.compile()(self._raw(X))
+    finally:
+      self.scale = scale
+
+  def partial_fit(self, X):
+    """
+    Merge a batch into the running mean and variance (Chan et al.).
+    """
+    values = self._unscaled(X)
+    n = len(values)
+    if not n:
+      return self
+    batch_mean = values.mean(axis=0)
+    batch_var = values.var(axis=0)
+    total = self.n_samples_ + n
+    delta = batch_mean - self.mean_
+    if self.n_samples_:
+      m2 = self.var_ * self.n_samples_ + batch_var * n + delta ** 2 * self.n_samples_ * n / total
+      self.mean_ = self.mean_ + delta * n / total
+      self.var_ = m2 / total
+    else:
+      self.mean_, self.var_ = batch_mean, batch_var
+    self.n_samples_ = total
+    self.scale_ = _scale_from_var(self.var_)
+    return self
+
+  def fit(self, X):
+    self.n_samples_ = 0
+    return self.partial_fit(X)
+
+  def transform(self, X) -> np.ndarray:
+    """
+    Transform a DataFrame or an array in `columns` order.
+    """
+    return self.compile()(self._raw(X))
+
+  def transform_frame(self, X: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(self.transform(X), columns=self.output_columns, index=X.index, copy=False)
+
+  def fit_parquet(self, path: Path, batch_size: int = 100_000, filters=None):
+    """
+    Learn scaling statistics in one streaming pass over a parquet dataset.
+    """
+    self.n_samples_ = 0
+    for batch in iter_credit_card_batches(path, batch_size=batch_size, columns=self.columns, filters=filters):
+      self.partial_fit(batch)
+    return self
+
+  def transform_parquet(
+    self,
+    source: Path,
+    output: Path,
+    batch_size: int = 100_000,
+    keep_columns: list = None,
+    filters=None
+  ) -> int:
+    """
+    Write the transformed features chunk by chunk, plus untouched `keep_columns` (e.g. the target).
+    """
+    keep_columns = list(keep_columns or [])
+    transform = self.compile()
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f".{output.name}.tmp")
+    rows = 0
+    writer = None
+    try:
+      for batch in iter_credit_card_batches(
+        source, batch_size=batch_size, columns=self.columns + keep_columns, filters=filters
+      ):
+        arrays = [pa.array(column) for column in transform(self._raw(batch)).T]
+        arrays += [pa.array(batch[c].to_numpy()) for c in keep_columns]
+        table = pa.Table.from_arrays(arrays, names=self.output_columns + keep_columns)
+        if writer is None:
+          writer = pq.ParquetWriter(tmp, table.schema)
+        writer.write_table(table)
+        rows += table.num_rows
+    finally:
+      if writer is not None:
+        writer.close()
+    if writer is not None:
+      tmp.replace(output)
+    return rows
+
+
+def artifact_pipeline(artifact: dict):
+  """
+  Feature pipeline of a model artifact: the bundled one (spec or object),
+  else one equivalent to its scaler, else None for raw-feature models.
+
+  The scaler may itself be a `FeaturePipeline`, as saved at `scaler_path`
+  by `scale_and_persist(..., feature_pipeline=...)`.
+  """
+  pipeline = artifact.get("feature_pipeline")
+  if isinstance(pipeline, dict):
+    pipeline = FeaturePipeline.from_spec(pipeline)
+  scaler = artifact.get("scaler")
+  if pipeline is None and scaler is not None:
+    pipeline = scaler if isinstance(scaler, FeaturePipeline) else FeaturePipeline.from_scaler(scaler)
+  return pipeline
+
+
+def _scale_from_var(var: np.ndarray) -> np.ndarray:
+  # Constant features are left unscaled, as in StandardScaler
+  scale = np.sqrt(var)
+  return np.where(scale < 10 * np.finfo(np.float64).eps, 1.0, scale)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  fit = commands.add_parser("fit", help="Fit scaling statistics in one streaming pass")
+  fit.add_argument("source", type=Path)
+  fit.add_argument("--derived", action="store_true", help="Add log-amount and hour-of-day")
+  fit.add_argument("--batch-size", type=int, default=100_000)
+  fit.add_argument("--output", type=Path, default=Path("models/feature_pipeline.joblib"))
+
+  transform = commands.add_parser("transform", help="Transform a parquet dataset chunk by chunk")
+  transform.add_argument("source", type=Path)
+  transform.add_argument("output", type=Path)
+  transform.add_argument("--pipeline", type=Path, default=Path("models/feature_pipeline.joblib"))
+  transform.add_argument("--keep", nargs="*", default=["Class"], help="Columns copied unchanged")
+  transform.add_argument("--batch-size", type=int, default=100_000)
+  args = parser.parse_args()
+
+  if args.command == "fit":
+    pipeline = FeaturePipeline(derived=DEFAULT_DERIVED if args.derived else None)
+    pipeline.fit_parquet(args.source, batch_size=args.batch_size)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(pipeline, args.output)
+    print(json.dumps({"output": str(args.output), "rows": pipeline.n_samples_, "features": pipeline.output_columns}))
+    return
+
+  pipeline = joblib.load(args.pipeline)
+  rows = pipeline.transform_parquet(args.source, args.output, args.batch_size, keep_columns=args.keep)
+  print(json.dumps({"output": str(args.output), "rows": rows}))
+
+
+if __name__ == "__main__":
+  main()
@@ -1,6 +1,134 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from pathlib import Path
+from typing import Iterator
 
-def load_credit_card_data(path: Path) -> pd.DataFrame:
-  return pd.read_parquet(path)
 
+def time_range_filter(start: float = None, end: float = None, column: str = "Time"):
+  """
+  Build a predicate selecting rows with `start <= column < end`.
+
+  Row groups whose statistics fall entirely outside the range are skipped
+  without being read.
+
+  Parameters
+  ----------
+  start : float, optional
+    Inclusive lower bound. Unbounded when omitted.
+  end : float, optional
+    Exclusive upper bound. Unbounded when omitted.
+  column : str, optional
+    Column the range applies to.
+
+  Returns
+  ----------
+  pyarrow.dataset.Expression or None
+    Filter expression, or None when both bounds are omitted.
+  """
+  expr = None
+  if start is not None:
+    expr = ds.field(column) >= start
+  if end is not None:
+    upper = ds.field(column) < end
+    expr = upper if expr is None else expr & upper
+  return expr
+
+
+def _to_expression(filters):
+  if filters is None or isinstance(filters, ds.Expression):
+    return filters
+  # DNF list-of-tuples as accepted by pandas.read_parquet
+  return pq.filters_to_expression(filters)
+
+
+def _projection(dataset: ds.Dataset, columns, downcast: bool):
+  """
+  Build the scanner projection, keeping pandas index columns and casting
+  float64 columns to float32 when `downcast` is set.
+  """
+  schema = dataset.schema
+  metadata = schema.pandas_metadata or {}
+  index_columns = [c for c in metadata.get("index_columns", []) if isinstance(c, str)]
+
+  names = list(schema.names) if columns is None else list(columns)
+  names += [c for c in index_columns if c not in names]
+
+  if not downcast:
+    return names
+
+  projection = {}
+  for name in names:
+    field = ds.field(name)
+    if schema.field(name).type == pa.float64() and name not in index_columns:
+      field = field.cast(pa.float32())
+    projection[name] = field
+  return projection
+
+
+def _dataset(path: Path) -> ds.Dataset:
+  return ds.dataset(path, format="parquet")
+
+
+def load_credit_card_data(
+  path: Path,
+  columns: list = None,
+  filters=None,
+  downcast: bool = False,
+) -> pd.DataFrame:
+  """
+  Load a parquet file or directory of parquet files into a DataFrame.
+
+  Parameters
+  ----------
+  path : pathlib.Path
+    Parquet file or directory (partitioned dataset).
+  columns : list of str, optional
+    Columns to read. Other columns are never decoded.
+  filters : pyarrow.dataset.Expression or list of tuples, optional
+    Row predicate pushed down to row-group statistics, e.g.
+    `time_range_filter(0, 3600)` or `[("Time", "<", 3600)]`.
+  downcast : bool, optional
+    Cast float64 columns to float32 while scanning, halving feature memory.
+
+  Returns
+  ----------
+  pandas.DataFrame
+    Loaded data.
+  """
+  dataset = _dataset(path)
+  table = dataset.to_table(
+    columns=_projection(dataset, columns, downcast),
+    filter=_to_expression(filters),
+  )
+  return table.to_pandas()
+
+
+def iter_credit_card_batches(
+  path: Path,
+  batch_size: int = 100_000,
+  columns: list = None,
+  filters=None,
+  downcast: bool = False,
+) -> Iterator[pd.DataFrame]:
+  """
+  Stream a parquet dataset as DataFrames of at most `batch_size` rows.
+
+  Only one batch is materialized at a time, so datasets larger than memory
+  can be processed. Parameters are the same as `load_credit_card_data`.
+
+  Yields
+  ----------
+  pandas.DataFrame
+    Next batch of rows.
+  """
+  dataset = _dataset(path)
+  scanner = dataset.scanner(
+    columns=_projection(dataset, columns, downcast),
+    filter=_to_expression(filters),
+    batch_size=batch_size,
+  )
+  for batch in scanner.to_batches():
+    if batch.num_rows:
+      yield batch.to_pandas()
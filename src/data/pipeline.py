@@ -0,0 +1,184 @@
+import filecmp
+import logging
+import shutil
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from src.data.cache import StageCache, fingerprint_data
+from src.data.preprocess import (
+  apply_random_undersampling,
+  apply_smote,
+  apply_smote_tomek,
+  scale_and_persist,
+  split_features_target,
+  startified_train_val_test_split,
+)
+
+logger = logging.getLogger(__name__)
+
+RESAMPLERS = {
+  "smote": apply_smote,
+  "undersample": apply_random_undersampling,
+  "smote_tomek": apply_smote_tomek,
+}
+
+_SPLIT_OUTPUTS = ["X_train", "X_val", "X_test", "y_train", "y_val", "y_test"]
+_SCALE_OUTPUTS = ["X_train_scaled", "X_val_scaled", "X_test_scaled", "scaler"]
+
+
+def _no_resampling(X, y, random_state):
+  return X, y
+
+
+def _restore_scaler(cache: StageCache, key: str, scaler_path: Path):
+  """
+  Copy the cached scaler to `scaler_path` unless an identical file is already there.
+  """
+  cached = cache.path(key, "scaler")
+  if scaler_path.exists() and filecmp.cmp(cached, scaler_path, shallow=False):
+    return
+  scaler_path.parent.mkdir(parents=True, exist_ok=True)
+  shutil.copyfile(cached, scaler_path)
+
+
+def run_preprocessing_pipeline(
+  df: pd.DataFrame,
+  target_col: str,
+  random_state: int,
+  scaler_path: Path,
+  cache_dir: Path,
+  resampling: str = None,
+  test_size: float = 0.3,
+  val_fraction_of_temp: float = 0.5,
+):
+  """
+  Run split -> stratified split -> scale -> resample with stage-level caching.
+
+  Every stage is keyed on a hash of its inputs, parameters and source code.
+  The keys are chained (a stage's input fingerprint is the key of the stage
+  before it), so the raw data is hashed once and all keys are known before
+  any work starts. Execution resumes at the first stage whose key is missing
+  from the cache; earlier stages are neither recomputed nor, unless their
+  outputs are needed, read back from disk.
+
+  Parameters
+  ----------
+  df : pandas.DataFrame
+    Raw input data including the target column.
+  target_col : str
+    Name of the target column.
+  random_state : int
+    Seed used for splitting and resampling.
+  scaler_path : pathlib.Path
+    Path where the fitted scaler is persisted. It is only rewritten when the
+    scaling stage is recomputed or the file differs from the cached scaler.
+  cache_dir : pathlib.Path
+    Root directory of the stage cache.
+  resampling : str, optional
+    One of "smote", "undersample", "smote_tomek" or None for no resampling.
+  test_size : float, optional
+    Fraction of the dataset reserved for validation and test splits.
+  val_fraction_of_temp : float, optional
+    Fraction of the temporary split used for validation.
+
+  Returns
+  ----------
+  dict
+    Keys "X_train", "y_train" (resampled), "X_val", "y_val", "X_test",
+    "y_test" (scaled features) and "executed", the list of stages that were
+    actually computed during this call.
+  """
+  if resampling is not None and resampling not in RESAMPLERS:
+    raise ValueError(f"Unknown resampling strategy: {resampling}")
+
+  cache = StageCache(cache_dir)
+  resampler = RESAMPLERS.get(resampling, _no_resampling)
+
+  k_target = cache.stage_key(
+    "split_features_target", split_features_target,
+    inputs=[fingerprint_data(df)],
+    params={"target_col": target_col},
+  )
+  k_split = cache.stage_key(
+    "train_val_test_split", startified_train_val_test_split,
+    inputs=[k_target],
+    params={
+      "random_state": random_state,
+      "test_size": test_size,
+      "val_fraction_of_temp": val_fraction_of_temp,
+    },
+  )
+  k_scale = cache.stage_key(
+    "scale", scale_and_persist,
+    inputs=[k_split],
+    params={},
+  )
+  k_resample = cache.stage_key(
+    "resample", resampler,
+    inputs=[k_scale],
+    params={"strategy": resampling, "random_state": random_state},
+  )
+
+  executed = []
+
+  # Walk backwards to find the last stage that is already cached.
+  hit_scale = cache.has(k_scale)
+  hit_split = hit_scale or cache.has(k_split)
+  hit_target = hit_split or cache.has(k_target)
+
+  if not hit_target:
+    X, y = split_features_target(df, target_col)
+    cache.save(k_target, {"X": X, "y": y})
+    executed.append("split_features_target")
+
+  if not hit_split:
+    if hit_target:
+      target = cache.load(k_target)
+      X, y = target["X"], target["y"]
+    split = startified_train_val_test_split(
+      X, y,
+      random_state=random_state,
+      test_size=test_size,
+      val_fraction_of_temp=val_fraction_of_temp,
+    )
+    split = dict(zip(_SPLIT_OUTPUTS, split))
+    cache.save(k_split, split)
+    executed.append("train_val_test_split")
+  else:
+    split = cache.load(k_split, names=["y_train", "y_val", "y_test"])
+
+  if not hit_scale:
+    if hit_split:
+      split.update(cache.load(k_split, names=["X_train", "X_val", "X_test"]))
+    scaled = scale_and_persist(split["X_train"], split["X_val"], split["X_test"], scaler_path)
+    scaled = dict(zip(_SCALE_OUTPUTS, scaled + (joblib.load(scaler_path),)))
+    cache.save(k_scale, scaled)
+    executed.append("scale")
+  else:
+    scaled = cache.load(k_scale, names=["X_val_scaled", "X_test_scaled"])
+  # Keep scaler_path byte-identical to the cache entry so later hits never rewrite it.
+  _restore_scaler(cache, k_scale, Path(scaler_path))
+
+  if cache.has(k_resample):
+    resampled = cache.load(k_resample)
+  else:
+    if "X_train_scaled" not in scaled:
+      scaled.update(cache.load(k_scale, names=["X_train_scaled"]))
+    X_res, y_res = resampler(scaled["X_train_scaled"], split["y_train"], random_state)
+    resampled = {"X_train": X_res, "y_train": y_res}
+    cache.save(k_resample, resampled)
+    executed.append("resample")
+
+  logger.info(f"Preprocessing stages executed: {executed or 'none (all cached)'}")
+
+  return {
+    "X_train": resampled["X_train"],
+    "y_train": resampled["y_train"],
+    "X_val": scaled["X_val_scaled"],
+    "y_val": split["y_val"],
+    "X_test": scaled["X_test_scaled"],
+    "y_test": split["y_test"],
+    "executed": executed,
+  }
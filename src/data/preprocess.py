@@ -1,11 +1,19 @@
+import os
+
+import numpy as np
 import pandas as pd
 import joblib 
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # preprocessing and feature engineering
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
+from src.data.features import FeaturePipeline
+from src.data.load import iter_credit_card_batches
+
 # handling imbalanced data 
 from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
@@ -103,12 +111,15 @@ def scale_and_persist(
     X_val: pd.DataFrame,
     X_test: pd.DataFrame,
     scaler_path: Path,
+    feature_pipeline: FeaturePipeline = None,
 ):
   """
   Scale features using statistics learned from the training data. 
 
   The scaler is fit exclusively on the training set to prevent data leakage
-  and is persisted for consistent use during inference. 
+  and is persisted for consistent use during inference. The scaled arrays
+  are wrapped without copying. For data that does not fit in memory, use
+  `split_and_scale_out_of_core`.
 
   Parameters
   -------------
@@ -120,6 +131,9 @@ def scale_and_persist(
     Test feature matrix. 
   scaler_path : pathlib.Path 
     Path where the fitted scaler will be saved. 
+  feature_pipeline : FeaturePipeline, optional
+    Pipeline fitted and applied instead of a plain scaler, so derived
+    features match serving exactly; it is saved at `scaler_path`.
 
   Returns
   -------------
@@ -130,6 +144,11 @@ def scale_and_persist(
   X_test_scaled : pandas.DataFrame
     Scaled test features. 
   """
+  if feature_pipeline is not None:
+    feature_pipeline.fit(X_train)
+    joblib.dump(feature_pipeline, scaler_path)
+    return tuple(feature_pipeline.transform_frame(X) for X in (X_train, X_val, X_test))
+
   scaler = StandardScaler()
   X_train_scaled = scaler.fit_transform(X_train)
   X_val_scaled = scaler.transform(X_val)
@@ -138,20 +157,188 @@ def scale_and_persist(
   joblib.dump(scaler, scaler_path)
 
   X_train_scaled = pd.DataFrame(
-    X_train_scaled, columns=X_train.columns, index=X_train.index
+    X_train_scaled, columns=X_train.columns, index=X_train.index, copy=False
   )
 
   X_val_scaled = pd.DataFrame(
-    X_val_scaled, columns=X_val.columns, index=X_val.index
+    X_val_scaled, columns=X_val.columns, index=X_val.index, copy=False
   )
 
   X_test_scaled = pd.DataFrame(
-    X_test_scaled, columns=X_test.columns, index=X_test.index
+    X_test_scaled, columns=X_test.columns, index=X_test.index, copy=False
   )
 
   return X_train_scaled, X_val_scaled, X_test_scaled
 
 
+SPLIT_NAMES = ("train", "val", "test")
+
+
+def hash_split_assignment(
+  df: pd.DataFrame,
+  random_state: int,
+  test_size: float = 0.3,
+  val_fraction_of_temp: float = 0.5,
+  target_col: str = None
+) -> np.ndarray:
+  """
+  Assign rows to train (0), validation (1) or test (2) from a hash of their features.
+
+  Each row's hash, salted with `random_state`, is mapped to a uniform
+  number that alone decides its split. The assignment is independent of
+  row order and batching, so a row keeps its split across runs and as
+  history grows, and identical rows never straddle splits. The target
+  column is left out of the hash, so a corrected label (e.g. a late
+  chargeback) never moves a row; being independent of the label, every
+  class is split in the same proportions (in expectation), as with
+  `startified_train_val_test_split`.
+
+  Parameters
+  ----------
+  df : pandas.DataFrame
+    Rows to assign.
+  random_state : int
+    Salt of the hash.
+  test_size : float, optional
+    Fraction of rows reserved for validation and test splits.
+  val_fraction_of_temp : float, optional
+    Fraction of the reserved rows assigned to the test split, matching
+    `startified_train_val_test_split`.
+  target_col : str, optional
+    Label column of `df`, excluded from the hash.
+
+  Returns
+  ----------
+  numpy.ndarray
+    Split code per row.
+  """
+  if target_col is not None and target_col in df:
+    df = df.drop(columns=[target_col])
+  hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+  # Salt and remix (MurmurHash3 finalizer); `hash_key` only applies to strings
+  h = hashes ^ np.uint64((random_state * 0x9E3779B97F4A7C15) % 2 ** 64)
+  h ^= h >> np.uint64(33)
+  h *= np.uint64(0xFF51AFD7ED558CCD)
+  h ^= h >> np.uint64(33)
+  h *= np.uint64(0xC4CEB9FE1A85EC53)
+  h ^= h >> np.uint64(33)
+  u = (h >> np.uint64(11)) * 2.0 ** -53
+  bounds = [1 - test_size, 1 - test_size * val_fraction_of_temp]
+  return np.searchsorted(bounds, u, side="right").astype(np.int8)
+
+
+def _iter_batches(source, batch_size: int):
+  """
+  Start a pass over a parquet path or a callable returning an iterable of DataFrames.
+  """
+  if callable(source):
+    return source()
+  return iter_credit_card_batches(source, batch_size=batch_size)
+
+
+def split_and_scale_out_of_core(
+  source,
+  output_dir: Path,
+  scaler_path: Path,
+  target_col: str,
+  random_state: int,
+  test_size: float = 0.3,
+  val_fraction_of_temp: float = 0.5,
+  batch_size: int = 100_000,
+  feature_pipeline: FeaturePipeline = None,
+) -> dict:
+  """
+  Split and scale a dataset larger than memory in two streaming passes.
+
+  The first pass assigns splits with `hash_split_assignment` and fits the
+  scaler on the training rows with `StandardScaler.partial_fit`. The second
+  pass assigns the same splits again, scales every batch and appends it to
+  `X_<split>.parquet` / `y_<split>.parquet` in `output_dir`. Only one batch
+  is held in memory, so peak memory does not grow with the history.
+
+  Parameters
+  ----------
+  source : pathlib.Path or callable
+    Parquet file or dataset directory, or a callable returning a fresh
+    iterable of DataFrames for each pass.
+  output_dir : pathlib.Path
+    Directory of the scaled split files.
+  scaler_path : pathlib.Path
+    Path where the fitted scaler will be saved.
+  target_col : str
+    Name of the target column.
+  random_state : int
+    Salt of the split hash.
+  test_size : float, optional
+    Fraction of rows reserved for validation and test splits.
+  val_fraction_of_temp : float, optional
+    Fraction of the reserved rows assigned to the test split.
+  batch_size : int, optional
+    Rows per batch when reading a parquet source.
+  feature_pipeline : FeaturePipeline, optional
+    Pipeline streamed through both passes instead of a plain scaler; it is
+    saved at `scaler_path`.
+
+  Returns
+  ----------
+  dict
+    Rows and positives per split, and the paths written.
+  """
+  output_dir = Path(output_dir)
+  split_kwargs = dict(
+    random_state=random_state, test_size=test_size, val_fraction_of_temp=val_fraction_of_temp, target_col=target_col
+  )
+
+  if feature_pipeline is None:
+    scaler = StandardScaler()
+  else:
+    scaler = feature_pipeline
+    scaler.n_samples_ = 0
+  for batch in _iter_batches(source, batch_size):
+    train = batch[hash_split_assignment(batch, **split_kwargs) == 0]
+    if len(train):
+      scaler.partial_fit(train.drop(columns=[target_col]))
+  if not (hasattr(scaler, "mean_") if feature_pipeline is None else scaler.n_samples_):
+    raise ValueError("No rows assigned to the training split")
+
+  output_dir.mkdir(parents=True, exist_ok=True)
+  writers = {}
+  rows = dict.fromkeys(SPLIT_NAMES, 0)
+  positives = dict.fromkeys(SPLIT_NAMES, 0)
+  try:
+    for batch in _iter_batches(source, batch_size):
+      codes = hash_split_assignment(batch, **split_kwargs)
+      X, y = split_features_target(batch, target_col)
+      if feature_pipeline is None:
+        X_scaled = pd.DataFrame(scaler.transform(X), columns=X.columns, copy=False)
+      else:
+        X_scaled = feature_pipeline.transform_frame(X)
+      for code, name in enumerate(SPLIT_NAMES):
+        mask = codes == code
+        if not mask.any():
+          continue
+        for prefix, part in (("X", X_scaled[mask]), ("y", y[mask].to_frame())):
+          table = pa.Table.from_pandas(part, preserve_index=False)
+          key = f"{prefix}_{name}"
+          if key not in writers:
+            writers[key] = pq.ParquetWriter(output_dir / f".{key}.parquet.tmp", table.schema)
+          writers[key].write_table(table)
+        rows[name] += int(mask.sum())
+        positives[name] += int(y[mask].sum())
+  finally:
+    for writer in writers.values():
+      writer.close()
+
+  # Publish complete files only
+  paths = {}
+  for key in writers:
+    paths[key] = output_dir / f"{key}.parquet"
+    os.replace(output_dir / f".{key}.parquet.tmp", paths[key])
+  joblib.dump(scaler, scaler_path)
+
+  return {"rows": rows, "positives": positives, "paths": paths, "scaler_path": Path(scaler_path)}
+
+
 def ensure_series(y: pd.Series):
   """
   Ensure target is a 1D pandas Series.
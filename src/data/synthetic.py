@@ -0,0 +1,270 @@
+"""
+Synthetic credit card transactions from a per-class Gaussian copula.
+
+Usage:
+  python -m src.data.synthetic fit --data-dir data/interim --output models/synthetic_params.npz
+  python -m src.data.synthetic generate --params models/synthetic_params.npz -n 1000000 \
+    --fraud-rate 0.01 --output data/synthetic/transactions.parquet
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.special import ndtr, ndtri
+from scipy.stats import rankdata
+
+from src.api.schemas import FEATURE_COLUMNS
+
+
+def _nearest_correlation(corr: np.ndarray, min_eigenvalue: float = 1e-6) -> np.ndarray:
+  """
+  Clip the spectrum so the matrix is positive definite, keeping a unit diagonal.
+  """
+  values, vectors = np.linalg.eigh(corr)
+  fixed = (vectors * np.clip(values, min_eigenvalue, None)) @ vectors.T
+  scale = np.sqrt(np.diag(fixed))
+  return fixed / np.outer(scale, scale)
+
+
+def fit_synthetic_params(
+  X: pd.DataFrame,
+  y: pd.Series,
+  features: list = None,
+  n_knots: int = 1024,
+  z_limit: float = 5.0
+) -> dict:
+  """
+  Fit a Gaussian copula per class.
+
+  The dependence between features is the correlation of their normal
+  scores. Each feature keeps its empirical marginal, tabulated as the
+  quantile at `Phi(z)` on `n_knots` evenly spaced normal scores in
+  `[-z_limit, z_limit]`, so sampling maps a correlated normal draw to a
+  feature value with one linear lookup and no CDF evaluation. Fit on
+  unscaled features, as the API receives them (the `X_train` split in
+  `data/interim`; `data/processed` holds the standardized splits).
+
+  Parameters
+  ----------
+  X : pandas.DataFrame
+    Feature matrix.
+  y : pandas.Series
+    Binary class labels.
+  features : list of str, optional
+    Columns to model; defaults to the API feature columns.
+  n_knots : int, optional
+    Grid points per marginal.
+  z_limit : float, optional
+    Normal scores beyond this are clipped to the observed extremes.
+
+  Returns
+  ----------
+  params : dict
+    `features`, `classes`, `prior`, `z_limit` and per-class `knots_<c>`
+    (features x knots) and `cholesky_<c>` arrays.
+  """
+  features = list(features or FEATURE_COLUMNS)
+  y = np.asarray(y)
+  classes = np.unique(y)
+  params = {
+    "features": np.array(features),
+    "classes": classes,
+    "prior": np.array([(y == c).mean() for c in classes]),
+    "z_limit": np.array(z_limit),
+  }
+  levels = ndtr(np.linspace(-z_limit, z_limit, n_knots))
+
+  for c in classes:
+    values = X.loc[y == c, features].to_numpy(dtype=np.float64)
+    params[f"knots_{c}"] = np.quantile(values, levels, axis=0).T
+
+    scores = ndtri((rankdata(values, axis=0) - 0.5) / len(values))
+    corr = np.corrcoef(scores, rowvar=False)
+    params[f"cholesky_{c}"] = np.linalg.cholesky(_nearest_correlation(np.nan_to_num(corr)))
+
+  return params
+
+
+def save_synthetic_params(params: dict, path: Path):
+  """
+  Save copula parameters as a compressed `.npz` file.
+  """
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  np.savez_compressed(path, **params)
+
+
+def load_synthetic_params(path: Path) -> dict:
+  """
+  Load copula parameters saved with `save_synthetic_params`.
+  """
+  with np.load(path) as data:
+    params = {key: data[key] for key in data.files}
+  params["features"] = [str(f) for f in params["features"]]
+  return params
+
+
+def _sample_class(params: dict, c, n: int, rng: np.random.Generator) -> np.ndarray:
+  """
+  Draw `n` rows of class `c` as a float32 (rows x features) view.
+
+  Work is done feature-major and in place, so each feature's lookup
+  table stays in cache and the result needs no copy to become a frame.
+  """
+  knots = params[f"knots_{c}"].astype(np.float32)
+  n_features, n_knots = knots.shape
+  z_limit = np.float32(params["z_limit"])
+  slopes = np.diff(knots, axis=1, append=knots[:, -1:])
+
+  # Correlated normal scores -> fractional grid positions
+  position = params[f"cholesky_{c}"].astype(np.float32) @ rng.standard_normal(
+    (n_features, n), dtype=np.float32
+  )
+  position += z_limit
+  position *= np.float32((n_knots - 1) / (2 * z_limit))
+  np.clip(position, 0, np.float32(n_knots - 1.001), out=position)
+
+  lower = position.astype(np.int32)
+  position -= lower
+  for f in range(n_features):
+    position[f] *= slopes[f].take(lower[f])
+    position[f] += knots[f].take(lower[f])
+  return position.T
+
+
+def generate_transactions(
+  params: dict,
+  n: int,
+  fraud_rate: float = None,
+  random_state=None,
+  include_label: bool = True,
+  target_col: str = "Class"
+) -> pd.DataFrame:
+  """
+  Draw `n` synthetic transactions.
+
+  Parameters
+  ----------
+  params : dict
+    Output of `fit_synthetic_params` or `load_synthetic_params`.
+  n : int
+    Rows to generate.
+  fraud_rate : float, optional
+    Expected share of class 1 rows; defaults to the fitted prior.
+  random_state : int or numpy.random.Generator, optional
+    Seed or generator.
+  include_label : bool, optional
+    Add the class label as `target_col`.
+
+  Returns
+  ----------
+  df : pandas.DataFrame
+    Rows with the fitted feature columns, in random class order.
+  """
+  rng = np.random.default_rng(random_state)
+  classes = list(params["classes"])
+  if fraud_rate is None:
+    fraud_rate = params["prior"][classes.index(1)]
+
+  # Draw every row as legitimate, then overwrite the (few) fraud rows
+  fraud_rows = rng.choice(n, rng.binomial(n, fraud_rate), replace=False)
+  values = _sample_class(params, 0, n, rng)
+  values[fraud_rows] = _sample_class(params, 1, len(fraud_rows), rng)
+  labels = np.zeros(n, dtype=np.int8)
+  labels[fraud_rows] = 1
+
+  df = pd.DataFrame(values, columns=params["features"], copy=False)
+  if include_label:
+    df[target_col] = labels
+  return df
+
+
+def iter_synthetic_batches(
+  params: dict,
+  n: int,
+  batch_size: int = 100_000,
+  fraud_rate: float = None,
+  random_state=None,
+  include_label: bool = True
+):
+  """
+  Yield `n` synthetic transactions as DataFrames of at most `batch_size` rows.
+  """
+  rng = np.random.default_rng(random_state)
+  for start in range(0, n, batch_size):
+    yield generate_transactions(
+      params, min(batch_size, n - start), fraud_rate, rng, include_label
+    )
+
+
+def write_synthetic_parquet(path: Path, params: dict, n: int, batch_size: int = 1_000_000, **kwargs):
+  """
+  Stream `n` synthetic transactions into one parquet file.
+  """
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  writer = None
+  try:
+    for batch in iter_synthetic_batches(params, n, batch_size, **kwargs):
+      table = pa.Table.from_pandas(batch, preserve_index=False)
+      if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+      writer.write_table(table)
+  finally:
+    if writer is not None:
+      writer.close()
+
+
+def write_synthetic_ndjson(path: Path, params: dict, n: int, batch_size: int = 100_000, **kwargs):
+  """
+  Write `n` synthetic transactions as newline-delimited JSON, one `Transaction` per line.
+  """
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with open(path, "w") as f:
+    for batch in iter_synthetic_batches(params, n, batch_size, **kwargs):
+      f.write(batch.to_json(orient="records", lines=True))
+      f.write("\n")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  fit = commands.add_parser("fit", help="Fit copula parameters from an unscaled split")
+  fit.add_argument("--data-dir", type=Path, default=Path("data/interim"), help="Unscaled X_/y_ split files")
+  fit.add_argument("--split", default="train")
+  fit.add_argument("--n-knots", type=int, default=1024)
+  fit.add_argument("--output", type=Path, default=Path("models/synthetic_params.npz"))
+
+  generate = commands.add_parser("generate", help="Generate synthetic transactions")
+  generate.add_argument("--params", type=Path, default=Path("models/synthetic_params.npz"))
+  generate.add_argument("-n", "--rows", type=int, default=1_000_000)
+  generate.add_argument("--fraud-rate", type=float)
+  generate.add_argument("--seed", type=int)
+  generate.add_argument("--format", choices=["parquet", "ndjson"], default="parquet")
+  generate.add_argument("--output", type=Path, required=True)
+  args = parser.parse_args()
+
+  if args.command == "fit":
+    X = pd.read_parquet(args.data_dir / f"X_{args.split}.parquet")
+    y = pd.read_parquet(args.data_dir / f"y_{args.split}.parquet").iloc[:, 0]
+    if "Amount" in X and (X["Amount"] < 0).any():
+      # Standardized features would be scaled a second time by the API
+      parser.error(f"{args.data_dir} holds scaled features (negative Amount); pass the unscaled split")
+    params = fit_synthetic_params(X, y, n_knots=args.n_knots)
+    save_synthetic_params(params, args.output)
+    print(json.dumps({"output": str(args.output), "prior": params["prior"].tolist()}))
+    return
+
+  params = load_synthetic_params(args.params)
+  writer = write_synthetic_parquet if args.format == "parquet" else write_synthetic_ndjson
+  writer(args.output, params, args.rows, fraud_rate=args.fraud_rate, random_state=args.seed)
+
+
+if __name__ == "__main__":
+  main()
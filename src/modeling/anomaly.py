@@ -0,0 +1,319 @@
+"""
+Streaming half-space trees for unsupervised anomaly scoring.
+
+The detector scores raw request features, so it is fitted on the
+unscaled split in `data/interim`, not the standardized one in
+`data/processed`.
+
+Usage:
+    python -m src.modeling.anomaly --data-dir data/interim --output models/anomaly_detector.joblib
+"""
+import argparse
+import json
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+class HalfSpaceTrees:
+    """
+    Streaming half-space trees (Tan, Ting & Liu, 2011), scored in batched NumPy.
+
+    Every tree is a complete binary tree of depth `depth` that halves a
+    randomly perturbed work space along a random feature at each node, so
+    the tree structure is independent of the data and only node masses are
+    learned. A row's mass score sums, over trees, the reference mass of the
+    deepest node on its path holding at least `size_limit * window_size`
+    rows, weighted by `2 ** depth`: rows in sparsely populated regions get a
+    low mass score. `score` maps it to the share of the training rows that
+    looked more normal, so 0.999 is more anomalous than 99.9% of the
+    legitimate transactions the detector was fitted on.
+
+    Masses are learned over tumbling windows: rows passed to `partial_fit`
+    count towards the latest window, and once it holds `window_size` rows
+    it becomes the reference used for scoring. The detector thereby follows
+    the live feed without labels. All trees are traversed level by level
+    over the whole batch with flat `take` lookups.
+
+    Parameters
+    ----------
+    n_trees : int, optional
+        Number of trees.
+    depth : int, optional
+        Depth of every tree.
+    window_size : int, optional
+        Rows per mass window.
+    size_limit : float, optional
+        Minimum reference mass of a scoring node, as a fraction of `window_size`.
+    random_state : int, optional
+        Seed for the tree structure.
+    """
+
+    def __init__(
+        self,
+        n_trees: int = 25,
+        depth: int = 10,
+        window_size: int = 10_000,
+        size_limit: float = 0.01,
+        random_state: int = None,
+    ):
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window_size = window_size
+        self.size_limit = size_limit
+        self.random_state = random_state
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def n_nodes(self) -> int:
+        return 2 ** (self.depth + 1) - 1
+
+    def _build(self, low: np.ndarray, high: np.ndarray, rng: np.random.Generator):
+        """
+        Draw the split feature and midpoint of every internal node, level by level.
+        """
+        n_features = len(low)
+        n_internal = 2 ** self.depth - 1
+        split_feature = np.empty((self.n_trees, n_internal), dtype=np.int32)
+        split_value = np.empty((self.n_trees, n_internal), dtype=np.float32)
+
+        # Perturbed work space: a random pivot +/- twice its largest distance to the range ends
+        pivot = rng.uniform(low, high, size=(self.n_trees, n_features))
+        half = 2 * np.maximum(pivot - low, high - pivot)
+        lower = (pivot - half)[:, None, :]
+        upper = (pivot + half)[:, None, :]
+
+        for level in range(self.depth):
+            first, count = 2 ** level - 1, 2 ** level
+            dims = rng.integers(n_features, size=(self.n_trees, count, 1))
+            mid = (np.take_along_axis(lower, dims, axis=2) + np.take_along_axis(upper, dims, axis=2)) / 2
+            split_feature[:, first:first + count] = dims[..., 0]
+            split_value[:, first:first + count] = mid[..., 0]
+
+            # Children in heap order: the left child keeps the lower half, the right the upper
+            lower, upper = np.repeat(lower, 2, axis=1), np.repeat(upper, 2, axis=1)
+            np.put_along_axis(upper[:, 0::2], dims, mid, axis=2)
+            np.put_along_axis(lower[:, 1::2], dims, mid, axis=2)
+
+        self.split_feature_ = split_feature.ravel()
+        self.split_value_ = split_value.ravel()
+        self._depth_weight = np.exp2(np.arange(self.depth + 1)).astype(np.float32)
+
+    def _matrix(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features_]
+        return np.asarray(X, dtype=np.float32)
+
+    def _paths(self, X: np.ndarray) -> np.ndarray:
+        """
+        Node ids (flat over all trees) visited by every row: (depth + 1, n_trees, n_rows).
+        """
+        n = len(X)
+        values = np.ascontiguousarray(X.T).ravel()
+        columns = np.arange(n, dtype=np.int32)
+        feature_offset = self.split_feature_ * np.int32(n)
+        internal_offset = np.arange(self.n_trees, dtype=np.int32)[:, None] * np.int32(2 ** self.depth - 1)
+
+        paths = np.empty((self.depth + 1, self.n_trees, n), dtype=np.int32)
+        node = np.zeros((self.n_trees, n), dtype=np.int32)
+        paths[0] = node
+        for level in range(self.depth):
+            index = node + internal_offset
+            right = values.take(feature_offset.take(index) + columns) > self.split_value_.take(index)
+            node *= 2
+            node += 1
+            node += right
+            paths[level + 1] = node
+
+        paths += np.arange(self.n_trees, dtype=np.int32)[:, None] * np.int32(self.n_nodes)
+        return paths
+
+    def _leaf_counts(self, paths: np.ndarray) -> np.ndarray:
+        """
+        Rows per leaf, (n_trees, 2 ** depth); inner masses follow by summation.
+        """
+        n_internal = 2 ** self.depth - 1
+        shift = (np.arange(1, self.n_trees + 1, dtype=np.int32) * np.int32(n_internal))[:, None]
+        counts = np.bincount((paths[-1] - shift).ravel(), minlength=self.n_trees * (n_internal + 1))
+        return counts.reshape(self.n_trees, -1).astype(np.float32)
+
+    def _node_mass(self, leaf_mass: np.ndarray) -> np.ndarray:
+        """
+        Masses of all nodes in heap order, flattened over trees.
+        """
+        mass = np.empty((self.n_trees, self.n_nodes), dtype=np.float32)
+        mass[:, 2 ** self.depth - 1:] = leaf_mass
+        for level in reversed(range(self.depth)):
+            first, count = 2 ** level - 1, 2 ** level
+            children = mass[:, 2 * first + 1:2 * first + 1 + 2 * count]
+            mass[:, first:first + count] = children.reshape(self.n_trees, count, 2).sum(axis=2)
+        return mass.ravel()
+
+    def _mass_score(self, paths: np.ndarray) -> np.ndarray:
+        masses = self.reference_mass_.take(paths)
+        # Masses only shrink along a path, so the terminal depth is a count
+        dense = masses >= np.float32(self.size_limit * self.window_size)
+        terminal = np.minimum(dense.sum(axis=0, dtype=np.int32), self.depth)
+        node_mass = np.take_along_axis(masses, terminal[None], axis=0)[0]
+        node_mass *= self._depth_weight.take(terminal)
+        return node_mass.sum(axis=0, dtype=np.float64)
+
+    def _calibrated(self, mass_score: np.ndarray) -> np.ndarray:
+        # Share of calibration rows with at least this mass score
+        ranks = np.searchsorted(self.calibration_, mass_score, side="left")
+        return 1.0 - ranks / len(self.calibration_)
+
+    def fit(self, X, y=None, n_calibration: int = 100_000):
+        """
+        Build the trees and learn reference masses from legitimate transactions.
+
+        Parameters
+        ----------
+        X : pandas.DataFrame
+            Unscaled features. Every column except `Time`, which only grows,
+            is modeled.
+        y : array-like, optional
+            Labels; only rows with label 0 are used when given.
+        n_calibration : int, optional
+            Rows scored to calibrate `score`.
+
+        Returns
+        -------
+        HalfSpaceTrees
+            The fitted detector.
+        """
+        if y is not None:
+            X = X[np.asarray(y) == 0]
+        self.features_ = [c for c in X.columns if c != "Time"]
+        values = self._matrix(X)
+
+        # Quantile bounds keep heavy tails (e.g. Amount) from wasting splits
+        low, high = np.quantile(values, [0.001, 0.999], axis=0)
+        high = np.where(high > low, high, low + 1.0)
+        rng = np.random.default_rng(self.random_state)
+        self._build(low, high, rng)
+
+        paths = self._paths(values)
+        # Rescale so training masses are comparable with one live window
+        self.reference_mass_ = self._node_mass(self._leaf_counts(paths) * (self.window_size / len(values)))
+        self.latest_mass_ = np.zeros((self.n_trees, 2 ** self.depth), dtype=np.float32)
+        self.latest_count_ = 0
+        self.windows_ = 0
+
+        sample = rng.choice(len(values), min(n_calibration, len(values)), replace=False)
+        self.calibration_ = np.sort(self._mass_score(paths[:, :, sample]))
+        return self
+
+    def _learn(self, paths: np.ndarray):
+        with self._lock:
+            start, n = 0, paths.shape[2]
+            while start < n:
+                take = min(n - start, self.window_size - self.latest_count_)
+                segment = paths[:, :, start:start + take]
+                self.latest_mass_ += self._leaf_counts(segment)
+                self.latest_count_ += take
+                start += take
+                if self.latest_count_ == self.window_size:
+                    # Swap by assignment so concurrent scorers see a complete reference
+                    self.reference_mass_ = self._node_mass(self.latest_mass_)
+                    self.latest_mass_ = np.zeros_like(self.latest_mass_)
+                    self.latest_count_ = 0
+                    self.windows_ += 1
+
+    def partial_fit(self, X):
+        """
+        Add rows to the latest mass window, swapping the reference when it fills.
+        """
+        self._learn(self._paths(self._matrix(X)))
+        return self
+
+    def mass_score(self, X) -> np.ndarray:
+        """
+        Raw mass scores; lower is more anomalous.
+        """
+        return self._mass_score(self._paths(self._matrix(X)))
+
+    def score(self, X) -> np.ndarray:
+        """
+        Anomaly scores in [0, 1]; higher is more anomalous.
+        """
+        return self._calibrated(self.mass_score(X))
+
+    def score_partial_fit(self, X, learn: np.ndarray = None) -> np.ndarray:
+        """
+        Score rows, then learn from those selected by `learn` with a single traversal.
+
+        Parameters
+        ----------
+        X : pandas.DataFrame or numpy.ndarray
+            Rows to score; arrays must hold the `features_` columns in order.
+        learn : numpy.ndarray of bool, optional
+            Rows to add to the latest window, e.g. those not flagged as fraud.
+            All rows by default.
+
+        Returns
+        -------
+        numpy.ndarray
+            Anomaly scores in [0, 1].
+        """
+        paths = self._paths(self._matrix(X))
+        scores = self._calibrated(self._mass_score(paths))
+        if learn is None:
+            self._learn(paths)
+        elif learn.any():
+            self._learn(paths[:, :, learn])
+        return scores
+
+    def metrics(self) -> dict:
+        return {
+            "windows_completed": self.windows_,
+            "latest_window_rows": self.latest_count_,
+            "window_size": self.window_size,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=Path("data/interim"), help="Unscaled X_/y_ split files")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--n-trees", type=int, default=25)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--window-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=Path("models/anomaly_detector.joblib"))
+    args = parser.parse_args()
+
+    X = pd.read_parquet(args.data_dir / f"X_{args.split}.parquet")
+    y = pd.read_parquet(args.data_dir / f"y_{args.split}.parquet").iloc[:, 0]
+    if "Amount" in X and (X["Amount"] < 0).any():
+        # Standardized features would put live requests far outside the work space
+        parser.error(f"{args.data_dir} holds scaled features (negative Amount); pass the unscaled split")
+    detector = HalfSpaceTrees(args.n_trees, args.depth, args.window_size, random_state=args.seed).fit(X, y)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(detector, args.output)
+
+    scores = detector.score(X)
+    summary = {
+        "output": str(args.output),
+        "features": len(detector.features_),
+        "median_score_legit": float(np.median(scores[y.to_numpy() == 0])),
+        "median_score_fraud": float(np.median(scores[y.to_numpy() == 1])),
+    }
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Rescore stored transactions with a new model and record what changes.
+
+The source is a parquet dataset with the model features, e.g. the
+decision audit log; its `is_fraud` column (or a previous artifact) gives
+the decisions to compare against. Diff rows carry the audit log's
+`transaction_id`, so open cases can be matched to their new decision.
+
+Usage:
+    python -m src.modeling.backfill logs/audit models/final_xgb_with_threshold_v3.joblib \\
+        --start 1735689600 --end 1736294400 --output reports/backfill/v3 --jobs 4
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from threadpoolctl import threadpool_limits
+
+from src.api.artifacts import SCALER_PATH, load_artifact_file
+from src.api.schemas import FEATURE_COLUMNS
+from src.data.load import time_range_filter
+from src.modeling.predict import predict_with_threshold
+
+# Counters kept per chunk and summed into the summary
+COUNTS = ("rows_scored", "rows_skipped", "rows_excluded", "previously_flagged", "flagged", "newly_flagged", "unflagged")
+
+# Per-process scorers, loaded once by the pool initializer
+_WORKER = {}
+
+
+def load_scorer(path: Path, threads: int = None, scaler_path: Path = SCALER_PATH) -> dict:
+    """
+    Load an artifact with the API's loader: model, threshold, feature transform and version.
+
+    Artifacts bundling neither a feature pipeline nor a scaler are scaled
+    with the standalone scaler at `scaler_path`, as the API scales the
+    deployed model.
+    """
+    artifact = load_artifact_file(Path(path), scaler_path=scaler_path)
+    model = artifact["model"]
+    if threads is not None and hasattr(model, "get_params") and "n_jobs" in model.get_params():
+        model.set_params(n_jobs=threads)
+    return {key: artifact[key] for key in ("model", "threshold", "transform", "model_version")}
+
+
+def _predict(scorer: dict, raw: np.ndarray):
+    if not len(raw):
+        # Estimators reject empty input; a chunk may be entirely skipped
+        return np.empty(0), np.empty(0, dtype=int)
+    X = raw if scorer["transform"] is None else scorer["transform"](raw)
+    return predict_with_threshold(scorer["model"], X, scorer["threshold"])
+
+
+def plan_chunks(source: Path, start: float = None, end: float = None, time_column: str = "timestamp") -> list:
+    """
+    Split the source into row-group chunks that may hold rows in `[start, end)`.
+
+    Row groups whose statistics fall outside the range are never listed.
+    Chunk IDs are stable across runs, so they can be checkpointed.
+    """
+    expr = time_range_filter(start, end, column=time_column)
+    chunks = []
+    for fragment in ds.dataset(source, format="parquet").get_fragments(filter=expr):
+        for piece in fragment.split_by_row_group(filter=expr):
+            row_group = piece.row_groups[0].id
+            chunks.append({"chunk_id": f"{fragment.path}#{row_group}", "path": fragment.path, "row_group": row_group})
+    return chunks
+
+
+def _init_worker(artifact_path: str, previous_artifact_path: str, threads: int, scaler_path: str):
+    threadpool_limits(limits=threads)
+    _WORKER["new"] = load_scorer(artifact_path, threads, scaler_path)
+    _WORKER["previous"] = (
+        None if previous_artifact_path is None else load_scorer(previous_artifact_path, threads, scaler_path)
+    )
+
+
+def _backfill_chunk(chunk: dict, start: float, end: float, time_column: str, diff_dir: str) -> dict:
+    """
+    Rescore one row group and write its changed decisions.
+    """
+    new, previous = _WORKER["new"], _WORKER["previous"]
+    parquet = pq.ParquetFile(chunk["path"])
+    names = parquet.schema_arrow.names
+    optional = [c for c in ("transaction_id", "is_fraud", "fraud_probability", "model_version", "path") if c in names]
+    columns = list(dict.fromkeys([time_column] + FEATURE_COLUMNS + optional))
+    df = parquet.read_row_group(chunk["row_group"], columns=columns).to_pandas()
+
+    times = df[time_column].to_numpy()
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= times >= start
+    if end is not None:
+        keep &= times < end
+    # Rows logged by the new model (e.g. after promotion) already have its decision
+    skipped = np.zeros_like(keep)
+    if "model_version" in df:
+        skipped = keep & (df["model_version"] == new["model_version"]).to_numpy()
+    keep &= ~skipped
+    # Screening rules decide before any model, and degraded fast-path
+    # decisions are not the full model's to compare with
+    excluded = np.zeros_like(keep)
+    if "path" in df:
+        paths = df["path"].to_numpy()
+        excluded = keep & ((paths == "rules") if previous is not None else (paths != "full"))
+    rows = np.flatnonzero(keep & ~excluded)
+    df = df.iloc[rows]
+
+    raw = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    new_proba, new_flag = _predict(new, raw)
+    if previous is not None:
+        previous_proba, previous_flag = _predict(previous, raw)
+    elif "is_fraud" in df:
+        previous_flag = df["is_fraud"].to_numpy().astype(int)
+        previous_proba = df["fraud_probability"].to_numpy() if "fraud_probability" in df else np.full(len(df), np.nan)
+    else:
+        raise ValueError("The source has no is_fraud column; pass the previous artifact to compare against")
+
+    changed = new_flag != previous_flag
+    diff = pd.DataFrame({
+        "source": chunk["path"],
+        "row_group": chunk["row_group"],
+        "row": rows[changed],
+        time_column: df[time_column].to_numpy()[changed],
+        "previous_probability": previous_proba[changed],
+        "new_probability": new_proba[changed],
+        "change": np.where(new_flag[changed] == 1, "flagged", "unflagged"),
+    })
+    if "transaction_id" in df:
+        diff.insert(3, "transaction_id", df["transaction_id"].to_numpy()[changed])
+
+    diff_path = None
+    if len(diff):
+        # Named after the chunk, so a rerun of an unrecorded chunk replaces its file
+        name = f"part-{hashlib.sha1(chunk['chunk_id'].encode()).hexdigest()[:16]}.parquet"
+        diff_path = Path(diff_dir) / name
+        tmp = diff_path.with_name(f".{name}.tmp")
+        diff.to_parquet(tmp, index=False)
+        os.replace(tmp, diff_path)
+
+    return {
+        "chunk_id": chunk["chunk_id"],
+        "rows_scored": len(rows),
+        "rows_skipped": int(skipped.sum()),
+        "rows_excluded": int(excluded.sum()),
+        "previously_flagged": int(previous_flag.sum()),
+        "flagged": int(new_flag.sum()),
+        "newly_flagged": int((changed & (new_flag == 1)).sum()),
+        "unflagged": int((changed & (new_flag == 0)).sum()),
+        "diff_path": None if diff_path is None else str(diff_path),
+    }
+
+
+def _read_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    done = {}
+    for line in path.read_text().splitlines():
+        try:
+            stats = json.loads(line)
+        except json.JSONDecodeError:
+            # Torn last line of an interrupted run
+            continue
+        done[stats["chunk_id"]] = stats
+    return done
+
+
+def run_backfill(
+    source: Path,
+    artifact_path: Path,
+    output_dir: Path,
+    start: float = None,
+    end: float = None,
+    time_column: str = "timestamp",
+    previous_artifact_path: Path = None,
+    n_jobs: int = None,
+    threads_per_job: int = 1,
+    scaler_path: Path = SCALER_PATH,
+) -> dict:
+    """
+    Rescore a time range of stored transactions in parallel, resumable chunks.
+
+    The range is split into parquet row groups (`plan_chunks`) scored by
+    `n_jobs` worker processes, each loading the artifact once. Every
+    finished chunk is appended to `checkpoint.jsonl` in `output_dir`; a
+    rerun with the same arguments skips checkpointed chunks, and rows the
+    source already attributes to the new model version are never rescored.
+    Audit rows decided by screening rules (`path="rules"`) are excluded, as
+    are degraded fast-path rows when comparing with logged decisions; both
+    are counted in `rows_excluded`.
+    Only changed decisions are written, as `diff/part-*.parquet` with the
+    row's position in the source, its transaction ID when present, both
+    probabilities and `change` ("flagged" or "unflagged").
+
+    Parameters
+    ----------
+    source : pathlib.Path
+        Parquet file or dataset with `FEATURE_COLUMNS` and `time_column`.
+    artifact_path : pathlib.Path
+        New model artifact.
+    output_dir : pathlib.Path
+        Directory of the manifest, checkpoint, diff and summary.
+    start, end : float, optional
+        `start <= time_column < end`; unbounded when omitted.
+    time_column : str, optional
+        Column the range applies to (`timestamp` in the audit log, `Time`
+        in raw transaction files).
+    previous_artifact_path : pathlib.Path, optional
+        Artifact whose decisions the new ones are compared with; by
+        default the source's logged `is_fraud` decisions are used.
+    n_jobs : int, optional
+        Worker processes; all cores by default.
+    threads_per_job : int, optional
+        Threads each worker's model and BLAS may use.
+    scaler_path : pathlib.Path, optional
+        Standalone scaler for artifacts that bundle neither a feature
+        pipeline nor a scaler; the API's by default.
+
+    Returns
+    -------
+    dict
+        Summary, also written to `summary.json`.
+    """
+    output_dir = Path(output_dir)
+    diff_dir = output_dir / "diff"
+    diff_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {
+        "source": str(Path(source).resolve()),
+        "model_version": load_scorer(artifact_path, scaler_path=scaler_path)["model_version"],
+        "previous_artifact": None if previous_artifact_path is None else str(Path(previous_artifact_path).resolve()),
+        "start": start,
+        "end": end,
+        "time_column": time_column,
+    }
+    manifest_path = output_dir / "manifest.json"
+    if manifest_path.exists():
+        if json.loads(manifest_path.read_text()) != manifest:
+            raise ValueError(f"{output_dir} holds a different backfill; use a new output directory")
+    else:
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    checkpoint = output_dir / "checkpoint.jsonl"
+    done = _read_checkpoint(checkpoint)
+    chunks = plan_chunks(source, start, end, time_column)
+    todo = [chunk for chunk in chunks if chunk["chunk_id"] not in done]
+
+    if todo:
+        initargs = (
+            str(artifact_path),
+            None if previous_artifact_path is None else str(previous_artifact_path),
+            threads_per_job,
+            None if scaler_path is None else str(scaler_path),
+        )
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=initargs) as pool, \
+                open(checkpoint, "a") as log:
+            futures = [pool.submit(_backfill_chunk, chunk, start, end, time_column, str(diff_dir)) for chunk in todo]
+            try:
+                for future in as_completed(futures):
+                    stats = future.result()
+                    log.write(json.dumps(stats) + "\n")
+                    log.flush()
+                    done[stats["chunk_id"]] = stats
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    planned = {chunk["chunk_id"] for chunk in chunks}
+    totals = {name: sum(s[name] for cid, s in done.items() if cid in planned) for name in COUNTS}
+    summary = {
+        **manifest,
+        "chunks": len(chunks),
+        "chunks_resumed": len(chunks) - len(todo),
+        **totals,
+        "alert_volume_change": totals["flagged"] - totals["previously_flagged"],
+        "diff_dir": str(diff_dir),
+    }
+    (output_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, help="Parquet file or dataset directory, e.g. the audit log")
+    parser.add_argument("artifact", type=Path, help="New model artifact")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--start", type=float)
+    parser.add_argument("--end", type=float)
+    parser.add_argument("--time-column", default="timestamp")
+    parser.add_argument("--previous-artifact", type=Path, help="Compare with this model instead of logged decisions")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-job", type=int, default=1)
+    parser.add_argument("--scaler", type=Path, default=SCALER_PATH, help="Scaler for artifacts without one")
+    args = parser.parse_args()
+
+    summary = run_backfill(
+        args.source, args.artifact, args.output,
+        start=args.start, end=args.end, time_column=args.time_column,
+        previous_artifact_path=args.previous_artifact,
+        n_jobs=args.jobs, threads_per_job=args.threads_per_job, scaler_path=args.scaler,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
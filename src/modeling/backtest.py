@@ -0,0 +1,274 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import (
+    average_precision_score,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+from sklearn.preprocessing import StandardScaler
+
+from src.modeling.train import build_xgboost
+from src.threshold.optimize import (
+    compute_threshold_metrics,
+    select_best_f1_threshold,
+    select_threshold_by_recall,
+)
+
+
+def walk_forward_folds(
+    times,
+    train_seconds: float,
+    val_seconds: float,
+    test_seconds: float,
+    step_seconds: float = None,
+    expanding: bool = False,
+):
+    """
+    Build rolling time-ordered train/validation/test windows.
+
+    Each fold trains on `[start, start + train_seconds)`, selects its
+    threshold on the following `val_seconds` and is evaluated on the
+    `test_seconds` after that, so no fold ever sees the future. Windows
+    advance by `step_seconds` (default: `test_seconds`), so consecutive
+    test windows tile the history.
+
+    Parameters
+    ----------
+    times : array-like
+        Event times, sorted ascending.
+    train_seconds, val_seconds, test_seconds : float
+        Window lengths.
+    step_seconds : float, optional
+        Offset between consecutive folds.
+    expanding : bool, optional
+        Anchor every training window at the first event instead of rolling.
+
+    Returns
+    -------
+    list of dict
+        Per fold, the `[start, stop)` row ranges of `train`, `val` and
+        `test` and the window boundaries in event time.
+    """
+    times = np.asarray(times)
+    step_seconds = step_seconds or test_seconds
+    origin, last = times[0], times[-1]
+
+    folds = []
+    start = origin
+    while start + train_seconds + val_seconds < last:
+        train_end = start + train_seconds
+        val_end = train_end + val_seconds
+        test_end = val_end + test_seconds
+        train_start = origin if expanding else start
+        bounds = np.searchsorted(times, [train_start, train_end, val_end, test_end])
+        folds.append({
+            "fold": len(folds),
+            "train": (int(bounds[0]), int(bounds[1])),
+            "val": (int(bounds[1]), int(bounds[2])),
+            "test": (int(bounds[2]), int(bounds[3])),
+            "train_start": float(train_start),
+            "test_start": float(val_end),
+            "test_end": float(min(test_end, last)),
+        })
+        start += step_seconds
+    return folds
+
+
+def _safe(metric, y_true, y_score):
+    """
+    Metrics are undefined on windows without both classes.
+    """
+    if y_true.min() == y_true.max():
+        return np.nan
+    return metric(y_true, y_score)
+
+
+def _run_fold(
+    X_path: str,
+    y_path: str,
+    fold: dict,
+    model_factory,
+    scale: bool,
+    min_recall: float,
+    threads: int,
+) -> dict:
+    """
+    Fit, threshold and evaluate one fold on memory-mapped arrays.
+    """
+    from threadpoolctl import threadpool_limits
+
+    X = np.load(X_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    (a, b), (c, d), (e, f) = fold["train"], fold["val"], fold["test"]
+    X_train, y_train = X[a:b], np.asarray(y[a:b])
+    X_val, y_val = X[c:d], np.asarray(y[c:d])
+    X_test, y_test = X[e:f], np.asarray(y[e:f])
+
+    result = {
+        "fold": fold["fold"],
+        "train_start": fold["train_start"],
+        "test_start": fold["test_start"],
+        "test_end": fold["test_end"],
+        "n_train": len(y_train),
+        "n_test": len(y_test),
+        "train_positives": int(y_train.sum()),
+        "test_positives": int(y_test.sum()),
+    }
+    if y_train.sum() == 0 or y_val.sum() == 0:
+        # Cannot fit or threshold without positives
+        return {**result, "threshold": np.nan}
+
+    start = time.perf_counter()
+    with threadpool_limits(threads):
+        if scale:
+            scaler = StandardScaler().fit(X_train)
+            X_train, X_val, X_test = (scaler.transform(part) for part in (X_train, X_val, X_test))
+
+        model = model_factory(y_train)
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=threads)
+        model.fit(X_train, y_train)
+
+        metrics = compute_threshold_metrics(y_val, model.predict_proba(X_val)[:, 1])
+        if min_recall is None:
+            threshold = select_best_f1_threshold(metrics)
+        else:
+            threshold = select_threshold_by_recall(metrics, min_recall)
+        y_proba = model.predict_proba(X_test)[:, 1] if len(y_test) else np.empty(0)
+
+    y_pred = (y_proba >= threshold).astype(int)
+    has_positives = len(y_test) and y_test.sum() > 0
+    return {
+        **result,
+        "threshold": float(threshold),
+        "alert_rate": float(y_pred.mean()) if len(y_pred) else np.nan,
+        "precision": precision_score(y_test, y_pred, zero_division=0) if has_positives else np.nan,
+        "recall": recall_score(y_test, y_pred) if has_positives else np.nan,
+        "f1": f1_score(y_test, y_pred) if has_positives else np.nan,
+        "roc_auc": _safe(roc_auc_score, y_test, y_proba) if len(y_test) else np.nan,
+        "pr_auc": _safe(average_precision_score, y_test, y_proba) if len(y_test) else np.nan,
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+def run_walk_forward(
+    X: pd.DataFrame,
+    y: pd.Series,
+    folds: list = None,
+    time_col: str = "Time",
+    model_factory=build_xgboost,
+    scale: bool = True,
+    min_recall: float = None,
+    n_jobs: int = None,
+    threads_per_job: int = 1,
+    work_dir: Path = None,
+    **window_kwargs,
+) -> pd.DataFrame:
+    """
+    Run a walk-forward backtest with folds fitted in parallel processes.
+
+    Rows are sorted by `time_col` and written once to `.npy` files; every
+    worker memory-maps them and slices its windows, so the data is shared
+    through the page cache instead of being pickled into each process.
+
+    Parameters
+    ----------
+    X : pandas.DataFrame
+        Feature matrix including `time_col`.
+    y : pandas.Series
+        Binary labels.
+    folds : list of dict, optional
+        Output of `walk_forward_folds` on the sorted times; built from
+        `window_kwargs` when omitted.
+    model_factory : callable, optional
+        Picklable `factory(y_train) -> estimator`.
+    scale : bool, optional
+        Fit a `StandardScaler` on each training window.
+    min_recall : float, optional
+        Select each fold's threshold by recall instead of best F1.
+    n_jobs : int, optional
+        Worker processes; defaults to the CPU count.
+    threads_per_job : int, optional
+        BLAS/OpenMP threads per worker.
+    work_dir : pathlib.Path, optional
+        Where to write the shared arrays; a temporary directory by default.
+    **window_kwargs
+        Passed to `walk_forward_folds`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row of window sizes, threshold and test metrics per fold.
+    """
+    order = np.argsort(X[time_col].to_numpy(), kind="stable")
+    X_sorted = np.ascontiguousarray(X.to_numpy(dtype=np.float64)[order])
+    y_sorted = np.asarray(y)[order].astype(np.int8)
+
+    if folds is None:
+        folds = walk_forward_folds(X_sorted[:, X.columns.get_loc(time_col)], **window_kwargs)
+    if not folds:
+        raise ValueError("History too short for a single fold")
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(folds))
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        X_path, y_path = os.path.join(tmp, "X.npy"), os.path.join(tmp, "y.npy")
+        np.save(X_path, X_sorted)
+        np.save(y_path, y_sorted)
+        del X_sorted
+
+        args = (model_factory, scale, min_recall, threads_per_job)
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_run_fold, X_path, y_path, fold, *args) for fold in folds]
+            results = [future.result() for future in futures]
+
+    return pd.DataFrame(results).set_index("fold")
+
+
+def threshold_stability(results: pd.DataFrame) -> dict:
+    """
+    Summarize how much the selected threshold and test metrics move across folds.
+
+    Folds without a threshold (no positives to fit or threshold on) or
+    without test metrics (no positives in the test window) are left out of
+    the respective statistics; metric statistics are None when no fold was
+    evaluated.
+
+    Raises
+    ------
+    ValueError
+        If no fold has a threshold.
+    """
+    thresholds = results["threshold"].dropna() if "threshold" in results else pd.Series(dtype=float)
+    if thresholds.empty:
+        raise ValueError("No fold has a threshold; every training or validation window lacks positives")
+    evaluated = results.dropna(subset=["f1"]) if "f1" in results else results.iloc[:0]
+
+    summary = {
+        "folds": len(results),
+        "folds_thresholded": len(thresholds),
+        "folds_evaluated": len(evaluated),
+        "threshold_mean": float(thresholds.mean()),
+        "threshold_std": float(thresholds.std()),
+        "threshold_cv": float(thresholds.std() / thresholds.mean()),
+        "threshold_min": float(thresholds.min()),
+        "threshold_max": float(thresholds.max()),
+        "max_fold_to_fold_change": float(thresholds.diff().abs().max()),
+        "f1_mean": None,
+        "f1_std": None,
+        "recall_min": None,
+    }
+    if len(evaluated):
+        summary.update(
+            f1_mean=float(evaluated["f1"].mean()),
+            f1_std=float(evaluated["f1"].std()),
+            recall_min=float(evaluated["recall"].min()),
+        )
+    return summary
@@ -0,0 +1,400 @@
+"""
+Time and memory-profile the training pipeline on synthetic data.
+
+Every stage (split, scale, resampling, model fits, threshold sweep, SHAP)
+runs at each dataset size and thread count; results are written as JSON
+and optionally compared with a stored baseline.
+
+Usage:
+    python -m src.modeling.benchmark --sizes 20000 100000 --threads 1 4
+    python -m src.modeling.benchmark --sizes 20000 --save-baseline reports/benchmarks/baseline.json
+    python -m src.modeling.benchmark --sizes 20000 --baseline reports/benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import pandas as pd
+from sklearn.datasets import make_classification
+from threadpoolctl import threadpool_limits
+
+from src.api.schemas import FEATURE_COLUMNS
+from src.data.preprocess import (
+    apply_random_undersampling,
+    apply_smote,
+    apply_smote_tomek,
+    scale_and_persist,
+    startified_train_val_test_split,
+)
+from src.explainability.shap_utils import compute_shap_values
+from src.modeling.baselines import get_decision_tree, get_logistic_regression, get_random_forest
+from src.modeling.train import build_catboost, build_lightgbm, build_xgboost
+from src.threshold.optimize import compute_threshold_metrics
+
+# Builders by name, called with the training labels and a seed
+MODELS = {
+    "logistic_regression": lambda y, seed: get_logistic_regression(seed),
+    "decision_tree": lambda y, seed: get_decision_tree(seed),
+    "random_forest": lambda y, seed: get_random_forest(seed),
+    "xgboost": build_xgboost,
+    "lightgbm": lambda y, seed: build_lightgbm(seed),
+    "catboost": build_catboost,
+}
+
+RESAMPLERS = {
+    "smote": apply_smote,
+    "undersample": apply_random_undersampling,
+    "smote_tomek": apply_smote_tomek,
+}
+
+STAGES = ("split", "scale", *RESAMPLERS, "fit", "threshold_sweep", "shap")
+
+# Model explained by the SHAP stage: the deployed model family
+SHAP_MODEL = "xgboost"
+
+PACKAGES = ("numpy", "pandas", "scikit-learn", "imbalanced-learn", "xgboost", "lightgbm", "catboost", "shap")
+
+
+def _thread_params(model, threads: int):
+    """
+    Pin a model's own thread pool; BLAS and OpenMP pools are limited separately.
+    """
+    params = model.get_params()
+    if "thread_count" in params:
+        model.set_params(thread_count=threads)
+    elif "n_jobs" in params:
+        model.set_params(n_jobs=threads)
+    return model
+
+
+def synthetic_training_data(
+    n: int,
+    fraud_rate: float = 0.01,
+    random_state: int = 0,
+    synthetic_params: dict = None,
+):
+    """
+    Feature frame and labels shaped like the transaction data.
+
+    Parameters
+    ----------
+    n : int
+        Rows to generate.
+    fraud_rate : float, optional
+        Share of positive rows.
+    random_state : int, optional
+        Seed.
+    synthetic_params : dict, optional
+        Fitted generator parameters (`src.data.synthetic`); a generic
+        imbalanced classification problem is drawn without them.
+
+    Returns
+    -------
+    X : pandas.DataFrame
+    y : pandas.Series
+    """
+    if synthetic_params is not None:
+        from src.data.synthetic import generate_transactions
+
+        df = generate_transactions(synthetic_params, n, fraud_rate=fraud_rate, random_state=random_state)
+        return df.drop(columns=["Class"]), df["Class"]
+
+    X, y = make_classification(
+        n_samples=n,
+        n_features=len(FEATURE_COLUMNS),
+        n_informative=10,
+        weights=[1 - fraud_rate],
+        flip_y=0.0,
+        class_sep=1.5,
+        random_state=random_state,
+    )
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS), pd.Series(y, name="Class")
+
+
+def measure(fn, *args, repeat: int = 1, **kwargs):
+    """
+    Run `fn` and report its wall time and peak traced allocation.
+
+    Wall time is the fastest of `repeat` untraced runs. Peak memory comes
+    from one extra run under `tracemalloc`, which slows allocation-heavy
+    code down too much to time; it sees Python and NumPy allocations but
+    not the internal buffers of native libraries (XGBoost, LightGBM,
+    CatBoost). `max_rss_mb` is the process high-water mark after the stage.
+
+    Returns
+    -------
+    result
+        Return value of the last timed run.
+    dict
+        `seconds`, `peak_mb` and `max_rss_mb`.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # Kilobytes on Linux, bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return result, {
+        "seconds": min(seconds),
+        "peak_mb": peak / 2 ** 20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit / 2 ** 20,
+    }
+
+
+def _run_size(X, y, threads: int, stages: tuple, models: list, repeat: int, shap_rows: int, random_state: int):
+    rows = len(X)
+    results = []
+
+    def record(stage: str, fn, *args, **kwargs):
+        result, stats = measure(fn, *args, repeat=repeat, **kwargs)
+        results.append({"stage": stage, "rows": rows, "threads": threads, **stats})
+        return result
+
+    # Later stages need the split and scaled data even when these are not timed
+    if "split" in stages:
+        split = record("split", startified_train_val_test_split, X, y, random_state=random_state)
+    else:
+        split = startified_train_val_test_split(X, y, random_state=random_state)
+    X_train, X_val, X_test, y_train, y_val, _ = split
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scaler_path = Path(tmp) / "scaler.joblib"
+        if "scale" in stages:
+            scaled = record("scale", scale_and_persist, X_train, X_val, X_test, scaler_path)
+        else:
+            scaled = scale_and_persist(X_train, X_val, X_test, scaler_path)
+    X_train, X_val = scaled[0], scaled[1]
+
+    for name, resampler in RESAMPLERS.items():
+        if name in stages:
+            record(name, resampler, X_train, y_train, random_state)
+
+    fitted = {}
+    needs_fit = {"fit", "threshold_sweep"} & set(stages)
+    for name in models:
+        if not needs_fit and not (name == SHAP_MODEL and "shap" in stages):
+            continue
+        model = _thread_params(MODELS[name](y_train, random_state), threads)
+        if "fit" in stages:
+            fitted[name] = record(f"fit:{name}", model.fit, X_train, y_train)
+        else:
+            fitted[name] = model.fit(X_train, y_train)
+
+    if "threshold_sweep" in stages:
+        for name, model in fitted.items():
+            record(f"threshold_sweep:{name}", compute_threshold_metrics, y_val, model.predict_proba(X_val)[:, 1])
+
+    if "shap" in stages and SHAP_MODEL in fitted:
+        record(f"shap:{SHAP_MODEL}", compute_shap_values, fitted[SHAP_MODEL], X_val.iloc[:shap_rows])
+
+    for result in results:
+        result["rows_per_second"] = rows / result["seconds"] if result["seconds"] else None
+    return results
+
+
+def _environment() -> dict:
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def run_benchmark(
+    sizes: list,
+    threads: list = (1,),
+    stages: tuple = STAGES,
+    models: list = tuple(MODELS),
+    repeat: int = 1,
+    shap_rows: int = 2000,
+    fraud_rate: float = 0.01,
+    random_state: int = 0,
+    synthetic_params: dict = None,
+) -> dict:
+    """
+    Benchmark the training stages at every size and thread count.
+
+    Thread counts are applied both to each model's own pool (`n_jobs`,
+    `thread_count`) and, through `threadpoolctl`, to BLAS and OpenMP.
+
+    Parameters
+    ----------
+    sizes : list of int
+        Dataset sizes before the train/validation/test split.
+    threads : list of int, optional
+        Thread counts to run every size with.
+    stages : tuple of str, optional
+        Subset of `STAGES` to time.
+    models : list of str, optional
+        Keys of `MODELS` to fit.
+    repeat : int, optional
+        Runs per stage; the fastest is kept.
+    shap_rows : int, optional
+        Validation rows explained in the SHAP stage.
+    fraud_rate : float, optional
+        Share of positive rows in the synthetic data.
+    random_state : int, optional
+        Seed of the data, split, resampling and models.
+    synthetic_params : dict, optional
+        Fitted generator parameters for realistic transactions.
+
+    Returns
+    -------
+    dict
+        `environment`, `config` and `results`, one entry per stage, size
+        and thread count.
+    """
+    unknown = (set(stages) - set(STAGES)) | (set(models) - set(MODELS))
+    if unknown:
+        raise ValueError(f"Unknown stages or models: {sorted(unknown)}")
+
+    results = []
+    for n in sizes:
+        X, y = synthetic_training_data(n, fraud_rate, random_state, synthetic_params)
+        for count in threads:
+            with threadpool_limits(limits=count):
+                results.extend(_run_size(X, y, count, tuple(stages), list(models), repeat, shap_rows, random_state))
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": _environment(),
+        "config": {
+            "sizes": list(sizes),
+            "threads": list(threads),
+            "stages": list(stages),
+            "models": list(models),
+            "repeat": repeat,
+            "shap_rows": shap_rows,
+            "fraud_rate": fraud_rate,
+            "random_state": random_state,
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(
+    report: dict,
+    baseline: dict,
+    time_tolerance: float = 0.25,
+    memory_tolerance: float = 0.25,
+    min_seconds: float = 0.05,
+    min_mb: float = 1.0,
+) -> list:
+    """
+    Stages slower or hungrier than the baseline beyond the tolerances.
+
+    Entries are matched on stage, rows and threads; unmatched entries are
+    ignored. A difference must exceed both the relative tolerance and the
+    absolute floor (`min_seconds`, `min_mb`), so tiny stages do not flag
+    on timer noise.
+
+    Returns
+    -------
+    list of dict
+        One entry per regressed metric with the baseline and current values.
+    """
+    reference = {(r["stage"], r["rows"], r["threads"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        base = reference.get((result["stage"], result["rows"], result["threads"]))
+        if base is None:
+            continue
+        for metric, tolerance, floor in (
+            ("seconds", time_tolerance, min_seconds),
+            ("peak_mb", memory_tolerance, min_mb),
+        ):
+            current, previous = result[metric], base[metric]
+            if current > previous * (1 + tolerance) and current - previous > floor:
+                regressions.append({
+                    "stage": result["stage"],
+                    "rows": result["rows"],
+                    "threads": result["threads"],
+                    "metric": metric,
+                    "baseline": previous,
+                    "current": current,
+                    "ratio": current / previous if previous else None,
+                })
+    return regressions
+
+
+def save_report(report: dict, path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--shap-rows", type=int, default=2000)
+    parser.add_argument("--synthetic-params", type=Path, help="Fitted generator parameters (.npz)")
+    parser.add_argument("--output", type=Path, help="Results file (default: reports/benchmarks/training-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="Flag regressions against this results file")
+    parser.add_argument("--save-baseline", type=Path, help="Also write the results here as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    params = None
+    if args.synthetic_params:
+        from src.data.synthetic import load_synthetic_params
+
+        params = load_synthetic_params(args.synthetic_params)
+
+    report = run_benchmark(
+        args.sizes, args.threads, tuple(args.stages), args.models,
+        repeat=args.repeat, shap_rows=args.shap_rows, synthetic_params=params,
+    )
+    output = args.output or Path("reports/benchmarks") / f"training-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    save_report(report, output)
+    if args.save_baseline:
+        save_report(report, args.save_baseline)
+
+    table = pd.DataFrame(report["results"])[["stage", "rows", "threads", "seconds", "peak_mb", "max_rss_mb"]]
+    print(table.to_string(index=False, float_format="%.3f"))
+    print(f"Results written to {output}")
+
+    if args.baseline and not args.baseline.exists():
+        save_report(report, args.baseline)
+        print(f"No baseline found; results saved as the baseline at {args.baseline}")
+    elif args.baseline:
+        regressions = compare_with_baseline(
+            report, json.loads(args.baseline.read_text()), args.time_tolerance, args.memory_tolerance
+        )
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} rows={r['rows']} threads={r['threads']}: "
+                  f"{r['metric']} {r['baseline']:.3f} -> {r['current']:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Two-stage early-exit scoring: a cheap model in front of the deployed one.
+
+The band is tuned on the validation split and the short-circuit rate,
+throughput gain and recall are reported on the test split.
+
+Usage:
+    python -m src.modeling.cascade --data-dir data/interim --output reports/cascade/report.json
+    python -m src.modeling.cascade --fast-model models/logistic_regression.joblib --max-recall-loss 0.01
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.api.schemas import FEATURE_COLUMNS
+from src.modeling.baselines import get_logistic_regression
+
+
+class CascadeScorer:
+    """
+    Two-stage early-exit scorer.
+
+    A cheap model scores every row. Rows whose cheap score falls inside
+    `[lower, upper)` are rescored by the full model; the rest exit early.
+    Early-exit scores are clamped to the side of `threshold` their exit
+    implies, so thresholding `predict_proba` reproduces the cascade decision
+    and the scorer can be used wherever a single model is expected.
+
+    Parameters
+    ----------
+    fast_model : object
+        Fitted cheap model exposing `predict_proba`.
+    full_model : object
+        Fitted full model exposing `predict_proba`.
+    threshold : float
+        Decision threshold applied to the cascade output.
+    lower : float
+        Cheap-model score below which rows exit as legitimate.
+    upper : float, optional
+        Cheap-model score at or above which rows exit as fraud. `inf`
+        disables the upper exit.
+    """
+
+    def __init__(self, fast_model, full_model, threshold: float, lower: float, upper: float = np.inf):
+        self.fast_model = fast_model
+        self.full_model = full_model
+        self.threshold = float(threshold)
+        self.lower = float(lower)
+        self.upper = float(upper)
+
+    def band_mask(self, fast_proba: np.ndarray) -> np.ndarray:
+        """
+        Return the mask of rows that must be rescored by the full model.
+        """
+        return (fast_proba >= self.lower) & (fast_proba < self.upper)
+
+    def predict_proba(self, X) -> np.ndarray:
+        fast_proba = self.fast_model.predict_proba(X)[:, 1]
+        in_band = self.band_mask(fast_proba)
+
+        proba = np.where(
+            fast_proba < self.lower,
+            np.minimum(fast_proba, np.nextafter(self.threshold, 0.0)),
+            np.maximum(fast_proba, self.threshold),
+        )
+        if in_band.any():
+            proba[in_band] = self.full_model.predict_proba(X[in_band])[:, 1]
+
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= self.threshold).astype(int)
+
+
+def select_cascade_band(
+    fast_proba,
+    full_proba,
+    y,
+    threshold: float,
+    max_recall_loss: float = 0.0,
+    max_extra_false_positives: int = 0,
+):
+    """
+    Choose band limits that preserve the full model's recall at `threshold`.
+
+    The lower limit is the highest value that lets at most
+    `max_recall_loss` (as a fraction of positives) of the frauds caught by
+    the full model exit early as legitimate. The upper limit is the lowest
+    value that adds at most `max_extra_false_positives` false positives the
+    full model would not have raised; upper exits never reduce recall.
+
+    Parameters
+    ----------
+    fast_proba : array-like
+        Cheap-model scores on validation data.
+    full_proba : array-like
+        Full-model scores on the same rows.
+    y : array-like
+        Validation labels.
+    threshold : float
+        Final decision threshold of the full model.
+    max_recall_loss : float, optional
+        Tolerated absolute drop in recall.
+    max_extra_false_positives : int, optional
+        Tolerated number of additional false positives from upper exits.
+
+    Returns
+    -------
+    lower : float
+        Lower band limit.
+    upper : float
+        Upper band limit (`inf` when no upper exit is possible).
+    """
+    fast_proba = np.asarray(fast_proba, dtype=float)
+    full_flag = np.asarray(full_proba) >= threshold
+    y = np.asarray(y).astype(bool)
+
+    caught = np.sort(fast_proba[y & full_flag])
+    allowed_misses = int(np.floor(max_recall_loss * y.sum()))
+    if allowed_misses >= len(caught):
+        lower = np.nextafter(fast_proba.max(), np.inf) if len(fast_proba) else 0.0
+    else:
+        lower = caught[allowed_misses]
+
+    # Legitimate rows the full model clears; flagging them early costs a false positive.
+    cleared = np.sort(fast_proba[~y & ~full_flag])[::-1]
+    if max_extra_false_positives >= len(cleared):
+        upper = 0.0
+    else:
+        upper = np.nextafter(cleared[max_extra_false_positives], np.inf)
+    upper = max(upper, lower)
+    if upper > 1.0:
+        upper = np.inf
+
+    return float(lower), float(upper)
+
+
+def fit_cascade(
+    fast_model,
+    full_model,
+    X_val,
+    y_val,
+    threshold: float,
+    max_recall_loss: float = 0.0,
+    max_extra_false_positives: int = 0,
+) -> CascadeScorer:
+    """
+    Build a `CascadeScorer` with band limits tuned on validation data.
+
+    Both models must already be fitted; see `select_cascade_band` for the
+    meaning of the tolerance parameters.
+    """
+    lower, upper = select_cascade_band(
+        fast_model.predict_proba(X_val)[:, 1],
+        full_model.predict_proba(X_val)[:, 1],
+        y_val,
+        threshold,
+        max_recall_loss=max_recall_loss,
+        max_extra_false_positives=max_extra_false_positives,
+    )
+    return CascadeScorer(fast_model, full_model, threshold, lower, upper)
+
+
+def _best_time(fn, n_repeats: int) -> float:
+    best = np.inf
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cascade_report(cascade: CascadeScorer, X, y=None, n_repeats: int = 3) -> dict:
+    """
+    Measure the short-circuit rate and throughput gain of a cascade.
+
+    Parameters
+    ----------
+    cascade : CascadeScorer
+        Cascade to evaluate.
+    X : pandas.DataFrame or numpy.ndarray
+        Feature matrix.
+    y : array-like, optional
+        Labels; when given, recall and precision of the full model and the
+        cascade at the cascade threshold are included.
+    n_repeats : int, optional
+        Timing repetitions; the best run is reported.
+
+    Returns
+    -------
+    dict
+        Short-circuit fraction, rows/second for both scorers, throughput
+        gain and, optionally, recall/precision.
+    """
+    fast_proba = cascade.fast_model.predict_proba(X)[:, 1]
+    short_circuited = 1.0 - cascade.band_mask(fast_proba).mean()
+
+    full_seconds = _best_time(lambda: cascade.full_model.predict_proba(X), n_repeats)
+    cascade_seconds = _best_time(lambda: cascade.predict_proba(X), n_repeats)
+
+    report = {
+        "n_rows": len(fast_proba),
+        "short_circuited_fraction": float(short_circuited),
+        "full_rows_per_second": len(fast_proba) / full_seconds,
+        "cascade_rows_per_second": len(fast_proba) / cascade_seconds,
+        "throughput_gain": full_seconds / cascade_seconds,
+    }
+
+    if y is not None:
+        y = np.asarray(y).astype(bool)
+        for name, flags in [
+            ("full", cascade.full_model.predict_proba(X)[:, 1] >= cascade.threshold),
+            ("cascade", cascade.predict(X).astype(bool)),
+        ]:
+            report[f"{name}_recall"] = float((flags & y).sum() / max(y.sum(), 1))
+            report[f"{name}_precision"] = float((flags & y).sum() / max(flags.sum(), 1))
+
+    return report
+
+
+def _split(data_dir: Path, split: str, transform):
+    X = pd.read_parquet(Path(data_dir) / f"X_{split}.parquet")[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = pd.read_parquet(Path(data_dir) / f"y_{split}.parquet").iloc[:, 0].to_numpy()
+    return (X if transform is None else transform(X)), y
+
+
+def write_cascade_report(
+    data_dir: Path,
+    output: Path,
+    artifact_path: Path,
+    scaler_path: Path = None,
+    fast_model_path: Path = None,
+    max_recall_loss: float = 0.0,
+    max_extra_false_positives: int = 0,
+    n_repeats: int = 3,
+    random_state: int = 42,
+) -> dict:
+    """
+    Put a cheap model in front of a model artifact and write the cascade report.
+
+    Splits are read unscaled from `data_dir` and go through the artifact's
+    own feature transform, as in the API. Without `fast_model_path`, a
+    balanced logistic regression is fitted on the training split.
+
+    Returns
+    -------
+    dict
+        The `cascade_report` of the test split plus the band limits, as written.
+    """
+    from src.api.artifacts import load_artifact_file
+
+    artifact = load_artifact_file(artifact_path, scaler_path=scaler_path)
+    transform = artifact["transform"]
+    X_val, y_val = _split(data_dir, "val", transform)
+    X_test, y_test = _split(data_dir, "test", transform)
+
+    if fast_model_path is not None:
+        fast_model = joblib.load(fast_model_path)
+    else:
+        fast_model = get_logistic_regression(random_state).fit(*_split(data_dir, "train", transform))
+
+    cascade = fit_cascade(
+        fast_model,
+        artifact["model"],
+        X_val,
+        y_val,
+        artifact["threshold"],
+        max_recall_loss=max_recall_loss,
+        max_extra_false_positives=max_extra_false_positives,
+    )
+    report = {
+        "model_version": artifact["model_version"],
+        "fast_model": type(fast_model).__name__,
+        "threshold": cascade.threshold,
+        "lower": cascade.lower,
+        # JSON has no infinity; no upper exit is written as null
+        "upper": cascade.upper if np.isfinite(cascade.upper) else None,
+        **cascade_report(cascade, X_test, y_test, n_repeats=n_repeats),
+    }
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    from src.api.artifacts import MODEL_PATH, SCALER_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=Path("data/interim"), help="Unscaled X_/y_ split files")
+    parser.add_argument("--artifact", type=Path, default=MODEL_PATH, help="Full model behind the cascade")
+    parser.add_argument("--fast-model", type=Path, help="Fitted cheap model; default: fit a logistic regression")
+    parser.add_argument("--max-recall-loss", type=float, default=0.0)
+    parser.add_argument("--max-extra-false-positives", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repetitions")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=Path("reports/cascade/report.json"))
+    args = parser.parse_args()
+
+    report = write_cascade_report(
+        args.data_dir,
+        args.output,
+        args.artifact,
+        scaler_path=SCALER_PATH,
+        fast_model_path=args.fast_model,
+        max_recall_loss=args.max_recall_loss,
+        max_extra_false_positives=args.max_extra_false_positives,
+        n_repeats=args.repeats,
+        random_state=args.seed,
+    )
+    print(json.dumps({"output": str(args.output), **report}))
+
+
+if __name__ == "__main__":
+    main()
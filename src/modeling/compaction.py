@@ -0,0 +1,231 @@
+import copy
+import time
+
+import numpy as np
+from scipy.stats import spearmanr
+from sklearn.metrics import average_precision_score
+from xgboost import XGBClassifier, XGBRegressor
+
+
+def truncate_boosted_ensemble(model, X_val, y_val, tolerance: float = 0.005, step: int = 10):
+    """
+    Keep the shortest prefix of a boosted ensemble that matches its PR-AUC.
+
+    Boosted trees correct their predecessors, so only prefixes are valid
+    sub-ensembles. Every `step` rounds the validation PR-AUC is computed and
+    the smallest prefix within `tolerance` of the best one is kept.
+
+    Parameters
+    ----------
+    model : xgboost.XGBClassifier
+        Trained model.
+    X_val : pandas.DataFrame or numpy.ndarray
+        Validation features.
+    y_val : array-like
+        Validation labels.
+    tolerance : float, optional
+        Allowed absolute PR-AUC drop.
+    step : int, optional
+        Granularity of the prefix search in boosting rounds.
+
+    Returns
+    -------
+    compact : xgboost.XGBClassifier
+        Model containing only the selected rounds.
+    curve : dict
+        Number of rounds mapped to validation PR-AUC.
+    """
+    n_rounds = model.get_booster().num_boosted_rounds()
+    candidates = sorted(set(range(step, n_rounds, step)) | {n_rounds})
+
+    curve = {
+        k: average_precision_score(
+            y_val, model.predict_proba(X_val, iteration_range=(0, k))[:, 1]
+        )
+        for k in candidates
+    }
+    best = max(curve.values())
+    n_keep = min(k for k, score in curve.items() if score >= best - tolerance)
+
+    compact = XGBClassifier()
+    compact.load_model(model.get_booster()[:n_keep].save_raw())
+    return compact, curve
+
+
+def select_forest_trees(
+    forest,
+    X_val,
+    y_val,
+    n_trees: int = 100,
+    max_candidates: int = 100,
+    random_state: int = 42,
+):
+    """
+    Greedily select a subset of forest trees against validation PR-AUC.
+
+    Per-tree validation scores are computed once; each step adds the tree
+    whose inclusion gives the highest PR-AUC of the averaged score. At most
+    `max_candidates` randomly drawn remaining trees are tried per step to
+    bound the cost on large forests.
+
+    Parameters
+    ----------
+    forest : sklearn.ensemble.RandomForestClassifier
+        Trained forest.
+    X_val : pandas.DataFrame or numpy.ndarray
+        Validation features.
+    y_val : array-like
+        Validation labels.
+    n_trees : int, optional
+        Number of trees to keep.
+    max_candidates : int, optional
+        Trees evaluated per greedy step.
+    random_state : int, optional
+        Seed for candidate sampling.
+
+    Returns
+    -------
+    compact : sklearn.ensemble.RandomForestClassifier
+        Forest restricted to the selected trees.
+    curve : list of float
+        Validation PR-AUC after each greedy step.
+    """
+    rng = np.random.default_rng(random_state)
+    X_val = np.asarray(X_val, dtype=np.float32)
+    tree_scores = np.vstack([tree.predict_proba(X_val)[:, 1] for tree in forest.estimators_])
+
+    remaining = list(range(len(forest.estimators_)))
+    selected, curve = [], []
+    running_sum = np.zeros(tree_scores.shape[1])
+
+    for _ in range(min(n_trees, len(remaining))):
+        pool = remaining
+        if len(pool) > max_candidates:
+            pool = rng.choice(pool, size=max_candidates, replace=False).tolist()
+
+        scores = [
+            average_precision_score(y_val, running_sum + tree_scores[i]) for i in pool
+        ]
+        best = pool[int(np.argmax(scores))]
+
+        selected.append(best)
+        remaining.remove(best)
+        running_sum += tree_scores[best]
+        curve.append(max(scores))
+
+    compact = copy.deepcopy(forest)
+    compact.estimators_ = [forest.estimators_[i] for i in selected]
+    compact.n_estimators = len(selected)
+    return compact, curve
+
+
+class DistilledClassifier:
+    """
+    Classifier wrapper around a regressor trained on teacher probabilities.
+    """
+
+    def __init__(self, regressor):
+        self.regressor = regressor
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = np.clip(self.regressor.predict(X), 0.0, 1.0)
+        return np.column_stack([1.0 - proba, proba])
+
+
+def distill_model(
+    teacher,
+    X,
+    n_estimators: int = 50,
+    max_depth: int = 4,
+    random_state: int = 42,
+) -> DistilledClassifier:
+    """
+    Fit a compact XGBoost student on the teacher's soft scores.
+
+    The student minimizes log-loss against the teacher probabilities rather
+    than hard labels, which transfers the teacher's ranking with far fewer
+    trees. Unlabeled data can be used since only teacher scores are needed.
+
+    Parameters
+    ----------
+    teacher : object
+        Trained model exposing `predict_proba`.
+    X : pandas.DataFrame or numpy.ndarray
+        Transfer set.
+    n_estimators : int, optional
+        Number of student trees.
+    max_depth : int, optional
+        Student tree depth.
+    random_state : int, optional
+        Seed for reproducibility.
+
+    Returns
+    -------
+    DistilledClassifier
+        Student model exposing `predict_proba`.
+    """
+    soft_scores = teacher.predict_proba(X)[:, 1]
+    student = XGBRegressor(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        objective="binary:logistic",
+        random_state=random_state,
+    )
+    student.fit(X, soft_scores)
+    return DistilledClassifier(student)
+
+
+def fidelity_report(teacher, student, X, threshold: float, y=None) -> dict:
+    """
+    Compare student and teacher scores and decisions.
+
+    Returns
+    -------
+    dict
+        Pearson and Spearman score correlation, decision agreement at
+        `threshold`, share of teacher alerts kept by the student and,
+        when labels are given, PR-AUC of both models.
+    """
+    teacher_scores = teacher.predict_proba(X)[:, 1]
+    student_scores = student.predict_proba(X)[:, 1]
+    teacher_flags = teacher_scores >= threshold
+    student_flags = student_scores >= threshold
+
+    report = {
+        "pearson": float(np.corrcoef(teacher_scores, student_scores)[0, 1]),
+        "spearman": float(spearmanr(teacher_scores, student_scores).statistic),
+        "decision_agreement": float((teacher_flags == student_flags).mean()),
+        "alert_recall_vs_teacher": float(
+            (teacher_flags & student_flags).sum() / max(teacher_flags.sum(), 1)
+        ),
+    }
+    if y is not None:
+        report["teacher_pr_auc"] = float(average_precision_score(y, teacher_scores))
+        report["student_pr_auc"] = float(average_precision_score(y, student_scores))
+    return report
+
+
+def latency_comparison(teacher, student, X, batch_sizes=(1, 100, 10_000), n_repeats: int = 5) -> dict:
+    """
+    Time `predict_proba` of both models at several batch sizes.
+
+    Returns
+    -------
+    dict
+        Batch size mapped to best-of-`n_repeats` milliseconds per call for
+        teacher and student and the resulting speedup.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        batch = X[:batch_size]
+        timings = {}
+        for name, model in [("teacher", teacher), ("student", student)]:
+            best = np.inf
+            for _ in range(n_repeats):
+                start = time.perf_counter()
+                model.predict_proba(batch)
+                best = min(best, time.perf_counter() - start)
+            timings[f"{name}_ms"] = best * 1000
+        timings["speedup"] = timings["teacher_ms"] / timings["student_ms"]
+        results[batch_size] = timings
+    return results
@@ -0,0 +1,178 @@
+import copy
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from src.data.features import FeaturePipeline, artifact_pipeline
+from src.threshold.optimize import (
+    build_final_model_artifact,
+    compute_threshold_metrics,
+    evaluate_at_threshold,
+    select_best_f1_threshold,
+)
+
+
+def update_scaler(scaler, X_new: pd.DataFrame):
+    """
+    Update scaler statistics with a new batch using running moments.
+
+    The mean and variance are merged with the existing statistics
+    (`partial_fit`), so the cost depends only on the size of the new batch.
+    The input scaler is left untouched.
+
+    Parameters
+    ----------
+    scaler : sklearn.preprocessing.StandardScaler or FeaturePipeline
+        Fitted scaler.
+    X_new : pandas.DataFrame
+        Newly labeled, unscaled feature matrix.
+
+    Returns
+    -------
+    StandardScaler or FeaturePipeline
+        Copy of `scaler` with updated statistics.
+    """
+    updated = copy.deepcopy(scaler)
+    updated.partial_fit(X_new)
+    return updated
+
+
+def continue_boosting(model, X_new, y_new, n_new_trees: int = 50):
+    """
+    Append boosting rounds to a trained XGBoost classifier.
+
+    The existing trees are kept and `n_new_trees` trees are fitted on the
+    residuals of the new batch only.
+
+    Parameters
+    ----------
+    model : xgboost.XGBClassifier
+        Deployed model.
+    X_new : pandas.DataFrame
+        Scaled features of the new batch.
+    y_new : array-like
+        Labels of the new batch.
+    n_new_trees : int, optional
+        Number of boosting rounds to add.
+
+    Returns
+    -------
+    xgboost.XGBClassifier
+        New model containing the original and the added trees.
+    """
+    updated = copy.deepcopy(model)
+    updated.set_params(n_estimators=n_new_trees)
+    updated.fit(X_new, y_new, xgb_model=model.get_booster())
+    return updated
+
+
+def _scale(scaler, X: pd.DataFrame) -> pd.DataFrame:
+    if isinstance(scaler, FeaturePipeline):
+        return scaler.transform_frame(X)
+    return pd.DataFrame(scaler.transform(X), columns=X.columns, index=X.index)
+
+
+def incremental_update(
+    artifact: dict,
+    scaler,
+    X_new: pd.DataFrame,
+    y_new,
+    n_new_trees: int = 50,
+    X_val: pd.DataFrame = None,
+    y_val=None,
+    refit_threshold: bool = False,
+):
+    """
+    Update a deployed artifact and its scaler from a newly labeled batch.
+
+    The scaler statistics are refreshed first and the new batch is scaled
+    with them before boosting continues. Older trees therefore see inputs
+    scaled with the refreshed statistics; the shift is proportional to the
+    share of the new batch in the total sample count.
+
+    A `FeaturePipeline` bundled with the artifact takes precedence over
+    `scaler`, as in the API. When either is a pipeline, the updated one is
+    bundled as the new artifact's `feature_pipeline`.
+
+    Parameters
+    ----------
+    artifact : dict
+        Deployed artifact as produced by `build_final_model_artifact`.
+    scaler : sklearn.preprocessing.StandardScaler or FeaturePipeline
+        Scaler used with the deployed model, as saved by `scale_and_persist`.
+    X_new : pandas.DataFrame
+        Unscaled features of the new batch.
+    y_new : array-like
+        Labels of the new batch.
+    n_new_trees : int, optional
+        Number of boosting rounds to add.
+    X_val : pandas.DataFrame, optional
+        Unscaled validation features used to report metrics.
+    y_val : array-like, optional
+        Validation labels.
+    refit_threshold : bool, optional
+        Re-select the F1-optimal threshold on the validation data instead of
+        keeping the deployed threshold.
+
+    Returns
+    -------
+    artifact : dict
+        New artifact with `model_version` incremented.
+    scaler : StandardScaler or FeaturePipeline
+        Updated scaler or pipeline, also stored in the artifact.
+    """
+    pipeline = artifact_pipeline({"feature_pipeline": artifact.get("feature_pipeline")})
+    new_scaler = update_scaler(scaler if pipeline is None else pipeline, X_new)
+    is_pipeline = isinstance(new_scaler, FeaturePipeline)
+    model = continue_boosting(artifact["model"], _scale(new_scaler, X_new), y_new, n_new_trees)
+
+    threshold = artifact["threshold"]
+    val_metrics = {}
+    if X_val is not None and y_val is not None:
+        y_proba = model.predict_proba(_scale(new_scaler, X_val))[:, 1]
+        if refit_threshold:
+            threshold = select_best_f1_threshold(compute_threshold_metrics(y_val, y_proba))
+        val_metrics = evaluate_at_threshold(y_val, y_proba, threshold)
+
+    new_artifact = build_final_model_artifact(
+        model,
+        threshold,
+        val_metrics=val_metrics,
+        test_metrics={},
+        model_version=(artifact.get("model_version") or 0) + 1,
+        scaler=None if is_pipeline else new_scaler,
+        feature_pipeline=new_scaler if is_pipeline else None,
+    )
+    return new_artifact, new_scaler
+
+
+def save_versioned_artifact(
+    artifact: dict,
+    models_dir: Path,
+    stem: str = "final_xgb_with_threshold",
+) -> Path:
+    """
+    Persist an artifact as `<stem>_v<model_version>.joblib`.
+
+    Existing versions are never overwritten.
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the written artifact.
+    """
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+
+    version = artifact.get("model_version")
+    if version is None:
+        raise ValueError("Artifact has no model_version")
+
+    path = models_dir / f"{stem}_v{version}.joblib"
+    if path.exists():
+        raise FileExistsError(f"Artifact version already exists: {path}")
+
+    joblib.dump(artifact, path)
+    return path
+
@@ -0,0 +1,302 @@
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class _ColumnBuffer:
+    """
+    Preallocated columnar buffer of decision records.
+    """
+
+    def __init__(self, capacity: int, n_features: int):
+        self.capacity = capacity
+        self.n = 0
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.features = np.empty((capacity, n_features), dtype=np.float64)
+        self.fraud_probability = np.empty(capacity, dtype=np.float64)
+        self.is_fraud = np.empty(capacity, dtype=bool)
+        self.threshold = np.empty(capacity, dtype=np.float64)
+        self.latency_ms = np.empty(capacity, dtype=np.float32)
+        self.model_version = np.empty(capacity, dtype=object)
+        self.path = np.empty(capacity, dtype=object)
+        self.transaction_id = np.empty(capacity, dtype=object)
+
+    def append(self, start: int, stop: int, timestamp, features, probs, flags, threshold,
+               latency_ms, model_version, path, transaction_ids) -> int:
+        """
+        Copy rows `start:stop` of a batch; return the number of rows copied.
+        """
+        count = min(stop - start, self.capacity - self.n)
+        dst = slice(self.n, self.n + count)
+        src = slice(start, start + count)
+        self.timestamp[dst] = timestamp
+        self.features[dst] = features[src]
+        self.fraud_probability[dst] = probs[src]
+        self.is_fraud[dst] = flags[src]
+        self.threshold[dst] = threshold
+        self.latency_ms[dst] = latency_ms
+        self.model_version[dst] = model_version
+        self.path[dst] = path
+        self.transaction_id[dst] = None if transaction_ids is None else transaction_ids[src]
+        self.n += count
+        return count
+
+    def to_table(self, feature_columns: list) -> pa.Table:
+        n = self.n
+        columns = {
+            "timestamp": pa.array(self.timestamp[:n]),
+            "fraud_probability": pa.array(self.fraud_probability[:n]),
+            "is_fraud": pa.array(self.is_fraud[:n]),
+            "threshold": pa.array(self.threshold[:n]),
+            "latency_ms": pa.array(self.latency_ms[:n]),
+            "model_version": pa.array(self.model_version[:n], type=pa.string()),
+            "path": pa.array(self.path[:n], type=pa.string()),
+            "transaction_id": pa.array(self.transaction_id[:n], type=pa.string()),
+        }
+        for i, name in enumerate(feature_columns):
+            columns[name] = pa.array(self.features[:n, i])
+        return pa.table(columns)
+
+
+class AuditLogWriter:
+    """
+    Asynchronous, bounded-memory audit log of scoring decisions.
+
+    `record` copies a batch of decisions into an in-memory columnar buffer
+    and returns immediately. Full buffers, and partially filled ones every
+    `flush_seconds`, are handed to a background thread that appends them to
+    parquet files rotated by row count or age. At most
+    `max_pending_buffers` buffers wait for the disk; beyond that, records
+    are dropped and counted instead of blocking the scoring path.
+
+    Files are written under a dot-prefixed temporary name and renamed once
+    closed, so `pandas.read_parquet(directory)` only sees complete files.
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+        Output directory.
+    feature_columns : list of str
+        Names of the feature matrix columns passed to `record`.
+    buffer_rows : int, optional
+        Rows per in-memory buffer.
+    max_pending_buffers : int, optional
+        Full buffers allowed to wait for the writer thread.
+    max_file_rows : int, optional
+        Rotate the output file after this many rows.
+    rotate_seconds : float, optional
+        Rotate the output file after this many seconds.
+    flush_seconds : float, optional
+        Maximum time a record stays in memory before being handed over.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        feature_columns: list,
+        buffer_rows: int = 8192,
+        max_pending_buffers: int = 8,
+        max_file_rows: int = 1_000_000,
+        rotate_seconds: float = 3600.0,
+        flush_seconds: float = 1.0,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.feature_columns = list(feature_columns)
+        self.buffer_rows = buffer_rows
+        self.max_file_rows = max_file_rows
+        self.rotate_seconds = rotate_seconds
+        self.flush_seconds = flush_seconds
+
+        self._active = self._new_buffer()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending_buffers)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._writer = None
+        self._file_path = None
+        self._file_rows = 0
+        self._file_opened = 0.0
+        self._file_seq = 0
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.files_written = 0
+
+    def _new_buffer(self) -> _ColumnBuffer:
+        return _ColumnBuffer(self.buffer_rows, len(self.feature_columns))
+
+    def _hand_over(self) -> bool:
+        """
+        Queue the active buffer for writing; must be called with the lock held.
+        """
+        try:
+            self._pending.put_nowait(self._active)
+        except queue.Full:
+            return False
+        self._active = self._new_buffer()
+        return True
+
+    def record(
+        self,
+        features: np.ndarray,
+        probs: np.ndarray,
+        flags: np.ndarray,
+        threshold: float,
+        model_version: str,
+        latency_ms: float,
+        path: str = "full",
+        transaction_ids: np.ndarray = None,
+    ) -> int:
+        """
+        Buffer a batch of decisions without blocking on I/O.
+
+        `path` records what decided the rows: "full" for the model, "rules"
+        for screening rules, "degraded" for the fast path under load.
+        `transaction_ids`, one per row, lets decisions be joined to cases
+        and labels.
+
+        Returns
+        -------
+        int
+            Number of rows dropped because the writer is behind.
+        """
+        n = len(probs)
+        timestamp = time.time()
+        done = 0
+        with self._lock:
+            while done < n:
+                if self._active.n == self._active.capacity and not self._hand_over():
+                    break
+                done += self._active.append(
+                    done, n, timestamp, features, probs, flags, threshold,
+                    latency_ms, model_version, path, transaction_ids,
+                )
+            if self._active.n == self._active.capacity:
+                self._hand_over()
+            self.recorded += done
+            self.dropped += n - done
+
+        if n - done:
+            logger.warning(f"Audit log backpressure: dropped {n - done} record(s)")
+        return n - done
+
+    def _open_file(self):
+        self._file_seq += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"audit-{stamp}-{os.getpid()}-{self._file_seq:05d}.parquet"
+        self._file_path = self.directory / name
+        tmp_path = self.directory / f".{name}.tmp"
+        schema = self._new_buffer().to_table(self.feature_columns).schema
+        self._writer = pq.ParquetWriter(tmp_path, schema)
+        self._file_rows = 0
+        self._file_opened = time.monotonic()
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        tmp_path = self.directory / f".{self._file_path.name}.tmp"
+        tmp_path.rename(self._file_path)
+        self._writer = None
+        self.files_written += 1
+
+    def _write(self, buffer: _ColumnBuffer):
+        if buffer.n == 0:
+            return
+        if self._writer is None:
+            self._open_file()
+        self._writer.write_table(buffer.to_table(self.feature_columns))
+        self._file_rows += buffer.n
+        self.written += buffer.n
+
+    def _maybe_rotate(self):
+        if self._writer is None:
+            return
+        too_big = self._file_rows >= self.max_file_rows
+        too_old = time.monotonic() - self._file_opened >= self.rotate_seconds
+        if too_big or too_old:
+            self._close_file()
+
+    def _flush_active(self):
+        with self._lock:
+            if self._active.n:
+                self._hand_over()
+
+    def _write_logged(self, buffer: _ColumnBuffer):
+        try:
+            self._write(buffer)
+            self._maybe_rotate()
+        except Exception as e:
+            logger.error(f"Audit log write failed, {buffer.n} record(s) lost: {e}")
+            self.dropped += buffer.n
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                buffer = self._pending.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                self._flush_active()
+                self._maybe_rotate()
+                continue
+            self._write_logged(buffer)
+
+        # Drain in order, then write the partially filled buffer directly
+        while not self._pending.empty():
+            self._write_logged(self._pending.get_nowait())
+        with self._lock:
+            active, self._active = self._active, self._new_buffer()
+        self._write_logged(active)
+        self._close_file()
+
+    def start(self):
+        """
+        Start the background writer thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Flush everything buffered, close the current file and stop the thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def metrics(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending_buffers": self._pending.qsize(),
+            "max_pending_buffers": self._pending.maxsize,
+            "files_written": self.files_written,
+        }
+
+
+def read_audit_log(directory: Path, columns: list = None, start: float = None, end: float = None) -> pd.DataFrame:
+    """
+    Load audit records, optionally restricted to `start <= timestamp < end`.
+    """
+    from src.data.load import load_credit_card_data, time_range_filter
+
+    return load_credit_card_data(
+        directory, columns=columns, filters=time_range_filter(start, end, column="timestamp")
+    )
@@ -0,0 +1,396 @@
+"""
+Case store: a queue of flagged transactions for analyst review.
+
+Usage:
+    python -m src.monitoring.cases --db logs/cases.sqlite --status open --sort fraud_probability --limit 20
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("open", "investigating", "confirmed_fraud", "false_positive", "closed")
+# Queue orderings; each has an index alone and behind `status`
+SORT_COLUMNS = ("created_at", "fraud_probability", "amount")
+
+# Stay below SQLite's default host-parameter limit
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    case_id INTEGER PRIMARY KEY,
+    transaction_id TEXT,
+    created_at REAL NOT NULL,
+    fraud_probability REAL NOT NULL,
+    amount REAL NOT NULL,
+    model_version TEXT,
+    rule TEXT,
+    anomaly_score REAL,
+    status TEXT NOT NULL DEFAULT 'open',
+    updated_at REAL NOT NULL,
+    assignee TEXT,
+    note TEXT,
+    features BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_transaction_id ON cases (transaction_id);
+CREATE TABLE IF NOT EXISTS case_counts (
+    status TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS cases_{column} ON cases ({column});\n"
+    f"CREATE INDEX IF NOT EXISTS cases_status_{column} ON cases (status, {column});\n"
+    for column in SORT_COLUMNS
+)
+
+# Returned by queue queries; the feature vector is only read for a single case
+_SUMMARY = (
+    "case_id", "transaction_id", "created_at", "fraud_probability", "amount",
+    "model_version", "rule", "anomaly_score", "status", "updated_at", "assignee", "note",
+)
+
+
+def _encode_cursor(row: dict, sort: str) -> str:
+    return f"{row[sort]!r}:{row['case_id']}"
+
+
+def _decode_cursor(cursor: str):
+    value, case_id = cursor.rsplit(":", 1)
+    return float(value), int(case_id)
+
+
+class CaseStore:
+    """
+    Embedded, indexed queue of flagged transactions.
+
+    Flagged rows are buffered in memory on the scoring path and inserted
+    in batches by a background thread, so a request never waits on disk.
+    Every queue ordering (`SORT_COLUMNS`) has an index on its own and one
+    behind `status`, and queries page with a keyset cursor (the last row's
+    sort value and case ID) instead of `OFFSET`. A page is therefore one
+    index range scan of `limit` rows whatever the table size, and status
+    updates are primary-key writes. Per-status counts are maintained in
+    the same transactions, so the queue size is read without a scan.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        SQLite database file.
+    feature_columns : list of str
+        Column order of the raw feature rows; `Amount` is indexed.
+    flush_seconds : float, optional
+        Interval between background inserts of buffered cases.
+    max_pending : int, optional
+        Buffered cases beyond which new ones are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        feature_columns: list,
+        flush_seconds: float = 1.0,
+        max_pending: int = 100_000,
+    ):
+        self.path = Path(path)
+        self.feature_columns = list(feature_columns)
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._amount = self.feature_columns.index("Amount")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Create the schema now but keep no connection open across the
+        # pre-fork server's `fork()`; each process opens its own
+        self._connect().close()
+        self._connection = None
+        self._connection_pid = None
+        self._connect_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.updated = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Keep the upper levels of the sort indexes cached as the table grows
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """
+        This process's connection, opened on first use after any `fork()`.
+        """
+        pid = os.getpid()
+        if self._connection_pid != pid:
+            with self._connect_lock:
+                if self._connection_pid != pid:
+                    self._connection = self._connect()
+                    self._connection_pid = pid
+        return self._connection
+
+    def record(
+        self,
+        raw: np.ndarray,
+        probs: np.ndarray,
+        flags: np.ndarray,
+        model_version: str,
+        transaction_ids=None,
+        rules=None,
+        anomaly=None,
+        timestamp: float = None,
+    ):
+        """
+        Buffer the flagged rows of a scored batch as open cases.
+        """
+        rows = np.flatnonzero(flags)
+        if not len(rows):
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        raw = np.asarray(raw, dtype=np.float64)
+        cases = [
+            (
+                None if transaction_ids is None else transaction_ids[i],
+                timestamp,
+                float(probs[i]),
+                float(raw[i, self._amount]),
+                model_version,
+                None if rules is None else rules[i],
+                None if anomaly is None else float(anomaly[i]),
+                "open",
+                timestamp,
+                None,
+                None,
+                raw[i].tobytes(),
+            )
+            for i in rows
+        ]
+        with self._pending_lock:
+            room = self.max_pending - len(self._pending)
+            if room < len(cases):
+                self.dropped += len(cases) - max(room, 0)
+                cases = cases[:max(room, 0)]
+            self._pending.extend(cases)
+
+    def _add_counts(self, counts: dict):
+        self._conn.executemany(
+            "INSERT INTO case_counts VALUES (?, ?) ON CONFLICT (status) DO UPDATE SET count = count + excluded.count",
+            list(counts.items()),
+        )
+
+    def flush(self) -> int:
+        """
+        Insert buffered cases in one transaction.
+        """
+        with self._pending_lock:
+            cases, self._pending = self._pending, []
+        if not cases:
+            return 0
+
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT INTO cases ({', '.join(_SUMMARY[1:])}, features) VALUES ({', '.join('?' * 12)})",
+                    cases,
+                )
+                self._add_counts({"open": len(cases)})
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.recorded += len(cases)
+        return len(cases)
+
+    def query(
+        self,
+        status: str = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        limit: int = 50,
+        cursor: str = None,
+    ) -> dict:
+        """
+        One page of the case queue.
+
+        Parameters
+        ----------
+        status : str, optional
+            Only cases in this status; all cases by default.
+        sort : str, optional
+            One of `SORT_COLUMNS`; ties are broken by case ID.
+        descending : bool, optional
+            Highest (or newest) first.
+        limit : int, optional
+            Page size.
+        cursor : str, optional
+            `next_cursor` of the previous page.
+
+        Returns
+        -------
+        dict
+            `cases` (list of dict) and `next_cursor`, None on the last page.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {SORT_COLUMNS}")
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"status must be one of {STATUSES}")
+        if not 0 < limit <= 1000:
+            raise ValueError("limit must be in (0, 1000]")
+
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if cursor is not None:
+            # Row-value comparison is resolved by the (status, sort) index range
+            where.append(f"({sort}, case_id) {'<' if descending else '>'} (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        order = "DESC" if descending else "ASC"
+        query = (
+            f"SELECT {', '.join(_SUMMARY)} FROM cases"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + f" ORDER BY {sort} {order}, case_id {order} LIMIT ?"
+        )
+        with self._db_lock:
+            cases = [dict(row) for row in self._conn.execute(query, params + [limit + 1])]
+
+        next_cursor = _encode_cursor(cases[limit - 1], sort) if len(cases) > limit else None
+        return {"cases": cases[:limit], "next_cursor": next_cursor}
+
+    def get(self, case_id: int) -> dict:
+        """
+        One case with its raw features; raises KeyError if it does not exist.
+        """
+        with self._db_lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_SUMMARY)}, features FROM cases WHERE case_id = ?", (case_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(case_id)
+        case = dict(row)
+        case["features"] = dict(zip(self.feature_columns, np.frombuffer(case["features"]).tolist()))
+        return case
+
+    def update_status(self, case_ids: list, status: str, assignee: str = None, note: str = None) -> int:
+        """
+        Move cases to `status`, optionally setting the assignee and note.
+
+        Returns
+        -------
+        int
+            Number of cases found and updated.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"status must be one of {STATUSES}")
+        ids = [int(case_id) for case_id in case_ids]
+        now = time.time()
+
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = []
+                for start in range(0, len(ids), _CHUNK):
+                    chunk = ids[start:start + _CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    previous.extend(
+                        row[0] for row in self._conn.execute(f"SELECT status FROM cases WHERE case_id IN ({marks})", chunk)
+                    )
+                    self._conn.execute(
+                        f"UPDATE cases SET status = ?, updated_at = ?, assignee = coalesce(?, assignee), "
+                        f"note = coalesce(?, note) WHERE case_id IN ({marks})",
+                        [status, now, assignee, note] + chunk,
+                    )
+                counts = {}
+                for old in previous:
+                    counts[old] = counts.get(old, 0) - 1
+                counts[status] = counts.get(status, 0) + len(previous)
+                self._add_counts(counts)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.updated += len(previous)
+        return len(previous)
+
+    def counts(self) -> dict:
+        """
+        Cases per status.
+        """
+        with self._db_lock:
+            stored = dict(self._conn.execute("SELECT status, count FROM case_counts").fetchall())
+        return {status: stored.get(status, 0) for status in STATUSES}
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Case store flush failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self._flush_logged()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="case-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the writer thread and flush what is buffered.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._flush_logged()
+
+    def metrics(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "updated": self.updated,
+        }
+
+
+def main():
+    from src.api.schemas import FEATURE_COLUMNS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=Path("logs/cases.sqlite"))
+    parser.add_argument("--status", choices=STATUSES)
+    parser.add_argument("--sort", choices=SORT_COLUMNS, default="created_at")
+    parser.add_argument("--ascending", action="store_true")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--cursor")
+    args = parser.parse_args()
+
+    store = CaseStore(args.db, FEATURE_COLUMNS)
+    page = store.query(args.status, args.sort, not args.ascending, args.limit, args.cursor)
+    print(json.dumps({"counts": store.counts(), **page}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
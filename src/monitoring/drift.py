@@ -0,0 +1,330 @@
+"""
+Streaming drift monitoring of features and fraud scores against a training reference.
+
+Usage:
+    python -m src.monitoring.drift --data-dir data/interim --output models/drift_reference.npz
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCORE_FEATURE = "fraud_probability"
+DEFAULT_DRIFT_FEATURES = [f"V{i}" for i in range(1, 29)] + ["Amount"]
+
+# Common rule of thumb: PSI above 0.2 indicates a significant shift.
+PSI_ALERT_LEVEL = 0.2
+
+_EPS = 1e-6
+
+
+def fit_drift_reference(X_train: pd.DataFrame, scores=None, features=None, n_bins: int = 10):
+    """
+    Freeze histogram bins and reference proportions from the training data.
+
+    Bin edges are the training quantiles of each feature, so every reference
+    bin holds roughly the same share of samples.
+
+    Parameters
+    ----------
+    X_train : pandas.DataFrame
+        Unscaled training features.
+    scores : array-like, optional
+        Model scores on the training data. Uniform bins on [0, 1] are used
+        for the score histogram when omitted.
+    features : list of str, optional
+        Features to monitor. Defaults to V1-V28 and Amount.
+    n_bins : int, optional
+        Number of bins per feature.
+
+    Returns
+    -------
+    dict
+        Reference with `features`, `edges` (interior edges, shape
+        `(n_features, n_bins - 1)`) and `proportions` (shape
+        `(n_features, n_bins)`). The score is the last feature.
+    """
+    features = list(DEFAULT_DRIFT_FEATURES if features is None else features)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+
+    values = X_train[features].to_numpy(dtype=float)
+    feature_edges = np.quantile(values, quantiles, axis=0).T
+    feature_props = _histogram(values, feature_edges, n_bins) / len(values)
+
+    if scores is not None:
+        scores = np.asarray(scores, dtype=float)[:, None]
+        score_edges = np.quantile(scores, quantiles, axis=0).T
+        score_props = _histogram(scores, score_edges, n_bins) / len(scores)
+    else:
+        score_edges = quantiles[None, :]
+        score_props = np.full((1, n_bins), 1.0 / n_bins)
+
+    edges = np.vstack([feature_edges, score_edges])
+    proportions = np.vstack([feature_props, score_props])
+
+    return {
+        "features": features + [SCORE_FEATURE],
+        "edges": edges,
+        "proportions": proportions,
+    }
+
+
+def save_drift_reference(reference: dict, path: Path):
+    """
+    Save a drift reference as a compressed npz file.
+    """
+    np.savez_compressed(
+        path,
+        features=np.array(reference["features"]),
+        edges=reference["edges"],
+        proportions=reference["proportions"],
+    )
+
+
+def load_drift_reference(path: Path) -> dict:
+    """
+    Load a drift reference saved with `save_drift_reference`.
+    """
+    with np.load(path) as data:
+        return {
+            "features": [str(f) for f in data["features"]],
+            "edges": data["edges"],
+            "proportions": data["proportions"],
+        }
+
+
+def write_drift_reference(
+    X_train: pd.DataFrame,
+    output: Path,
+    artifact_path: Path = None,
+    scaler_path: Path = None,
+    n_bins: int = 10,
+) -> dict:
+    """
+    Fit a drift reference on unscaled training features and save it for the API.
+
+    Parameters
+    ----------
+    X_train : pandas.DataFrame
+        Unscaled training features in request units.
+    output : pathlib.Path
+        Destination npz file, read by the API at startup.
+    artifact_path : pathlib.Path, optional
+        Model artifact whose training scores form the score reference;
+        uniform score bins are used without it.
+    scaler_path : pathlib.Path, optional
+        Standalone scaler for artifacts that bundle none, as in the API.
+    n_bins : int, optional
+        Number of bins per feature.
+
+    Returns
+    -------
+    dict
+        The saved reference.
+    """
+    scores = None
+    if artifact_path is not None:
+        from src.api.artifacts import load_artifact_file
+        from src.api.schemas import FEATURE_COLUMNS
+
+        artifact = load_artifact_file(Path(artifact_path), scaler_path=scaler_path)
+        raw = X_train[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        X = raw if artifact["transform"] is None else artifact["transform"](raw)
+        scores = artifact["model"].predict_proba(X)[:, 1]
+
+    reference = fit_drift_reference(X_train, scores, n_bins=n_bins)
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    save_drift_reference(reference, output)
+    return reference
+
+
+def _bin_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Map an `(n, F)` matrix to flat bin indices into an `(F, n_bins)` array.
+    """
+    n_bins = edges.shape[1] + 1
+    bins = (values[:, :, None] >= edges[None, :, :]).sum(axis=2)
+    return bins + np.arange(values.shape[1]) * n_bins
+
+
+def _histogram(values: np.ndarray, edges: np.ndarray, n_bins: int) -> np.ndarray:
+    flat = _bin_indices(values, edges).ravel()
+    return np.bincount(flat, minlength=edges.shape[0] * n_bins).reshape(-1, n_bins)
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    Compute PSI row-wise between two `(F, n_bins)` proportion arrays.
+    """
+    expected = np.clip(expected, _EPS, None)
+    actual = np.clip(actual, _EPS, None)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def binned_ks_statistic(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    Compute the KS statistic row-wise from binned proportions.
+
+    The CDFs are only compared at the frozen bin edges, so this is a lower
+    bound on the exact two-sample statistic.
+    """
+    return np.abs(np.cumsum(expected, axis=1) - np.cumsum(actual, axis=1)).max(axis=1)
+
+
+class DriftMonitor:
+    """
+    Streaming drift monitor over fixed-bin feature histograms.
+
+    `observe` performs one vectorized bin-increment per call; PSI and KS are
+    computed from the counts by a background thread every
+    `interval_seconds` and served from `snapshot`.
+
+    Parameters
+    ----------
+    reference : dict
+        Reference produced by `fit_drift_reference`.
+    columns : list of str
+        Column order of the feature matrices passed to `observe`.
+    interval_seconds : float, optional
+        Period of the background computation.
+    reset_after_compute : bool, optional
+        Start a fresh window after every computation instead of accumulating
+        counts since startup.
+    """
+
+    def __init__(
+        self,
+        reference: dict,
+        columns: list,
+        interval_seconds: float = 60.0,
+        reset_after_compute: bool = False,
+    ):
+        self.features = reference["features"]
+        self.edges = np.asarray(reference["edges"], dtype=float)
+        self.expected = np.asarray(reference["proportions"], dtype=float)
+        self.n_bins = self.edges.shape[1] + 1
+        self.interval_seconds = interval_seconds
+        self.reset_after_compute = reset_after_compute
+
+        columns = list(columns)
+        self._column_idx = np.array([columns.index(f) for f in self.features[:-1]])
+
+        self._counts = np.zeros(len(self.features) * self.n_bins, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._latest = None
+
+    def observe(self, X: np.ndarray, scores: np.ndarray):
+        """
+        Add a batch of raw feature rows and their scores to the histograms.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            Unscaled features of shape `(n, len(columns))`.
+        scores : numpy.ndarray
+            Fraud probabilities of shape `(n,)`.
+        """
+        values = np.column_stack([X[:, self._column_idx], scores])
+        increment = np.bincount(
+            _bin_indices(values, self.edges).ravel(), minlength=self._counts.size
+        )
+        with self._lock:
+            self._counts += increment
+
+    def compute(self) -> dict:
+        """
+        Compute PSI and KS per feature from the counts observed so far.
+        """
+        with self._lock:
+            counts = self._counts.reshape(-1, self.n_bins).copy()
+            if self.reset_after_compute:
+                self._counts[:] = 0
+
+        n_observed = int(counts[0].sum())
+        result = {
+            "computed_at": time.time(),
+            "n_observed": n_observed,
+            "features": {},
+            "drifted": [],
+        }
+        if n_observed == 0:
+            return result
+
+        actual = counts / n_observed
+        psi = population_stability_index(self.expected, actual)
+        ks = binned_ks_statistic(self.expected, actual)
+
+        result["features"] = {
+            name: {"psi": float(p), "ks": float(k)} for name, p, k in zip(self.features, psi, ks)
+        }
+        result["drifted"] = [name for name, p in zip(self.features, psi) if p > PSI_ALERT_LEVEL]
+        return result
+
+    def snapshot(self):
+        """
+        Return the most recent background computation, or None before the first one.
+        """
+        return self._latest
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self._latest = self.compute()
+            except Exception as e:
+                logger.error(f"Drift computation failed: {e}")
+
+    def start(self):
+        """
+        Start the background computation thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and compute a final snapshot.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._latest = self.compute()
+
+
+def main():
+    from src.api.artifacts import MODEL_PATH, SCALER_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=Path("data/interim"), help="Unscaled X_<split> files")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--artifact", type=Path, default=MODEL_PATH, help="Model whose training scores are referenced")
+    parser.add_argument("--no-scores", action="store_true", help="Use uniform score bins instead")
+    parser.add_argument("--n-bins", type=int, default=10)
+    parser.add_argument("--output", type=Path, default=MODEL_PATH.parent / "drift_reference.npz")
+    args = parser.parse_args()
+
+    X = pd.read_parquet(args.data_dir / f"X_{args.split}.parquet")
+    reference = write_drift_reference(
+        X, args.output,
+        artifact_path=None if args.no_scores else args.artifact,
+        scaler_path=SCALER_PATH,
+        n_bins=args.n_bins,
+    )
+    print(json.dumps({"output": str(args.output), "rows": len(X), "features": reference["features"]}))
+
+
+if __name__ == "__main__":
+    main()
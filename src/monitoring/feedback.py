@@ -0,0 +1,416 @@
+"""
+Delayed-label feedback: join late labels to logged predictions and track live quality.
+
+Usage:
+    python -m src.monitoring.feedback --db logs/feedback.sqlite chargebacks.csv --window-hours 168
+    python -m src.monitoring.feedback --db logs/feedback.sqlite --retention-days 90
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.metrics import ClassificationAccumulator
+
+logger = logging.getLogger(__name__)
+
+# Stay below SQLite's default host-parameter limit
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    transaction_id TEXT PRIMARY KEY,
+    scored_at REAL NOT NULL,
+    fraud_probability REAL NOT NULL,
+    is_fraud INTEGER NOT NULL,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_scored_at ON predictions (scored_at);
+CREATE TABLE IF NOT EXISTS labels (
+    transaction_id TEXT PRIMARY KEY,
+    label INTEGER NOT NULL,
+    labeled_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metric_buckets (
+    bucket REAL PRIMARY KEY,
+    confusion BLOB NOT NULL,
+    histogram BLOB NOT NULL
+);
+"""
+
+
+class FeedbackStore:
+    """
+    On-disk index of predictions and late labels with rolling quality metrics.
+
+    Predictions carrying a transaction ID are buffered in memory and written
+    to SQLite by a background thread. Labels (e.g. chargebacks arriving days
+    later) are joined to them by transaction ID through the primary-key
+    index, in either arrival order. Every join adds the labeled prediction
+    to a `ClassificationAccumulator` for the time bucket in which it was
+    scored; bucket accumulators are stored in the same transaction, so all
+    API workers sharing the database see the same metrics and a restart
+    loses nothing. A relabeled transaction retracts its previous
+    contribution. Rolling metrics merge the buckets of the requested window.
+    With `retention_seconds` set, the writer thread prunes older rows every
+    `prune_seconds`, so the tables stay bounded.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        SQLite database file.
+    bucket_seconds : float, optional
+        Width of a metrics bucket in prediction time.
+    n_bins : int, optional
+        Probability histogram resolution used for ROC AUC.
+    flush_seconds : float, optional
+        Interval between background writes of buffered predictions.
+    max_pending : int, optional
+        Buffered predictions beyond which new ones are dropped and counted.
+    retention_seconds : float, optional
+        Age beyond which predictions, labels and buckets are pruned; kept
+        forever when None.
+    prune_seconds : float, optional
+        Interval between background prunes.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        bucket_seconds: float = 3600.0,
+        n_bins: int = 1000,
+        flush_seconds: float = 1.0,
+        max_pending: int = 100_000,
+        retention_seconds: float = None,
+        prune_seconds: float = 3600.0,
+    ):
+        self.path = Path(path)
+        self.bucket_seconds = bucket_seconds
+        self.n_bins = n_bins
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.prune_seconds = prune_seconds
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Create the schema now but keep no connection open: the API loads the
+        # store before the pre-fork server forks its workers
+        self._connect().close()
+        self._connection = None
+        self._connection_pid = None
+        self._connect_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.labels_ingested = 0
+        self.labels_matched = 0
+        self.pruned = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """
+        This process's connection, opened on first use.
+
+        SQLite connections must not be carried across `fork()`, so a forked
+        worker opens its own instead of using one inherited from the parent.
+        """
+        pid = os.getpid()
+        if self._connection_pid != pid:
+            with self._connect_lock:
+                if self._connection_pid != pid:
+                    self._connection = self._connect()
+                    self._connection_pid = pid
+        return self._connection
+
+    def record_predictions(self, transaction_ids, probs, flags, model_version: str, timestamp: float = None):
+        """
+        Buffer scored transactions; rows without a transaction ID are skipped.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = [
+            (tid, timestamp, float(p), int(f), model_version)
+            for tid, p, f in zip(transaction_ids, probs, flags)
+            if tid is not None
+        ]
+        if not rows:
+            return
+        with self._pending_lock:
+            room = self.max_pending - len(self._pending)
+            if room < len(rows):
+                self.dropped += len(rows) - max(room, 0)
+                rows = rows[:max(room, 0)]
+            self._pending.extend(rows)
+
+    def _bucket(self, scored_at: np.ndarray) -> np.ndarray:
+        return np.floor(scored_at / self.bucket_seconds) * self.bucket_seconds
+
+    def _apply(self, scored_at, labels, probs, flags, weight: int):
+        """
+        Add labeled predictions to their bucket accumulators (inside a transaction).
+        """
+        if not len(labels):
+            return
+        buckets = self._bucket(np.asarray(scored_at, dtype=np.float64))
+        labels, probs, flags = np.asarray(labels), np.asarray(probs), np.asarray(flags)
+        for bucket in np.unique(buckets):
+            rows = buckets == bucket
+            acc = self._load_bucket(float(bucket))
+            acc.update(labels[rows], flags[rows], probs[rows], weight=weight)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metric_buckets VALUES (?, ?, ?)",
+                (float(bucket), acc.confusion.tobytes(), acc.histogram.tobytes()),
+            )
+
+    def _load_bucket(self, bucket: float) -> ClassificationAccumulator:
+        acc = ClassificationAccumulator(self.n_bins)
+        row = self._conn.execute(
+            "SELECT confusion, histogram FROM metric_buckets WHERE bucket = ?", (bucket,)
+        ).fetchone()
+        if row is not None:
+            acc.confusion = np.frombuffer(row[0], dtype=np.int64).reshape(2, 2).copy()
+            acc.histogram = np.frombuffer(row[1], dtype=np.int64).reshape(2, -1).copy()
+        return acc
+
+    def _select(self, query: str, ids: list) -> list:
+        rows = []
+        for start in range(0, len(ids), _CHUNK):
+            chunk = ids[start:start + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows.extend(self._conn.execute(query.format(marks=marks), chunk).fetchall())
+        return rows
+
+    def flush(self) -> int:
+        """
+        Write buffered predictions and join labels that arrived before them.
+        """
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+
+        # Last prediction per transaction wins within a flush; earlier flushes win overall
+        rows = list({row[0]: row for row in rows}.values())
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in rows]
+                existing = {
+                    r[0] for r in self._select("SELECT transaction_id FROM predictions WHERE transaction_id IN ({marks})", ids)
+                }
+                rows = [row for row in rows if row[0] not in existing]
+                self._conn.executemany("INSERT INTO predictions VALUES (?, ?, ?, ?, ?)", rows)
+
+                labels = dict(self._select(
+                    "SELECT transaction_id, label FROM labels WHERE transaction_id IN ({marks})", [row[0] for row in rows]
+                ))
+                matched = [row for row in rows if row[0] in labels]
+                self._apply(
+                    [row[1] for row in matched], [labels[row[0]] for row in matched],
+                    [row[2] for row in matched], [row[3] for row in matched], weight=1,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.recorded += len(rows)
+        self.labels_matched += len(matched)
+        return len(rows)
+
+    def ingest_labels(self, transaction_ids, labels, labeled_at: float = None) -> dict:
+        """
+        Store labels and join them to logged predictions.
+
+        Parameters
+        ----------
+        transaction_ids : sequence of str
+            Labeled transactions.
+        labels : sequence of int
+            1 for fraud, 0 for legitimate.
+        labeled_at : float, optional
+            Label timestamp; now by default.
+
+        Returns
+        -------
+        dict
+            Labels `ingested` and `matched` to a logged prediction.
+        """
+        labeled_at = time.time() if labeled_at is None else labeled_at
+        new = {str(tid): int(label) for tid, label in zip(transaction_ids, labels)}
+        if not new or not set(new.values()) <= {0, 1}:
+            raise ValueError("Labels must be 0 or 1")
+        ids = list(new)
+
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = dict(self._select("SELECT transaction_id, label FROM labels WHERE transaction_id IN ({marks})", ids))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO labels VALUES (?, ?, ?)",
+                    [(tid, label, labeled_at) for tid, label in new.items()],
+                )
+                predictions = self._select(
+                    "SELECT transaction_id, scored_at, fraud_probability, is_fraud FROM predictions "
+                    "WHERE transaction_id IN ({marks})", ids,
+                )
+                # Retract relabeled transactions before adding them with their new label
+                changed = [p for p in predictions if p[0] in old and old[p[0]] != new[p[0]]]
+                added = [p for p in predictions if p[0] not in old or old[p[0]] != new[p[0]]]
+                for rows, source, weight in ((changed, old, -1), (added, new, 1)):
+                    self._apply(
+                        [p[1] for p in rows], [source[p[0]] for p in rows],
+                        [p[2] for p in rows], [p[3] for p in rows], weight=weight,
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.labels_ingested += len(new)
+        self.labels_matched += len(predictions)
+        return {"ingested": len(new), "matched": len(predictions)}
+
+    def rolling_metrics(self, window_seconds: float = 7 * 86400, now: float = None) -> dict:
+        """
+        Merge the bucket accumulators of the last `window_seconds` of prediction time.
+        """
+        now = time.time() if now is None else now
+        since = float(self._bucket(np.float64(now - window_seconds)))
+        with self._db_lock:
+            buckets = [
+                row[0] for row in self._conn.execute(
+                    "SELECT bucket FROM metric_buckets WHERE bucket >= ? ORDER BY bucket", (since,)
+                )
+            ]
+            acc = ClassificationAccumulator(self.n_bins)
+            for bucket in buckets:
+                acc.merge(self._load_bucket(bucket))
+
+        metrics = acc.compute()
+        metrics["confusion_matrix"] = metrics["confusion_matrix"].tolist()
+        if np.isnan(metrics["roc_auc"]):
+            # Undefined until both classes have been labeled
+            metrics["roc_auc"] = None
+        return {"window_seconds": window_seconds, "buckets": len(buckets), **metrics}
+
+    def prune(self, before: float) -> int:
+        """
+        Delete predictions, labels and buckets older than `before`.
+        """
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._conn.execute("DELETE FROM predictions WHERE scored_at < ?", (before,)).rowcount
+                self._conn.execute("DELETE FROM labels WHERE labeled_at < ?", (before,))
+                self._conn.execute(
+                    "DELETE FROM metric_buckets WHERE bucket < ?", (float(self._bucket(np.float64(before))),)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.pruned += deleted
+        return deleted
+
+    def prune_expired(self, now: float = None) -> int:
+        """
+        Prune everything older than `retention_seconds`; a no-op without retention.
+        """
+        if self.retention_seconds is None:
+            return 0
+        now = time.time() if now is None else now
+        return self.prune(now - self.retention_seconds)
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Feedback flush failed: {e}")
+
+    def _prune_logged(self):
+        try:
+            deleted = self.prune_expired()
+            if deleted:
+                logger.info(f"Pruned {deleted} prediction(s) past the feedback retention period")
+        except Exception as e:
+            logger.error(f"Feedback prune failed: {e}")
+
+    def _run(self):
+        self._prune_logged()
+        pruned_at = time.monotonic()
+        while not self._stop.wait(self.flush_seconds):
+            self._flush_logged()
+            if time.monotonic() - pruned_at >= self.prune_seconds:
+                self._prune_logged()
+                pruned_at = time.monotonic()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the writer thread and flush what is buffered.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._flush_logged()
+
+    def metrics(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "labels_ingested": self.labels_ingested,
+            "labels_matched": self.labels_matched,
+            "pruned": self.pruned,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labels", type=Path, nargs="?", help="CSV with transaction_id and label columns")
+    parser.add_argument("--db", type=Path, default=Path("logs/feedback.sqlite"))
+    parser.add_argument("--window-hours", type=float, default=168)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--retention-days", type=float, help="Prune rows older than this first")
+    args = parser.parse_args()
+
+    retention = None if args.retention_days is None else args.retention_days * 86400
+    store = FeedbackStore(args.db, retention_seconds=retention)
+    if retention is not None:
+        logger.info(f"Pruned {store.prune_expired()} prediction(s) older than {args.retention_days} days")
+    if args.labels is None:
+        return
+    for chunk in pd.read_csv(args.labels, chunksize=args.chunk_size, dtype={"transaction_id": str}):
+        result = store.ingest_labels(chunk["transaction_id"], chunk["label"])
+        logger.info(f"Ingested {result['ingested']} labels, {result['matched']} matched")
+    print(json.dumps(store.rolling_metrics(args.window_hours * 3600)))
+
+
+if __name__ == "__main__":
+    main()
@@ -90,13 +90,24 @@ def build_final_model_artifact(
     threshold: float,
     val_metrics: dict,
     test_metrics: dict,
+    model_version: int = None,
+    scaler=None,
+    feature_pipeline=None,
 ):
     """
     Bundle model, threshold, and evaluation metrics into a deployable artifact.
+
+    `model_version`, `scaler` and `feature_pipeline` are optional; when a
+    scaler is bundled the API uses it instead of the standalone scaler file,
+    and a bundled `FeaturePipeline` takes precedence over both. The pipeline
+    is stored as its JSON spec.
     """
     return {
         "model": model,
         "threshold": float(threshold),
         "validation_metrics": val_metrics,
         "test_metrics": test_metrics,
+        "model_version": model_version,
+        "scaler": scaler,
+        "feature_pipeline": None if feature_pipeline is None else feature_pipeline.spec(),
     }
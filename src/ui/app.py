@@ -1,10 +1,13 @@
 # src/ui/app.py
+# Streamlit only puts this script's directory on sys.path; run from the
+# project root with `PYTHONPATH=. streamlit run src/ui/app.py`.
 import streamlit as st
-import requests
 import pandas as pd
 import json
 import os
 
+from src.api.client import FraudClient
+
 # Page config
 st.set_page_config(
     page_title="Real-Time Credit Card Fraud Detector",
@@ -21,10 +24,16 @@ else:
     API_URL = "http://localhost:8000"
 
 
+@st.cache_resource
+def get_client():
+    """One pooled client per Streamlit server, shared across reruns."""
+    return FraudClient(API_URL, chunk_size=1000, max_concurrency=4)
+
+
 # Sidebar
 with st.sidebar:
     st.header("⚙️ Controls")
-    mode = st.radio("Select Mode", ["Single Transaction", "Batch Upload (CSV)"])
+    mode = st.radio("Select Mode", ["Single Transaction", "Batch Upload (CSV)", "Case Queue"])
     st.markdown("---")
     st.info("Processes live data feeds, utilizes machine learning models to flag suspicious transactions")
 
@@ -87,8 +96,7 @@ if mode == "Single Transaction":
 
         with st.spinner("Analyzing transaction..."):
             try:
-                response = requests.post(f"{API_URL}/predict", json=payload)
-                result = response.json()
+                result = get_client().predict(payload)
 
                 prob = result["fraud_probability"]
                 is_fraud = result["is_fraud"]
@@ -118,20 +126,25 @@ elif mode == "Batch Upload (CSV)":
         st.write("Preview:", df.head())
 
         if st.button("Process Batch"):
-            records = df.to_dict(orient="records")
-            with st.spinner(f"Processing {len(records)} transactions..."):
-                try:
-                    response = requests.post(f"{API_URL}/predict-batch", json=records)
-                    results = response.json()["predictions"]
+            progress_bar = st.progress(0.0, text=f"Scoring {len(df)} transactions...")
+
+            def on_progress(done, total):
+                progress_bar.progress(done / total, text=f"Scored {done} / {total} transactions")
 
-                    result_df = pd.DataFrame(results)
-                    result_df.index = df.index
+            with st.spinner(f"Processing {len(df)} transactions..."):
+                try:
+                    # Sent as parallel chunks, so large files do not hit a single request timeout
+                    result_df = get_client().predict_frame(df, progress=on_progress)
                     result_df["original_amount"] = df["Amount"]
 
                     fraud_count = result_df["is_fraud"].sum()
                     st.write(f"### Results: {fraud_count} fraudulent transactions detected")
 
-                    st.dataframe(result_df.style.highlight_max(axis=0))
+                    # Styling every cell is too slow (and capped by pandas) for large uploads
+                    if len(result_df) <= 10_000:
+                        st.dataframe(result_df.style.highlight_max(axis=0))
+                    else:
+                        st.dataframe(result_df)
 
                     csv = result_df.to_csv().encode()
                     st.download_button("Download Results", csv, "fraud_predictions.csv", "text/csv")
@@ -139,6 +152,57 @@ elif mode == "Batch Upload (CSV)":
                 except Exception as e:
                     st.error(f"Batch prediction failed: {str(e)}")
 
+elif mode == "Case Queue":
+    st.subheader("Flagged Transactions")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        status = st.selectbox("Status", ["open", "investigating", "confirmed_fraud", "false_positive", "closed"])
+    with col2:
+        sort = st.selectbox("Sort by", ["fraud_probability", "created_at", "amount"])
+    with col3:
+        limit = st.selectbox("Page size", [25, 50, 100], index=1)
+
+    # Keyset pagination: remember the cursors of the pages already visited
+    query = (status, sort, limit)
+    if st.session_state.get("case_query") != query:
+        st.session_state.case_query = query
+        st.session_state.case_cursors = [None]
+
+    try:
+        page = get_client().cases(status=status, sort=sort, limit=limit, cursor=st.session_state.case_cursors[-1])
+    except Exception as e:
+        st.error(f"Case queue unavailable: {str(e)}")
+        st.stop()
+
+    st.write(" • ".join(f"{name}: {count}" for name, count in page["counts"].items()))
+    cases = pd.DataFrame(page["cases"])
+    if cases.empty:
+        st.info("No cases in this status.")
+    else:
+        cases["created_at"] = pd.to_datetime(cases["created_at"], unit="s")
+        st.dataframe(cases.set_index("case_id"))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(st.session_state.case_cursors) > 1 and st.button("⬅️ Previous page"):
+                st.session_state.case_cursors.pop()
+                st.rerun()
+        with col2:
+            if page["next_cursor"] and st.button("Next page ➡️"):
+                st.session_state.case_cursors.append(page["next_cursor"])
+                st.rerun()
+
+        with st.form("case_update"):
+            selected = st.multiselect("Cases", cases["case_id"].tolist())
+            new_status = st.selectbox("New status", ["investigating", "confirmed_fraud", "false_positive", "closed", "open"])
+            assignee = st.text_input("Assignee")
+            note = st.text_input("Note")
+            if st.form_submit_button("Update") and selected:
+                result = get_client().update_cases(selected, new_status, assignee or None, note or None)
+                st.success(f"Updated {result['updated']} case(s)")
+                st.rerun()
+
 # Footer
 st.markdown("---")
 st.caption("Real-Time Fraud Detection System • End-to-End ML Project")
\ No newline at end of file
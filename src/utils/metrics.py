@@ -1,22 +1,105 @@
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    roc_auc_score,
-    confusion_matrix,
-)
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+
+def _ratio(numerator, denominator) -> float:
+    # sklearn's zero_division=0 convention
+    return float(numerator / denominator) if denominator else 0.0
+
+
+def _metrics_from_confusion(cm: np.ndarray) -> dict:
+    (tn, fp), (fn, tp) = cm
+    precision = _ratio(tp, tp + fp)
+    recall = _ratio(tp, tp + fn)
+    return {
+        "accuracy": _ratio(tp + tn, cm.sum()),
+        "precision": precision,
+        "recall": recall,
+        "f1": _ratio(2 * tp, 2 * tp + fp + fn),
+    }
+
+
+def _confusion(y_true, y_pred, weight=None) -> np.ndarray:
+    codes = 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(codes, weights=weight, minlength=4)[:4].reshape(2, 2)
 
 
 def compute_classification_metrics(y_true, y_pred, y_proba):
     """
     Compute standard classification metrics for inference evaluation.
+
+    The confusion matrix is counted once and every threshold metric is
+    derived from it.
     """
+    cm = _confusion(y_true, y_pred)
     return {
-        "accuracy": accuracy_score(y_true, y_pred),
-        "precision": precision_score(y_true, y_pred),
-        "recall": recall_score(y_true, y_pred),
-        "f1": f1_score(y_true, y_pred),
+        **_metrics_from_confusion(cm),
         "roc_auc": roc_auc_score(y_true, y_proba),
-        "confusion_matrix": confusion_matrix(y_true, y_pred),
+        "confusion_matrix": cm,
     }
+
+
+class ClassificationAccumulator:
+    """
+    Single-pass, mergeable classification metrics.
+
+    Keeps the confusion matrix and per-class histograms of the predicted
+    probability, so batches can be added (or retracted with a negative
+    weight) in any order and accumulators of different shards or time
+    buckets combine by addition. ROC AUC is computed from the histograms
+    and is exact up to ties within a bin (error below `1 / n_bins`).
+
+    Parameters
+    ----------
+    n_bins : int, optional
+        Probability histogram resolution.
+    """
+
+    def __init__(self, n_bins: int = 1000):
+        self.n_bins = n_bins
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.histogram = np.zeros((2, n_bins), dtype=np.int64)
+
+    def update(self, y_true, y_pred, y_proba, weight: int = 1):
+        """
+        Add a batch of labeled predictions; `weight=-1` retracts them.
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        self.confusion += weight * _confusion(y_true, y_pred).astype(np.int64)
+        bins = np.clip((np.asarray(y_proba) * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+        self.histogram += weight * np.bincount(y_true * self.n_bins + bins, minlength=2 * self.n_bins).reshape(2, -1)
+        return self
+
+    def merge(self, other: "ClassificationAccumulator"):
+        """
+        Add another accumulator's counts in place.
+        """
+        if other.n_bins != self.n_bins:
+            raise ValueError("Cannot merge accumulators with different bin counts")
+        self.confusion += other.confusion
+        self.histogram += other.histogram
+        return self
+
+    @property
+    def count(self) -> int:
+        return int(self.confusion.sum())
+
+    def roc_auc(self) -> float:
+        negatives, positives = self.histogram
+        n_neg, n_pos = negatives.sum(), positives.sum()
+        if not n_neg or not n_pos:
+            return float("nan")
+        below = np.cumsum(negatives) - negatives
+        return float((positives * (below + 0.5 * negatives)).sum() / (n_neg * n_pos))
+
+    def compute(self) -> dict:
+        """
+        Metrics with the same keys as `compute_classification_metrics`, plus counts.
+        """
+        return {
+            **_metrics_from_confusion(self.confusion),
+            "roc_auc": self.roc_auc(),
+            "confusion_matrix": self.confusion.copy(),
+            "count": self.count,
+            "positives": int(self.confusion[1].sum()),
+        }
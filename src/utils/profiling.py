@@ -0,0 +1,257 @@
+"""
+Low-overhead sampling profiler with collapsed-stack output.
+
+A background thread snapshots the Python stacks of other threads every
+`interval` seconds and counts identical stacks. The output is the
+collapsed format (`frame;frame;frame count` per line) read by
+flamegraph.pl, speedscope and inferno. Nothing runs while no profiler is
+started, so leaving the hooks in place costs nothing.
+
+Usage:
+    python -m src.utils.profiling -o reports/profiles/train.collapsed pipeline --data-dir data/interim
+    python -m src.utils.profiling -o reports/profiles/replay.collapsed module src.api.replay data.parquet --asap
+"""
+import argparse
+import os
+import runpy
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+# Stacks whose innermost frame is in these modules are threads waiting for work
+IDLE_MODULES = {"threading.py", "selectors.py", "queue.py", "socket.py", "ssl.py"}
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of running threads.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Seconds between samples.
+    tagged_only : bool, optional
+        Only sample threads inside a `tagged()` block, e.g. the worker
+        thread scoring a tagged request.
+    include_idle : bool, optional
+        Keep samples of threads blocked waiting for work.
+    """
+
+    def __init__(self, interval: float = 0.005, tagged_only: bool = False, include_idle: bool = False):
+        self.interval = interval
+        self.tagged_only = tagged_only
+        self.include_idle = include_idle
+
+        self.counts = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+
+        self._tagged = set()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample(self, own_ident: int):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident or (self.tagged_only and ident not in self._tagged):
+                continue
+            if not self.include_idle and os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own_ident)
+
+    def start(self):
+        """
+        Start sampling in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling; collected counts are kept.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.stopped_at = time.time()
+
+    @contextmanager
+    def tagged(self):
+        """
+        Mark the current thread for sampling in `tagged_only` mode.
+        """
+        ident = threading.get_ident()
+        self._tagged.add(ident)
+        try:
+            yield
+        finally:
+            self._tagged.discard(ident)
+
+    def run_tagged(self, func, *args, **kwargs):
+        """
+        Call `func` inside `tagged()`; convenient with `run_in_threadpool`.
+        """
+        with self.tagged():
+            return func(*args, **kwargs)
+
+    def write_collapsed(self, path: Path) -> Path:
+        """
+        Write the collapsed stacks, one `stack count` line each.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def top_frames(self, n: int = 10) -> list:
+        """
+        Frames with the most samples at the top of the stack (self time).
+        """
+        leaf = Counter()
+        for stack, count in self.counts.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        return [
+            {"frame": frame, "samples": count, "share": count / self.samples}
+            for frame, count in leaf.most_common(n)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "distinct_stacks": len(self.counts),
+            "interval_seconds": self.interval,
+            "tagged_only": self.tagged_only,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "top_frames": self.top_frames(),
+        }
+
+
+def _short_path(filename: str) -> str:
+    """
+    Trim site-packages and the working directory from a code path.
+    """
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    cwd = os.getcwd() + os.sep
+    if filename.startswith(cwd):
+        return filename[len(cwd):]
+    return filename
+
+
+@contextmanager
+def profile_to(path: Path, interval: float = 0.005):
+    """
+    Profile the enclosed block and write collapsed stacks to `path`.
+    """
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write_collapsed(path)
+
+
+def run_training_pipeline(data_dir: Path, random_state: int = 42) -> dict:
+    """
+    Scale the unscaled splits, train the XGBoost model and select its F1-optimal threshold.
+
+    This mirrors the notebook workflow so it can be profiled from the command
+    line: `data_dir` holds the unscaled splits (`data/interim`), which are
+    scaled here as the notebooks do before writing `data/processed`.
+    """
+    import pandas as pd
+
+    from src.data.preprocess import scale_and_persist
+    from src.modeling.train import build_xgboost
+    from src.threshold.optimize import compute_threshold_metrics, select_best_f1_threshold
+
+    data_dir = Path(data_dir)
+    X_train = pd.read_parquet(data_dir / "X_train.parquet")
+    X_val = pd.read_parquet(data_dir / "X_val.parquet")
+    X_test = pd.read_parquet(data_dir / "X_test.parquet")
+    y_train = pd.read_parquet(data_dir / "y_train.parquet").iloc[:, 0]
+    y_val = pd.read_parquet(data_dir / "y_val.parquet").iloc[:, 0]
+    if "Amount" in X_train and (X_train["Amount"] < 0).any():
+        raise ValueError(f"{data_dir} holds scaled features (negative Amount); pass the unscaled splits")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        X_train, X_val, _ = scale_and_persist(X_train, X_val, X_test, Path(tmp) / "scaler.joblib")
+
+    model = build_xgboost(y_train, random_state=random_state)
+    model.fit(X_train, y_train)
+    metrics = compute_threshold_metrics(y_val, model.predict_proba(X_val)[:, 1])
+    return {"threshold": float(select_best_f1_threshold(metrics))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Collapsed-stack output file")
+    parser.add_argument("--interval", type=float, default=0.005, help="Seconds between samples")
+    targets = parser.add_subparsers(dest="target", required=True)
+
+    pipeline = targets.add_parser("pipeline", help="Scaling, training and threshold selection")
+    pipeline.add_argument("--data-dir", type=Path, default=Path("data/interim"), help="Unscaled X_/y_ split files")
+
+    module = targets.add_parser("module", help="Run a module like `python -m`")
+    module.add_argument("name")
+    module.add_argument("args", nargs=argparse.REMAINDER)
+
+    script = targets.add_parser("script", help="Run a Python script")
+    script.add_argument("path")
+    script.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    with profile_to(args.output, interval=args.interval) as profiler:
+        if args.target == "pipeline":
+            print(run_training_pipeline(args.data_dir))
+        else:
+            target = args.name if args.target == "module" else args.path
+            sys.argv = [target] + args.args
+            try:
+                if args.target == "module":
+                    runpy.run_module(target, run_name="__main__", alter_sys=True)
+                else:
+                    runpy.run_path(target, run_name="__main__")
+            except SystemExit:
+                pass
+
+    print(f"{profiler.samples} samples written to {args.output}")
+    for frame in profiler.top_frames():
+        print(f"{frame['share']:>7.1%}  {frame['frame']}")
+
+
+if __name__ == "__main__":
+    main()
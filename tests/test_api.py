@@ -0,0 +1,601 @@
+import asyncio
+import io
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+import psutil
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.admission import AdmissionController, AdmissionRejected
+from src.api.benchmark import SAMPLE_TRANSACTION
+from src.api.client import AsyncFraudClient, FraudClient
+from src.api.jobs import BatchJobManager, _prepare_input
+from src.api.replay import deployed_scorer, replay
+from src.api.routing import ArtifactCache, ModelRouter
+from src.api.rules import RuleEngine, compile_rules
+from src.api.serve import worker_memory_report
+from src.modeling.anomaly import HalfSpaceTrees
+from src.monitoring.audit import AuditLogWriter, read_audit_log
+from src.monitoring.cases import CaseStore
+from src.monitoring.feedback import FeedbackStore
+from src.api import main, scoring, streaming
+from src.api.main import app
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _python(*args, **kwargs) -> subprocess.Popen:
+    """Run the repo's Python in a fresh process, from the project root."""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    return subprocess.Popen([sys.executable, *args], cwd=PROJECT_ROOT, env=env, **kwargs)
+
+
+def _wait_for(condition, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the scoring API."""
+    with TestClient(app) as c:
+        yield c
+
+
+def test_predict(client):
+    """Test single transaction scoring over HTTP."""
+    response = client.post("/predict", json=SAMPLE_TRANSACTION)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert 0 <= body["fraud_probability"] <= 1
+    assert isinstance(body["is_fraud"], bool)
+
+
+def test_websocket_scoring_channel(client):
+    """Test that pipelined requests are all answered with their correlation IDs."""
+    http_prob = client.post("/predict", json=SAMPLE_TRANSACTION).json()["fraud_probability"]
+
+    with client.websocket_connect("/ws/predict") as ws:
+        ws.send_json([{"id": f"tx-{i}", "transaction": SAMPLE_TRANSACTION} for i in range(5)])
+        ws.send_json({"id": "bad", "transaction": {"Amount": 1.0}})
+
+        results = {}
+        while len(results) < 6:
+            for result in ws.receive_json():
+                results[result["id"]] = result
+
+    assert "error" in results["bad"]
+    for i in range(5):
+        assert results[f"tx-{i}"]["fraud_probability"] == http_prob
+
+
+def test_admission_priority_and_shedding():
+    """Test priority ordering, queue-depth shedding and deadline shedding."""
+    controller = AdmissionController(max_concurrency=1, max_queue_depth=2)
+    order = []
+
+    async def request(priority, deadline_ms=None):
+        async with controller.slot(priority=priority, deadline_ms=deadline_ms):
+            order.append(priority)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        first = asyncio.create_task(request(0))
+        await asyncio.sleep(0)
+        low = asyncio.create_task(request(10))
+        high = asyncio.create_task(request(5000))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as shed:
+            await request(1)
+        assert shed.value.reason == "queue_full"
+
+        await asyncio.gather(first, low, high)
+
+        # The service time estimate (~10 ms) now exceeds a 1 ms budget.
+        with pytest.raises(AdmissionRejected) as shed:
+            await request(1, deadline_ms=1)
+        assert shed.value.reason == "deadline"
+
+    asyncio.run(scenario())
+
+    assert order == [0, 5000, 10]
+    metrics = controller.metrics()
+    assert metrics["shed"] == {"queue_full": 1, "deadline": 1, "expired": 0}
+    assert metrics["in_flight"] == 0
+
+
+def test_metrics_endpoint(client):
+    """Test that admission metrics are exposed."""
+    client.post("/predict", json=SAMPLE_TRANSACTION)
+    admission = client.get("/metrics").json()["admission"]
+
+    assert admission["admitted"] >= 1
+    assert set(admission["shed"]) == {"queue_full", "deadline", "expired"}
+
+
+def test_shed_requests_use_degraded_path_off_event_loop(client, monkeypatch):
+    """Test that shed requests are answered from the fast path in the threadpool, else rejected."""
+    class Saturated:
+        degraded = 0
+
+        def slot(self, **kwargs):
+            raise AdmissionRejected("queue_full", retry_after=0.2)
+
+    on_event_loop = []
+
+    def degraded(records):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        n = len(records)
+        return scoring.Scored(np.full(n, 0.9), np.ones(n, dtype=bool))
+
+    monkeypatch.setattr(main, "ADMISSION", Saturated())
+    monkeypatch.setattr(main, "score_degraded", degraded)
+    response = client.post("/predict", json=SAMPLE_TRANSACTION)
+    assert response.status_code == 200 and response.json()["is_fraud"] is True
+    assert on_event_loop == [False] and main.ADMISSION.degraded == 1
+
+    monkeypatch.setattr(main, "score_degraded", lambda records: None)
+    response = client.post("/predict", json=SAMPLE_TRANSACTION)
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+
+    # The streaming channel falls back the same way
+    monkeypatch.setattr(streaming, "ADMISSION", main.ADMISSION)
+    monkeypatch.setattr(streaming, "score_degraded", degraded)
+    with client.websocket_connect("/ws/predict") as ws:
+        ws.send_json({"id": "tx", "transaction": SAMPLE_TRANSACTION})
+        [result] = ws.receive_json()
+    assert result["is_fraud"] is True and "queue_full" in result["message"]
+    assert on_event_loop == [False, False] and main.ADMISSION.degraded == 2
+
+
+def test_client_chunks_batches_in_order(client):
+    """Test that chunked sub-requests are reassembled in input order, with retries."""
+    records = [dict(SAMPLE_TRANSACTION, Amount=float(i)) for i in range(10)]
+    expected = client.post("/predict-batch", json=records).json()["predictions"]
+
+    calls = []
+
+    def flaky_post(url, **kwargs):
+        # The first sub-request is shed once and must be retried
+        calls.append(url)
+        if len(calls) == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return client.post(url, **kwargs)
+
+    progress = []
+    fraud_client = FraudClient("http://testserver", chunk_size=3, max_concurrency=2)
+    fraud_client.session.post = flaky_post
+    predictions = fraud_client.predict_batch(records, progress=lambda done, total: progress.append(done))
+
+    assert predictions == expected
+    assert len(calls) == 5
+    assert progress[-1] == 10 and len(progress) == 4
+
+
+def test_async_client_chunks_batches_in_order(client):
+    """Test the asyncio client against the app: ordered chunks, retries and progress."""
+    records = [dict(SAMPLE_TRANSACTION, Amount=float(i)) for i in range(10)]
+    expected = client.post("/predict-batch", json=records).json()["predictions"]
+
+    async def run():
+        calls = []
+        async with AsyncFraudClient("http://testserver", chunk_size=3, max_concurrency=2) as fraud_client:
+            await fraud_client.client.aclose()
+            fraud_client.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+            post = fraud_client.client.post
+
+            async def flaky_post(url, **kwargs):
+                # The first sub-request is shed once and must be retried
+                calls.append(url)
+                if len(calls) == 1:
+                    return httpx.Response(503, headers={"Retry-After": "0"}, request=httpx.Request("POST", url))
+                return await post(url, **kwargs)
+
+            fraud_client.client.post = flaky_post
+            progress = []
+            frame = await fraud_client.predict_frame(
+                pd.DataFrame(records), progress=lambda done, total: progress.append(done)
+            )
+            health = await fraud_client.health()
+        return frame, calls, progress, health
+
+    frame, calls, progress, health = asyncio.run(run())
+
+    assert frame["fraud_probability"].tolist() == [p["fraud_probability"] for p in expected]
+    assert len(calls) == 5
+    assert progress[-1] == 10 and len(progress) == 4
+    assert health["status"] == "healthy"
+
+def test_replay_follows_event_time(tmp_path):
+    """Test paced replay through the in-process scoring path."""
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame([SAMPLE_TRANSACTION] * 400)
+    frame["Time"] = np.sort(rng.uniform(0, 20, len(frame)))
+    frame["Amount"] = rng.uniform(1, 500, len(frame))
+    frame.to_parquet(tmp_path / "replay.parquet")
+
+    report = replay(tmp_path / "replay.parquet", deployed_scorer(threshold=0.0), speed=40, window_seconds=5)
+
+    # 20 s of event time at 40x takes about half a second
+    assert 0.45 <= report["elapsed_seconds"] < 5
+    assert report["rows"] == report["alerts"] == 400
+    assert report["timeline"]["transactions"].sum() == 400
+    assert list(report["timeline"].index) == [frame["Time"].min() + 5 * i for i in range(4)]
+
+
+def test_profile_endpoint(client, tmp_path, monkeypatch):
+    """Test token protection and tagged-request profiling."""
+    assert client.post("/admin/profile").status_code == 404
+
+    monkeypatch.setattr(main, "PROFILER_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "PROFILE_OUTPUT_DIR", tmp_path)
+    assert client.post("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    result = {}
+
+    def capture():
+        result["response"] = client.post(
+            "/admin/profile",
+            params={"seconds": 1.5, "mode": "tagged", "interval_ms": 1},
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    profiler_thread = threading.Thread(target=capture)
+    profiler_thread.start()
+    batch = [SAMPLE_TRANSACTION] * 2000
+    while profiler_thread.is_alive():
+        client.post("/predict-batch", json=batch, headers={"X-Profile": "1"})
+    profiler_thread.join()
+
+    body = result["response"].json()
+    assert body["samples"] > 0
+    collapsed = open(body["path"]).read()
+    assert "score_routed" in collapsed
+    assert main.PROFILER is None
+
+
+def test_batch_job_lifecycle(client, tmp_path, monkeypatch):
+    """Test submit, poll and download of a chunked CSV job."""
+    monkeypatch.setattr(main.JOBS, "jobs_dir", tmp_path)
+    monkeypatch.setattr(main.JOBS, "chunk_size", 10)
+
+    records = [dict(SAMPLE_TRANSACTION, Amount=float(i)) for i in range(25)]
+    expected = client.post("/predict-batch", json=records).json()["predictions"]
+
+    csv = pd.DataFrame(records).assign(Class=0).to_csv(index=False)
+    job = client.post("/jobs", params={"format": "csv"}, content=csv).json()
+    assert client.get(f"/jobs/{job['job_id']}/result").status_code in (200, 409)
+
+    for _ in range(100):
+        status = client.get(f"/jobs/{job['job_id']}").json()
+        if status["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "completed"
+    assert status["n_chunks"] == 3 and status["progress"] == 1.0
+
+    result = pd.read_parquet(io.BytesIO(client.get(f"/jobs/{job['job_id']}/result").content))
+    assert result["row"].tolist() == list(range(25))
+    assert result["fraud_probability"].round(4).tolist() == [p["fraud_probability"] for p in expected]
+
+    csv_result = pd.read_csv(io.StringIO(client.get(f"/jobs/{job['job_id']}/result?format=csv").text))
+    assert len(csv_result) == 25
+    assert client.get("/jobs/not-a-job").status_code == 404
+
+    # Oversized uploads are refused by declared length, or once the stream passes the cap
+    monkeypatch.setattr(main.JOBS, "max_upload_bytes", len(csv) - 1)
+    assert client.post("/jobs", params={"format": "csv"}, content=csv).status_code == 413
+    chunked = (csv[i:i + 100].encode() for i in range(0, len(csv), 100))
+    assert client.post("/jobs", params={"format": "csv"}, content=chunked).status_code == 413
+    assert [p.name for p in tmp_path.iterdir()] == [job["job_id"]]
+
+
+def test_batch_job_resumes_missing_chunks(tmp_path):
+    """Test that a restarted job only scores chunks without results."""
+    job_dir = tmp_path / ("a" * 32)
+    (job_dir / "chunks").mkdir(parents=True)
+    pd.DataFrame([SAMPLE_TRANSACTION] * 30).to_csv(tmp_path / "upload.csv", index=False)
+    _prepare_input(tmp_path / "upload.csv", "csv", job_dir / "input.parquet", chunk_size=10)
+    job = {"job_id": "a" * 32, "status": "running", "format": "csv", "chunk_size": 10}
+    (job_dir / "job.json").write_text(json.dumps(job))
+
+    scored = []
+
+    def score(frame):
+        scored.append(len(frame))
+        return np.full(len(frame), 0.9), np.ones(len(frame), dtype=bool)
+
+    async def scenario():
+        manager = BatchJobManager(tmp_path, score, AdmissionController(1, 8), chunk_size=10)
+        manager._score_chunk_sync(job_dir, job_dir / "input.parquet", 1, 10)
+        scored.clear()
+        manager.resume()
+        await asyncio.gather(*manager._tasks.values())
+        return manager.get("a" * 32)
+
+    state = asyncio.run(scenario())
+    assert state["status"] == "completed"
+    assert scored == [10, 10]
+    assert len(pd.read_parquet(job_dir / "result.parquet")) == 30
+
+
+def test_model_routing_and_artifact_cache(client, tmp_path, monkeypatch):
+    """Test routed thresholds, single-flight loading and LRU eviction by size."""
+    for name, size in [("gold.joblib", 100), ("basic.joblib", 100)]:
+        (tmp_path / name).write_bytes(b"x" * size)
+
+    loads = []
+
+    def loader(path):
+        loads.append(path.name)
+        time.sleep(0.05)
+        return {"model": scoring.MODEL, "transform": scoring.TRANSFORM, "threshold": 0.5, "model_version": path.stem}
+
+    cache = ArtifactCache(loader, max_bytes=150)
+    router = ModelRouter(
+        {"gold": {"artifact": "gold.joblib", "threshold": 0.0}, "basic": {"artifact": "basic.joblib"}},
+        tmp_path, cache,
+    )
+    monkeypatch.setattr(scoring, "MODEL_ROUTER", router)
+
+    threads = [threading.Thread(target=router.resolve, args=("gold",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["gold.joblib"]
+
+    routed = client.post("/predict", json=SAMPLE_TRANSACTION, headers={"X-Route-Key": "gold"}).json()
+    default = client.post("/predict", json=SAMPLE_TRANSACTION, headers={"X-Route-Key": "unknown"}).json()
+    assert routed["is_fraud"] is True
+    assert routed["fraud_probability"] == default["fraud_probability"]
+
+    # WebSocket requests route by the handshake header, overridden per message
+    with client.websocket_connect("/ws/predict", headers={"X-Route-Key": "gold"}) as ws:
+        ws.send_json([
+            {"id": "gold", "transaction": SAMPLE_TRANSACTION},
+            {"id": "default", "transaction": SAMPLE_TRANSACTION, "route_key": "unknown"},
+            {"id": "bad", "transaction": SAMPLE_TRANSACTION, "route_key": 1},
+        ])
+        streamed = {}
+        while len(streamed) < 3:
+            streamed.update((result["id"], result) for result in ws.receive_json())
+    assert streamed["gold"]["is_fraud"] is True
+    assert streamed["default"]["is_fraud"] == default["is_fraud"]
+    assert "route_key" in streamed["bad"]["error"]
+
+    router.resolve("basic")
+    stats = cache.metrics()
+    assert stats["cached_bytes"] == 100
+    assert stats["models"]["gold.joblib"]["evictions"] == 1
+    assert stats["models"]["gold.joblib"]["coalesced"] == 3
+    assert stats["models"]["basic.joblib"]["cached"]
+
+
+def test_anomaly_scores_in_responses(client, monkeypatch):
+    """Test that anomaly scores accompany predictions and unflagged rows are learned."""
+    assert client.post("/predict", json=SAMPLE_TRANSACTION).json()["anomaly_score"] is None
+
+    rng = np.random.default_rng(0)
+    reference = pd.DataFrame([SAMPLE_TRANSACTION] * 2000)
+    reference[reference.columns] += rng.normal(size=reference.shape)
+    detector = HalfSpaceTrees(n_trees=10, depth=6, window_size=100, random_state=0).fit(reference)
+    monkeypatch.setattr(scoring, "ANOMALY_DETECTOR", detector)
+    monkeypatch.setattr(scoring, "ANOMALY_COLUMNS", [scoring.FEATURE_COLUMNS.index(f) for f in detector.features_])
+
+    single = client.post("/predict", json=SAMPLE_TRANSACTION).json()
+    assert 0 <= single["anomaly_score"] <= 1
+
+    outlier = dict(SAMPLE_TRANSACTION, V1=50.0, V2=-50.0, V3=50.0)
+    batch = client.post("/predict-batch", json=[SAMPLE_TRANSACTION, outlier]).json()["predictions"]
+    assert batch[1]["anomaly_score"] > batch[0]["anomaly_score"]
+    assert detector.metrics()["latest_window_rows"] == 3 - sum(p["is_fraud"] for p in [single] + batch)
+
+
+def test_screening_rules(client, tmp_path, monkeypatch):
+    """Test decisive and flag rules, hit counts and hot reload of the rules file."""
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": [
+        {"name": "amount_cap", "when": "Amount > 5000", "action": "block"},
+        {"name": "trusted", "when": "Amount in (1.5, 2.5) or Amount > 9000", "action": "allow"},
+        {"name": "v14_extreme", "when": "-50 < V14 < -20", "action": "flag"},
+    ]}))
+    engine = RuleEngine(rules_path, scoring.FEATURE_COLUMNS, reload_seconds=0)
+    monkeypatch.setattr(scoring, "RULE_ENGINE", engine)
+
+    batch = [
+        dict(SAMPLE_TRANSACTION, Amount=10000.0),
+        dict(SAMPLE_TRANSACTION, Amount=1.5),
+        dict(SAMPLE_TRANSACTION, V14=-30.0),
+        SAMPLE_TRANSACTION,
+    ]
+    predictions = client.post("/predict-batch", json=batch).json()["predictions"]
+    assert [p["rule"] for p in predictions] == ["amount_cap", "trusted", "v14_extreme", None]
+    assert predictions[0]["is_fraud"] and predictions[0]["fraud_probability"] == 1.0
+    assert not predictions[1]["is_fraud"] and predictions[1]["fraud_probability"] == 0.0
+    assert predictions[2]["is_fraud"]
+    assert engine.metrics()["hits"] == {"amount_cap": 1, "trusted": 2, "v14_extreme": 1}
+    assert engine.metrics()["rows_decided"] == 2
+
+    # Batch jobs and replays get the same screened decisions
+    for probs, flags in (scoring.score_frame(pd.DataFrame(batch)), deployed_scorer()(pd.DataFrame(batch))):
+        assert flags.tolist() == [p["is_fraud"] for p in predictions]
+        assert probs == pytest.approx([p["fraud_probability"] for p in predictions], abs=1e-4)
+
+    rules_path.write_text(json.dumps({"rules": [{"name": "all", "when": "True", "action": "allow"}]}))
+    os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert client.post("/predict", json=SAMPLE_TRANSACTION).json()["rule"] == "all"
+
+    rules_path.write_text(json.dumps({"rules": [{"name": "bad", "when": "__import__('os')", "action": "block"}]}))
+    os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+    assert client.post("/predict", json=SAMPLE_TRANSACTION).json()["rule"] == "all"
+    assert engine.metrics()["reloads"] == 1
+
+    # Type errors only show when a rule runs; they are caught on reload too
+    rules_path.write_text(json.dumps({"rules": [{"name": "typed", "when": "not Amount", "action": "block"}]}))
+    os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 3 * 10**9))
+    assert client.post("/predict", json=SAMPLE_TRANSACTION).json()["rule"] == "all"
+    assert engine.metrics()["reloads"] == 1
+    for when in ("V1 and V2", "Amount + 1"):
+        with pytest.raises(ValueError, match="Rule 'typed'"):
+            compile_rules([{"name": "typed", "when": when, "action": "block"}], scoring.FEATURE_COLUMNS)
+
+    with pytest.raises(ValueError, match="Unknown feature"):
+        compile_rules([{"name": "typo", "when": "Amout > 1", "action": "block"}], scoring.FEATURE_COLUMNS)
+
+
+def test_audit_log_records_path_and_transaction_ids(client, tmp_path, monkeypatch):
+    """Test that rule and model decisions are audited with their path and transaction ID."""
+    writer = AuditLogWriter(tmp_path / "audit", scoring.FEATURE_COLUMNS)
+    writer.start()
+    monkeypatch.setattr(scoring, "AUDIT_LOG", writer)
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": [{"name": "amount_cap", "when": "Amount > 5000", "action": "block"}]}))
+    monkeypatch.setattr(scoring, "RULE_ENGINE", RuleEngine(rules_path, scoring.FEATURE_COLUMNS, reload_seconds=0))
+
+    batch = [
+        dict(SAMPLE_TRANSACTION, transaction_id="tx-0"),
+        dict(SAMPLE_TRANSACTION, Amount=10000.0, transaction_id="tx-1"),
+        SAMPLE_TRANSACTION,
+    ]
+    assert client.post("/predict-batch", json=batch).status_code == 200
+    writer.stop()
+
+    log = read_audit_log(tmp_path / "audit").set_index("transaction_id", drop=False)
+    assert log.loc["tx-0", "path"] == "full" and log.loc["tx-1", "path"] == "rules"
+    assert log["transaction_id"].isna().sum() == 1
+
+
+def test_feedback_endpoints(client, tmp_path, monkeypatch):
+    """Test that predictions with transaction IDs are joined to labels posted later."""
+    assert client.get("/feedback/metrics").status_code == 404
+
+    store = FeedbackStore(tmp_path / "feedback.sqlite")
+    monkeypatch.setattr(scoring, "FEEDBACK_STORE", store)
+    monkeypatch.setattr(main, "FEEDBACK_STORE", store)
+
+    batch = [dict(SAMPLE_TRANSACTION, transaction_id=f"tx-{i}") for i in range(3)] + [SAMPLE_TRANSACTION]
+    predictions = client.post("/predict-batch", json=batch).json()["predictions"]
+    store.flush()
+
+    labels = [
+        {"transaction_id": "tx-0", "label": 1},
+        {"transaction_id": "tx-1", "label": 0},
+        {"transaction_id": "tx-9", "label": 1},
+    ]
+    assert client.post("/feedback", json=labels).json() == {"ingested": 3, "matched": 2}
+    assert client.post("/feedback", json=[{"transaction_id": "tx-2", "label": 3}]).status_code == 400
+
+    metrics = client.get("/feedback/metrics", params={"window_hours": 1}).json()
+    assert metrics["count"] == 2 and metrics["positives"] == 1
+    assert metrics["recall"] == float(predictions[0]["is_fraud"])
+
+
+def test_case_queue_endpoints(client, tmp_path, monkeypatch):
+    """Test that flagged transactions are queued as cases that can be paged and updated."""
+    assert client.get("/cases").status_code == 404
+
+    store = CaseStore(tmp_path / "cases.sqlite", scoring.FEATURE_COLUMNS)
+    monkeypatch.setattr(scoring, "CASE_STORE", store)
+    monkeypatch.setattr(main, "CASE_STORE", store)
+    monkeypatch.setattr(scoring, "THRESHOLD", 0.0)
+
+    batch = [dict(SAMPLE_TRANSACTION, transaction_id=f"tx-{i}", Amount=float(i)) for i in range(5)]
+    client.post("/predict-batch", json=batch)
+    store.flush()
+
+    first = client.get("/cases", params={"sort": "amount", "limit": 3}).json()
+    assert first["counts"]["open"] == 5
+    assert [case["amount"] for case in first["cases"]] == [4.0, 3.0, 2.0]
+    rest = client.get("/cases", params={"sort": "amount", "limit": 3, "cursor": first["next_cursor"]}).json()
+    assert [case["transaction_id"] for case in rest["cases"]] == ["tx-1", "tx-0"] and rest["next_cursor"] is None
+
+    case_id = first["cases"][0]["case_id"]
+    assert client.get(f"/cases/{case_id}").json()["features"]["Amount"] == 4.0
+    update = {"case_ids": [case_id], "status": "false_positive", "note": "known merchant"}
+    assert client.post("/cases/status", json=update).json() == {"updated": 1}
+    assert client.get("/cases", params={"status": "false_positive"}).json()["cases"][0]["note"] == "known merchant"
+    assert client.get("/cases", params={"sort": "nope"}).status_code == 400
+    assert client.get("/cases/999").status_code == 404
+
+
+def test_worker_thread_limits():
+    """Test that a worker pins environment, native pools and the model to its thread budget."""
+    script = (
+        "import json, os\n"
+        "from threadpoolctl import threadpool_info\n"
+        "from src.api.serve import _limit_threads\n"
+        "from src.api.utils import MODEL\n"
+        "_limit_threads(2)\n"
+        "print(json.dumps({'env': os.environ['OMP_NUM_THREADS'], 'n_jobs': MODEL.get_params().get('n_jobs'),"
+        " 'pools': [pool['num_threads'] for pool in threadpool_info()]}))\n"
+    )
+    proc = _python("-c", script, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    out, _ = proc.communicate(timeout=120)
+    report = json.loads(out.strip().splitlines()[-1])
+    assert report["env"] == "2" and report["n_jobs"] == 2
+    assert report["pools"] and set(report["pools"]) == {2}
+
+
+def test_prefork_server_replaces_dead_workers(tmp_path):
+    """Test that the supervisor serves from forked workers, restarts a killed one and stops cleanly."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    url = f"http://127.0.0.1:{port}"
+
+    def healthy():
+        try:
+            return httpx.get(f"{url}/health", timeout=1).status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    with open(tmp_path / "serve.log", "w") as log:
+        server = _python(
+            "-m", "src.api.serve", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", "2", "--threads-per-worker", "1", "--memory-report-interval", "0",
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        supervisor = psutil.Process(server.pid)
+        assert _wait_for(lambda: healthy() and len(supervisor.children()) == 2)
+        workers = {child.pid for child in supervisor.children()}
+
+        report = worker_memory_report([server.pid, *workers, 2 ** 22 + 1])
+        assert set(report) == {server.pid, *workers}
+        assert all(mem["rss_mib"] > 0 and mem["uss_mib"] > 0 for mem in report.values())
+
+        killed = min(workers)
+        os.kill(killed, signal.SIGKILL)
+        assert _wait_for(lambda: {c.pid for c in supervisor.children()} - workers and len(supervisor.children()) == 2)
+        assert killed not in {child.pid for child in supervisor.children()}
+        assert _wait_for(healthy)
+
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+    assert "All workers stopped" in (tmp_path / "serve.log").read_text()
@@ -1,10 +1,24 @@
+import json
+
+import joblib
 import pytest 
 import pandas as pd
 from pathlib import Path 
 import numpy as np
 
-from src.data.load import load_credit_card_data
-from src.data.preprocess import scale_and_persist
+from sklearn.preprocessing import StandardScaler
+
+from src.data.features import DEFAULT_DERIVED, FeaturePipeline, artifact_pipeline
+from src.data.load import load_credit_card_data, iter_credit_card_batches, time_range_filter
+from src.data.preprocess import hash_split_assignment, scale_and_persist, split_and_scale_out_of_core
+from src.data.pipeline import run_preprocessing_pipeline
+from src.data.synthetic import (
+  fit_synthetic_params,
+  generate_transactions,
+  load_synthetic_params,
+  save_synthetic_params,
+  write_synthetic_parquet,
+)
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent  
 DATA_DIR = PROJECT_ROOT / "data" / "processed"
@@ -52,8 +66,167 @@ def test_scaling_consistency():
   assert all(pd.api.types.is_numeric_dtype(dtype) for dtype in X_val_scaled.dtypes), "Non-numeric values in validation data"
   assert all(pd.api.types.is_numeric_dtype(dtype) for dtype in X_test_scaled.dtypes), "Non-numeric values in test data"
 
-  
 
 
+@pytest.fixture
+def synthetic_transactions():
+  """
+  Create a small imbalanced transaction dataset.
+  """
+  rng = np.random.default_rng(42)
+  df = pd.DataFrame(rng.normal(size=(400, 4)), columns=["Time", "V1", "V2", "Amount"])
+  df["Class"] = (rng.random(400) < 0.1).astype(int)
+  return df
+
+
+def test_preprocessing_pipeline_cache(tmp_path, synthetic_transactions):
+  """
+  Test that a rerun is served from the cache and only changed stages recompute.
+  """
+  scaler_path = tmp_path / "scaler.joblib"
+  cache_dir = tmp_path / "cache"
+
+  first = run_preprocessing_pipeline(
+    synthetic_transactions, "Class", 42, scaler_path, cache_dir
+  )
+  assert first["executed"] == ["split_features_target", "train_val_test_split", "scale", "resample"]
+  mtime = scaler_path.stat().st_mtime_ns
+
+  second = run_preprocessing_pipeline(
+    synthetic_transactions, "Class", 42, scaler_path, cache_dir
+  )
+  assert second["executed"] == []
+  assert scaler_path.stat().st_mtime_ns == mtime, "Scaler rewritten on cache hit"
+  pd.testing.assert_frame_equal(first["X_val"], second["X_val"])
+  pd.testing.assert_series_equal(first["y_test"], second["y_test"])
+
+  third = run_preprocessing_pipeline(
+    synthetic_transactions, "Class", 42, scaler_path, cache_dir, resampling="undersample"
+  )
+  assert third["executed"] == ["resample"]
+  assert third["y_train"].mean() == pytest.approx(0.5)
+
+
+def test_loader_projection_filter_and_batches(tmp_path, synthetic_transactions):
+  """
+  Test column projection, Time-range pushdown, float32 downcasting and batching.
+  """
+  path = tmp_path / "transactions.parquet"
+  synthetic_transactions.sort_values("Time").to_parquet(path, row_group_size=50)
+
+  df = load_credit_card_data(
+    path, columns=["Time", "Amount"], filters=time_range_filter(0.0, 1.0), downcast=True
+  )
+  expected = synthetic_transactions[
+    (synthetic_transactions["Time"] >= 0.0) & (synthetic_transactions["Time"] < 1.0)
+  ]
+
+  assert list(df.columns) == ["Time", "Amount"]
+  assert len(df) == len(expected)
+  assert all(dtype == np.float32 for dtype in df.dtypes)
+  assert df.index.isin(expected.index).all(), "Index not preserved"
+
+  batches = list(iter_credit_card_batches(path, batch_size=30))
+  assert all(len(batch) <= 30 for batch in batches)
+  assert sum(len(batch) for batch in batches) == len(synthetic_transactions)
+  assert batches[0]["Class"].dtype == synthetic_transactions["Class"].dtype
+
+
+def test_synthetic_generator(tmp_path, synthetic_transactions):
+  """
+  Test that generated rows follow the fitted marginals and the requested fraud rate.
+  """
+  X = synthetic_transactions.drop(columns=["Class"])
+  params = fit_synthetic_params(X, synthetic_transactions["Class"], features=list(X.columns))
+  save_synthetic_params(params, tmp_path / "params.npz")
+  params = load_synthetic_params(tmp_path / "params.npz")
+
+  generated = generate_transactions(params, 200_000, fraud_rate=0.1, random_state=0)
+  assert list(generated.columns) == list(X.columns) + ["Class"]
+  assert generated["Class"].mean() == pytest.approx(0.1, abs=0.005)
+  assert generated["Amount"].min() >= X["Amount"].min()
+
+  legit = generated.loc[generated["Class"] == 0, "Amount"]
+  legit_source = X.loc[synthetic_transactions["Class"] == 0, "Amount"]
+  assert legit.median() == pytest.approx(legit_source.median(), abs=0.05)
+
+  write_synthetic_parquet(tmp_path / "synthetic.parquet", params, 2500, batch_size=1000, random_state=1)
+  assert len(load_credit_card_data(tmp_path / "synthetic.parquet")) == 2500
+
+
+def test_out_of_core_split_and_scale(tmp_path, synthetic_transactions):
+  """
+  Test that streaming split/scale matches in-memory scaling and ignores batching.
+  """
+  source = tmp_path / "transactions.parquet"
+  synthetic_transactions.to_parquet(source)
+
+  result = split_and_scale_out_of_core(
+    source, tmp_path / "out", tmp_path / "scaler.joblib", "Class", random_state=7, batch_size=64
+  )
+  assert sum(result["rows"].values()) == len(synthetic_transactions)
+  assert 0.6 < result["rows"]["train"] / len(synthetic_transactions) < 0.8
+
+  codes = hash_split_assignment(synthetic_transactions, random_state=7, target_col="Class")
+  train = synthetic_transactions[codes == 0].drop(columns=["Class"])
+  X_train = pd.read_parquet(tmp_path / "out" / "X_train.parquet")
+  expected = (train - train.mean()) / train.std(ddof=0)
+  np.testing.assert_allclose(X_train.to_numpy(), expected.to_numpy(), atol=1e-8)
+  assert pd.read_parquet(tmp_path / "out" / "y_train.parquet")["Class"].sum() == result["positives"]["train"]
+
+  # Same assignment whatever the batching or row order
+  def batches():
+    return (synthetic_transactions.iloc[::-1].iloc[i:i + 100] for i in range(0, 400, 100))
+
+  again = split_and_scale_out_of_core(batches, tmp_path / "again", tmp_path / "scaler2.joblib", "Class", random_state=7)
+  assert again["rows"] == result["rows"]
+  assert not np.array_equal(codes, hash_split_assignment(synthetic_transactions, random_state=8, target_col="Class"))
+
+  # A corrected label never moves a transaction to another split
+  relabeled = synthetic_transactions.assign(Class=1 - synthetic_transactions["Class"])
+  np.testing.assert_array_equal(hash_split_assignment(relabeled, random_state=7, target_col="Class"), codes)
+
+
+def test_feature_pipeline_matches_training_and_serving(tmp_path, synthetic_transactions):
+  """
+  Test that the compiled pipeline reproduces the scaler, derived features and chunked parquet output.
+  """
+  df = synthetic_transactions.assign(
+    Time=synthetic_transactions["Time"].abs() * 50_000, Amount=synthetic_transactions["Amount"].abs() * 100
+  )
+  X = df.drop(columns=["Class"])
+  columns = list(X.columns)
+
+  # Legacy artifacts: identical to the fitted StandardScaler
+  scaler = StandardScaler().fit(X)
+  legacy = FeaturePipeline.from_scaler(scaler)
+  np.testing.assert_array_equal(legacy.compile()(X.to_numpy()), scaler.transform(X))
+
+  pipeline = FeaturePipeline(columns, DEFAULT_DERIVED).fit(X)
+  transformed = pipeline.transform_frame(X)
+  assert list(transformed.columns) == columns + ["log_amount", "hour_of_day"]
+  np.testing.assert_allclose(transformed.mean(), 0, atol=1e-9)
+  raw = np.column_stack([np.log1p(X["Amount"]), (X["Time"] // 3600) % 24])
+  np.testing.assert_allclose(transformed.iloc[:, -2:] * pipeline.scale_[-2:] + pipeline.mean_[-2:], raw)
+
+  # Chunked training pass over parquet gives the same statistics and features
+  source = tmp_path / "transactions.parquet"
+  df.to_parquet(source)
+  streamed = FeaturePipeline(columns, DEFAULT_DERIVED).fit_parquet(source, batch_size=37)
+  np.testing.assert_allclose(streamed.mean_, pipeline.mean_)
+  np.testing.assert_allclose(streamed.scale_, pipeline.scale_)
+  assert streamed.transform_parquet(source, tmp_path / "features.parquet", batch_size=50, keep_columns=["Class"]) == len(X)
+  written = pd.read_parquet(tmp_path / "features.parquet")
+  np.testing.assert_allclose(written[pipeline.output_columns].to_numpy(), transformed.to_numpy(), atol=1e-9)
+  assert written["Class"].sum() == df["Class"].sum()
+
+  # Serialized spec compiles to the same transform over request-ordered arrays
+  restored = FeaturePipeline.from_spec(json.loads(json.dumps(pipeline.spec())))
+  shuffled = columns[::-1]
+  np.testing.assert_array_equal(restored.compile(shuffled)(X[shuffled].to_numpy()), transformed.to_numpy())
 
-  
\ No newline at end of file
+  # A pipeline persisted at the scaler path is used as-is, not wrapped as a StandardScaler
+  scaler_path = tmp_path / "scaler.joblib"
+  scale_and_persist(X, X, X, scaler_path, feature_pipeline=FeaturePipeline(columns, DEFAULT_DERIVED))
+  loaded = artifact_pipeline({"scaler": joblib.load(scaler_path)})
+  np.testing.assert_allclose(loaded.compile()(X.to_numpy()), transformed.to_numpy())
@@ -1,13 +1,37 @@
+import functools
+import json
+import tracemalloc
+
 import pytest 
 import joblib
 import numpy as np
+import pandas as pd
 from pathlib import Path 
 
+from src.api.schemas import FEATURE_COLUMNS
+from src.data.features import FeaturePipeline
 from src.modeling.inference import load_final_model
 from src.modeling.predict import predict_with_threshold
+from src.modeling.incremental import incremental_update, save_versioned_artifact
+from src.modeling.cascade import fit_cascade, cascade_report, write_cascade_report
+from src.modeling.baselines import get_logistic_regression
+from src.modeling.anomaly import HalfSpaceTrees
+from src.modeling.backfill import plan_chunks, run_backfill
+from src.modeling.benchmark import compare_with_baseline, measure, run_benchmark, save_report
+from src.modeling.backtest import run_walk_forward, threshold_stability, walk_forward_folds
+from src.modeling.compaction import (
+  distill_model,
+  fidelity_report,
+  select_forest_trees,
+  truncate_boosted_ensemble,
+)
 from src.threshold.optimize import select_best_f1_threshold, compute_threshold_metrics
 
 from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
 
 from sklearn.metrics import f1_score
 
@@ -102,4 +126,279 @@ def test_select_best_f1_threshold(synthetic_data):
   f1 = f1_score(y_true, y_pred)
   
   # check f1 is in [0,1]
-  assert 0 <= f1 <= 1
\ No newline at end of file
+  assert 0 <= f1 <= 1
+
+
+def test_incremental_update(tmp_path):
+  """
+  Test that an update appends trees, merges scaler moments and bumps the version.
+  """
+  rng = np.random.default_rng(0)
+  X = pd.DataFrame(rng.normal(size=(600, 3)), columns=["Time", "V1", "Amount"])
+  y = (X["V1"] + rng.normal(scale=0.5, size=600) > 1).astype(int)
+  X_old, y_old, X_new, y_new = X[:400], y[:400], X[400:], y[400:]
+
+  scaler = StandardScaler().fit(X_old)
+  model = XGBClassifier(n_estimators=10, max_depth=3)
+  model.fit(pd.DataFrame(scaler.transform(X_old), columns=X.columns), y_old)
+  artifact = {"model": model, "threshold": 0.5}
+
+  new_artifact, new_scaler = incremental_update(artifact, scaler, X_new, y_new, n_new_trees=5)
+
+  assert new_artifact["model"].get_booster().num_boosted_rounds() == 15
+  assert artifact["model"].get_booster().num_boosted_rounds() == 10, "Deployed model mutated"
+  np.testing.assert_allclose(new_scaler.mean_, X.mean().values)
+  assert new_scaler.n_samples_seen_ == 600
+  assert new_artifact["model_version"] == 1
+
+  path = save_versioned_artifact(new_artifact, tmp_path)
+  assert path.name == "final_xgb_with_threshold_v1.joblib"
+  with pytest.raises(FileExistsError):
+    save_versioned_artifact(new_artifact, tmp_path)
+
+  # A pipeline with derived features, passed as the scaler or bundled with the artifact
+  pipeline = FeaturePipeline(list(X.columns), derived=[{"name": "log_amount", "op": "log1p", "column": "Amount"}])
+  pipeline.fit(X_old)
+  model = XGBClassifier(n_estimators=10, max_depth=3).fit(pipeline.transform_frame(X_old), y_old)
+  for artifact, scaler in [
+    ({"model": model, "threshold": 0.5}, pipeline),
+    ({"model": model, "threshold": 0.5, "feature_pipeline": pipeline.spec()}, scaler),
+  ]:
+    new_artifact, new_pipeline = incremental_update(artifact, scaler, X_new, y_new, n_new_trees=5, X_val=X, y_val=y)
+    assert new_artifact["model"].get_booster().num_boosted_rounds() == 15
+    assert new_pipeline.n_samples_ == 600 and pipeline.n_samples_ == 400, "Deployed pipeline mutated"
+    assert new_artifact["feature_pipeline"] == new_pipeline.spec() and new_artifact["scaler"] is None
+    np.testing.assert_allclose(new_pipeline.mean_[:3], X.mean().values)
+    assert new_artifact["validation_metrics"]
+
+
+def test_cascade_preserves_recall():
+  """
+  Test that band limits chosen on validation data keep the full model's recall.
+  """
+  rng = np.random.default_rng(1)
+  X = pd.DataFrame(rng.normal(size=(3000, 4)), columns=["V1", "V2", "V3", "Amount"])
+  y = ((X["V1"] + 0.5 * X["V2"] ** 2 + rng.normal(scale=0.3, size=3000)) > 2.5).astype(int)
+
+  fast = get_logistic_regression().fit(X, y)
+  full = XGBClassifier(n_estimators=30, max_depth=3).fit(X, y)
+
+  cascade = fit_cascade(fast, full, X, y, threshold=0.5)
+  report = cascade_report(cascade, X, y, n_repeats=1)
+
+  assert 0 < report["short_circuited_fraction"] <= 1
+  assert report["cascade_recall"] >= report["full_recall"]
+  assert cascade.predict_proba(X).shape == (len(X), 2)
+
+
+def test_cascade_report_written_for_artifact(tmp_path):
+  """
+  Test that the cascade report is tuned and measured on unscaled splits through the artifact's scaler.
+  """
+  rng = np.random.default_rng(2)
+  for split, n in [("train", 1500), ("val", 1000), ("test", 1000)]:
+    X = pd.DataFrame(rng.normal(loc=3, scale=5, size=(n, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X["V1"] + 0.1 * X["V2"] ** 2 + rng.normal(scale=2, size=n) > 10).astype(int)
+    X.to_parquet(tmp_path / f"X_{split}.parquet")
+    y.to_frame("Class").to_parquet(tmp_path / f"y_{split}.parquet")
+    if split == "train":
+      scaler = StandardScaler().fit(X.to_numpy())
+      full = XGBClassifier(n_estimators=30, max_depth=3).fit(scaler.transform(X.to_numpy()), y)
+  joblib.dump({"model": full, "threshold": 0.5, "scaler": scaler}, tmp_path / "artifact.joblib")
+
+  report = write_cascade_report(tmp_path, tmp_path / "cascade" / "report.json", tmp_path / "artifact.joblib", n_repeats=1)
+
+  assert json.loads((tmp_path / "cascade" / "report.json").read_text()) == report
+  assert report["fast_model"] == "LogisticRegression" and report["model_version"] == "artifact"
+  assert report["n_rows"] == 1000 and 0 < report["short_circuited_fraction"] <= 1
+  assert report["full_recall"] > 0.5
+
+
+def test_ensemble_compaction():
+  """
+  Test boosted truncation, greedy forest selection and distillation.
+  """
+  rng = np.random.default_rng(2)
+  X = pd.DataFrame(rng.normal(size=(1000, 4)), columns=["V1", "V2", "V3", "Amount"])
+  y = ((X["V1"] - X["V2"] + rng.normal(scale=0.5, size=1000)) > 1.5).astype(int)
+
+  boosted = XGBClassifier(n_estimators=60, max_depth=3).fit(X, y)
+  compact, curve = truncate_boosted_ensemble(boosted, X, y, tolerance=0.01)
+  assert compact.get_booster().num_boosted_rounds() <= 60
+  assert set(curve) >= {10, 60}
+  assert compact.predict_proba(X).shape == (len(X), 2)
+
+  forest = RandomForestClassifier(n_estimators=30, max_depth=4, random_state=0).fit(X, y)
+  small_forest, forest_curve = select_forest_trees(forest, X, y, n_trees=5)
+  assert len(small_forest.estimators_) == 5
+  assert len(forest_curve) == 5
+
+  student = distill_model(boosted, X, n_estimators=20)
+  report = fidelity_report(boosted, student, X, threshold=0.5, y=y)
+  assert report["spearman"] > 0.8
+  assert 0 <= report["decision_agreement"] <= 1
+
+
+def test_walk_forward_backtest():
+  """
+  Test that folds never look ahead and are fitted in parallel workers.
+  """
+  rng = np.random.default_rng(3)
+  n = 6000
+  X = pd.DataFrame(rng.normal(size=(n, 3)), columns=["V1", "V2", "Amount"])
+  X.insert(0, "Time", rng.uniform(0, 1000, n))
+  y = ((X["V1"] + X["V2"] + rng.normal(scale=0.5, size=n)) > 2.5).astype(int)
+
+  times = np.sort(X["Time"].to_numpy())
+  folds = walk_forward_folds(times, train_seconds=400, val_seconds=100, test_seconds=100)
+  assert len(folds) == 5
+  for fold in folds:
+    assert fold["train"][1] == fold["val"][0] and fold["val"][1] == fold["test"][0]
+    assert times[fold["train"][1] - 1] < fold["test_start"] <= times[fold["test"][0]]
+
+  results = run_walk_forward(X, y, folds=folds, n_jobs=2)
+  assert list(results.index) == list(range(5))
+  assert results["f1"].min() > 0.3
+  assert np.allclose(results["test_start"].diff().dropna(), 100)
+
+  stability = threshold_stability(results)
+  assert stability["folds"] == 5
+  assert 0 < stability["threshold_min"] <= stability["threshold_max"] < 1
+  assert stability["folds_evaluated"] == 5 and stability["f1_mean"] > 0.3
+
+  # Folds without positives have no threshold or no test metrics
+  unlabeled = pd.DataFrame({"threshold": [0.4, np.nan, 0.6]})
+  stability = threshold_stability(unlabeled)
+  assert stability["folds_thresholded"] == 2 and stability["folds_evaluated"] == 0
+  assert stability["threshold_mean"] == pytest.approx(0.5) and stability["f1_mean"] is None
+  with pytest.raises(ValueError, match="No fold has a threshold"):
+    threshold_stability(pd.DataFrame({"threshold": [np.nan, np.nan]}))
+
+
+def test_half_space_trees_scores_outliers():
+  """
+  Test that off-distribution rows score high and that live windows replace the reference.
+  """
+  rng = np.random.default_rng(5)
+  X = pd.DataFrame(rng.normal(size=(20000, 4)), columns=["Time", "V1", "V2", "Amount"])
+  y = np.zeros(len(X), dtype=int)
+  y[:100] = 1
+  X.loc[:99, ["V1", "V2"]] += 8
+
+  detector = HalfSpaceTrees(n_trees=20, depth=8, window_size=1000, random_state=0).fit(X, y)
+  assert detector.features_ == ["V1", "V2", "Amount"]
+
+  scores = detector.score(X)
+  assert np.median(scores[:100]) > 0.99
+  assert 0.3 < np.median(scores[100:]) < 0.7
+
+  shifted = X.iloc[100:2600].copy()
+  shifted[["V1", "V2"]] += 8
+  learned = detector.score_partial_fit(shifted, learn=np.arange(len(shifted)) < 2000)
+  assert detector.metrics()["windows_completed"] == 2
+  assert detector.metrics()["latest_window_rows"] == 0
+  # After two windows of the new regime it is no longer anomalous
+  assert np.median(detector.score(shifted)) < np.median(learned)
+
+
+def test_training_benchmark_flags_regressions(tmp_path):
+  """
+  Test that every requested stage is timed per size and thread count and regressions are flagged.
+  """
+  report = run_benchmark(
+    sizes=[1000, 2000],
+    threads=[1],
+    stages=("split", "scale", "undersample", "fit", "threshold_sweep"),
+    models=["logistic_regression", "decision_tree"],
+  )
+  stages = [(r["stage"], r["rows"]) for r in report["results"]]
+  assert ("fit:decision_tree", 2000) in stages and ("threshold_sweep:logistic_regression", 1000) in stages
+  assert len(stages) == 2 * 7
+  assert all(r["seconds"] > 0 and r["peak_mb"] >= 0 for r in report["results"])
+
+  path = save_report(report, tmp_path / "baseline.json")
+  baseline = json.loads(path.read_text())
+  assert compare_with_baseline(report, baseline) == []
+
+  # A stage that used to be 10x faster is a regression; tiny absolute changes are not
+  for r in baseline["results"]:
+    r["seconds"] /= 10
+  regressions = compare_with_baseline(report, baseline, min_seconds=0.0)
+  assert {r["metric"] for r in regressions} == {"seconds"}
+  assert len(regressions) == len(report["results"])
+  assert compare_with_baseline(report, baseline, min_seconds=60.0) == []
+
+  with pytest.raises(ValueError):
+    run_benchmark(sizes=[1000], models=["svm"])
+
+
+def test_benchmark_times_without_tracing():
+  """
+  Test that timed runs are untraced and peak memory comes from one extra traced run.
+  """
+  traced = []
+
+  def allocate():
+    traced.append(tracemalloc.is_tracing())
+    return np.ones(2 ** 20)
+
+  result, stats = measure(allocate, repeat=3)
+  assert traced == [False, False, False, True]
+  assert len(result) == 2 ** 20 and stats["seconds"] > 0
+  assert stats["peak_mb"] >= 8
+
+
+def test_backfill_writes_resumable_diff(tmp_path):
+  """
+  Test that a backfill rescores only the range, writes changed decisions and resumes from its checkpoint.
+  """
+  rng = np.random.default_rng(3)
+  X = pd.DataFrame(rng.normal(loc=3, scale=5, size=(800, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+  y = (X["V1"] + rng.normal(scale=2.5, size=800) > 8).astype(int)
+  # Like the deployed artifact: no bundled scaler, the standalone one is applied
+  scaler = StandardScaler().fit(X.to_numpy())
+  model = LogisticRegression().fit(scaler.transform(X.to_numpy()), y)
+  joblib.dump({"model": model, "threshold": 0.3, "model_version": 2}, tmp_path / "new.joblib")
+  joblib.dump(scaler, tmp_path / "scaler.joblib")
+  backfill = functools.partial(run_backfill, scaler_path=tmp_path / "scaler.joblib")
+
+  # Audit-log-like history: decisions of the previous model at threshold 0.6
+  proba = model.predict_proba(scaler.transform(X.to_numpy()))[:, 1]
+  log = X.assign(
+    timestamp=np.arange(800, dtype=float),
+    transaction_id=[f"tx-{i}" for i in range(800)],
+    fraud_probability=proba,
+    is_fraud=proba >= 0.6,
+    model_version=np.where(np.arange(800) >= 700, "2", "1"),
+    path="full",
+  )
+  # Rule and degraded fast-path decisions are not the model's to compare with
+  log.loc[100:119, ["fraud_probability", "is_fraud", "path"]] = [1.0, True, "rules"]
+  log.loc[120:129, ["is_fraud", "path"]] = [True, "degraded"]
+  source = tmp_path / "audit"
+  source.mkdir()
+  for i in range(2):
+    log.iloc[i * 400:(i + 1) * 400].to_parquet(source / f"audit-{i}.parquet", row_group_size=100)
+
+  assert len(plan_chunks(source, 100, 600)) == 5
+  summary = backfill(source, tmp_path / "new.joblib", tmp_path / "out", start=100, end=750, n_jobs=2)
+
+  in_range = log.iloc[130:700]
+  expected = in_range[(in_range["fraud_probability"] >= 0.3) & ~in_range["is_fraud"]]
+  diff = pd.read_parquet(tmp_path / "out" / "diff")
+  assert sorted(diff["transaction_id"]) == sorted(expected["transaction_id"])
+  assert set(diff["change"]) == {"flagged"}
+  assert summary["rows_scored"] == 570 and summary["rows_skipped"] == 50 and summary["rows_excluded"] == 30
+  assert summary["newly_flagged"] == len(expected) and summary["unflagged"] == 0
+  assert summary["alert_volume_change"] == len(expected)
+
+  # A rerun resumes every chunk; a lost checkpoint line rescores only that chunk
+  assert backfill(source, tmp_path / "new.joblib", tmp_path / "out", start=100, end=750, n_jobs=2)["chunks_resumed"] == 7
+  checkpoint = tmp_path / "out" / "checkpoint.jsonl"
+  checkpoint.write_text("".join(checkpoint.read_text().splitlines(keepends=True)[1:]))
+  again = backfill(source, tmp_path / "new.joblib", tmp_path / "out", start=100, end=750, n_jobs=2)
+  assert again["chunks_resumed"] == 6 and again["newly_flagged"] == summary["newly_flagged"]
+  assert len(pd.read_parquet(tmp_path / "out" / "diff")) == len(diff)
+
+  with pytest.raises(ValueError):
+    backfill(source, tmp_path / "new.joblib", tmp_path / "out", start=0, end=750)
@@ -0,0 +1,258 @@
+import os
+
+import joblib
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (
+    accuracy_score,
+    confusion_matrix,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+from sklearn.preprocessing import StandardScaler
+
+from src.api.schemas import FEATURE_COLUMNS
+from src.monitoring.audit import AuditLogWriter, read_audit_log
+from src.monitoring.drift import (
+    DriftMonitor,
+    fit_drift_reference,
+    load_drift_reference,
+    save_drift_reference,
+    write_drift_reference,
+)
+from src.monitoring.cases import CaseStore
+from src.monitoring.feedback import FeedbackStore
+from src.utils.metrics import ClassificationAccumulator, compute_classification_metrics
+
+
+@pytest.fixture
+def training_frame():
+    """Create a synthetic training feature matrix."""
+    rng = np.random.default_rng(7)
+    return pd.DataFrame(rng.normal(size=(5000, 3)), columns=["Time", "V1", "Amount"])
+
+
+def test_drift_reference_roundtrip(tmp_path, training_frame):
+    """Test that a saved reference loads back unchanged."""
+    reference = fit_drift_reference(training_frame, features=["V1", "Amount"])
+    path = tmp_path / "drift_reference.npz"
+    save_drift_reference(reference, path)
+    loaded = load_drift_reference(path)
+
+    assert loaded["features"] == ["V1", "Amount", "fraud_probability"]
+    np.testing.assert_array_equal(loaded["edges"], reference["edges"])
+    np.testing.assert_allclose(loaded["proportions"].sum(axis=1), 1.0)
+
+
+def test_write_drift_reference_scores_like_the_api(tmp_path):
+    """Test that the written reference bins the scores of the artifact, scaled as in the API."""
+    rng = np.random.default_rng(9)
+    X = pd.DataFrame(rng.normal(loc=2, scale=3, size=(2000, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X["V1"] > 3).astype(int)
+    scaler = StandardScaler().fit(X.to_numpy())
+    model = LogisticRegression().fit(scaler.transform(X.to_numpy()), y)
+    joblib.dump({"model": model, "threshold": 0.5}, tmp_path / "model.joblib")
+    joblib.dump(scaler, tmp_path / "scaler.joblib")
+
+    output = tmp_path / "models" / "drift_reference.npz"
+    write_drift_reference(X, output, tmp_path / "model.joblib", tmp_path / "scaler.joblib")
+    expected = fit_drift_reference(X, model.predict_proba(scaler.transform(X.to_numpy()))[:, 1])
+    loaded = load_drift_reference(output)
+    assert loaded["features"] == expected["features"]
+    np.testing.assert_allclose(loaded["edges"], expected["edges"])
+    np.testing.assert_allclose(loaded["proportions"], expected["proportions"])
+
+
+def test_drift_monitor_detects_shift(training_frame):
+    """Test that PSI and KS stay low for the training distribution and flag a shift."""
+    rng = np.random.default_rng(8)
+    scores = rng.random(len(training_frame))
+    reference = fit_drift_reference(training_frame, scores, features=["V1", "Amount"])
+    columns = list(training_frame.columns)
+
+    stable = DriftMonitor(reference, columns)
+    stable.observe(training_frame.to_numpy(), scores)
+    report = stable.compute()
+    assert report["n_observed"] == len(training_frame)
+    assert report["drifted"] == []
+
+    shifted = DriftMonitor(reference, columns)
+    live = training_frame.to_numpy().copy()
+    live[:, columns.index("Amount")] += 2.0
+    for chunk, chunk_scores in zip(np.array_split(live, 50), np.array_split(scores, 50)):
+        shifted.observe(chunk, chunk_scores)
+    report = shifted.compute()
+
+    assert report["drifted"] == ["Amount"]
+    assert report["features"]["Amount"]["ks"] > 0.5
+    assert report["features"]["V1"]["psi"] < 0.01
+
+
+def test_audit_log_rotation_and_backpressure(tmp_path, training_frame):
+    """Test that buffered decisions land in rotated parquet files, and overflow is counted."""
+    X = training_frame.to_numpy()
+    probs = np.linspace(0, 1, len(X))
+    writer = AuditLogWriter(
+        tmp_path, training_frame.columns, buffer_rows=1000, max_pending_buffers=2, max_file_rows=2000
+    )
+
+    # Writer not started: two buffers queue up, one fills, the rest is dropped
+    dropped = writer.record(X, probs, probs >= 0.5, 0.5, "v1", latency_ms=1.5)
+    assert dropped == 2000
+    assert writer.metrics()["dropped"] == 2000
+
+    writer.start()
+    ids = np.array([f"tx-{i}" for i in range(10)], dtype=object)
+    writer.record(X[:10], probs[:10], probs[:10] >= 0.5, 0.5, "v2", latency_ms=0.5, path="degraded", transaction_ids=ids)
+    writer.stop()
+
+    assert len(list(tmp_path.glob("*.parquet"))) == 2
+    log = read_audit_log(tmp_path)
+    assert len(log) == writer.written == 3010
+    np.testing.assert_allclose(log["V1"].to_numpy()[:3000], X[:3000, 1])
+    assert log["is_fraud"].to_numpy()[:3000].tolist() == (probs[:3000] >= 0.5).tolist()
+    assert (log["path"] == "degraded").sum() == 10
+    assert log["transaction_id"].isna().sum() == 3000
+    assert log["transaction_id"].dropna().tolist() == ids.tolist()
+
+    recent = read_audit_log(tmp_path, columns=["model_version"], start=log["timestamp"].max())
+    assert set(recent["model_version"]) == {"v2"}
+
+
+def test_feedback_joins_late_labels(tmp_path):
+    """Test label joins in both arrival orders, relabeling and rolling windows."""
+    rng = np.random.default_rng(11)
+    n = 400
+    labels = (rng.random(n) < 0.2).astype(int)
+    probs = np.clip(labels * 0.4 + rng.random(n) * 0.6, 0, 1)
+    flags = probs >= 0.5
+    ids = [f"tx-{i}" for i in range(n)]
+
+    store = FeedbackStore(tmp_path / "feedback.sqlite", bucket_seconds=100)
+    # Labels for the first rows arrive before their predictions are written
+    store.ingest_labels(ids[:50], labels[:50])
+    store.record_predictions(ids[:200], probs[:200], flags[:200], "v1", timestamp=1000.0)
+    store.record_predictions(
+        ids[200:] + [None], np.append(probs[200:], 0.1), np.append(flags[200:], False), "v1", timestamp=1150.0
+    )
+    assert store.flush() == n
+    result = store.ingest_labels(ids[50:], labels[50:])
+    assert result == {"ingested": n - 50, "matched": n - 50}
+
+    metrics = store.rolling_metrics(window_seconds=1000, now=1200.0)
+    expected = compute_classification_metrics(labels, flags, probs)
+    assert metrics["count"] == n and metrics["buckets"] == 2
+    for key in ("precision", "recall", "f1", "accuracy"):
+        assert metrics[key] == pytest.approx(expected[key])
+    assert metrics["roc_auc"] == pytest.approx(expected["roc_auc"], abs=1e-3)
+    assert metrics["confusion_matrix"] == expected["confusion_matrix"].tolist()
+
+    # A relabeled transaction moves between cells instead of being counted twice
+    store.ingest_labels([ids[0]], [1 - labels[0]])
+    assert store.rolling_metrics(1000, now=1200.0)["count"] == n
+    assert store.rolling_metrics(window_seconds=50, now=1200.0)["count"] == n - 200
+
+    # Bucket accumulators merge to the full-batch result
+    halves = ClassificationAccumulator().update(labels[:200], flags[:200], probs[:200])
+    halves.merge(ClassificationAccumulator().update(labels[200:], flags[200:], probs[200:]))
+    assert halves.compute()["f1"] == pytest.approx(expected["f1"])
+
+    # Retention prunes the oldest bucket; the writer thread applies it on start
+    assert store.prune_expired(now=1200.0) == 0
+    store.retention_seconds = 500
+    assert store.prune_expired(now=1600.0) == 200
+    assert store.rolling_metrics(window_seconds=1000, now=1200.0)["count"] == n - 200
+    store.retention_seconds = 100
+    store.start()
+    store.stop()
+    assert store.metrics()["pruned"] == n
+
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_stores_record_from_forked_workers(tmp_path):
+    """Test that stores built before a fork hold no connection and every worker writes through its own."""
+    feedback = FeedbackStore(tmp_path / "feedback.sqlite", flush_seconds=0.05)
+    cases = CaseStore(tmp_path / "cases.sqlite", ["Time", "V1", "Amount"], flush_seconds=0.05)
+    assert feedback._connection is None and cases._connection is None
+
+    pids = []
+    for worker in range(2):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                feedback.start()
+                cases.start()
+                ids = [f"w{worker}-{i}" for i in range(100)]
+                probs = np.full(100, 0.9)
+                feedback.record_predictions(ids, probs, probs >= 0.5, "v1", timestamp=1000.0)
+                cases.record(np.ones((100, 3)), probs, probs >= 0.5, "v1", transaction_ids=ids)
+                feedback.stop()
+                cases.stop()
+                code = 0 if feedback.metrics()["recorded"] == cases.metrics()["recorded"] == 100 else 1
+            finally:
+                os._exit(code)
+        pids.append(pid)
+    assert [os.waitpid(pid, 0)[1] for pid in pids] == [0, 0]
+
+    assert feedback.ingest_labels(["w0-0", "w1-99"], [1, 0]) == {"ingested": 2, "matched": 2}
+    assert feedback.rolling_metrics(window_seconds=1000, now=1500.0)["count"] == 2
+    assert cases.counts()["open"] == 200
+
+def test_classification_metrics_match_sklearn():
+    """Test the confusion-matrix metrics against sklearn, including undefined ratios."""
+    rng = np.random.default_rng(5)
+    y_true = (rng.random(2000) < 0.05).astype(int)
+    y_proba = np.clip(0.6 * y_true + rng.normal(0.2, 0.2, 2000), 0, 1)
+    for threshold in (0.3, 0.5, 1.1):
+        y_pred = (y_proba >= threshold).astype(int)
+        metrics = compute_classification_metrics(y_true, y_pred, y_proba)
+        assert metrics["accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+        assert metrics["precision"] == pytest.approx(precision_score(y_true, y_pred, zero_division=0))
+        assert metrics["recall"] == pytest.approx(recall_score(y_true, y_pred, zero_division=0))
+        assert metrics["f1"] == pytest.approx(f1_score(y_true, y_pred, zero_division=0))
+        assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y_true, y_proba))
+        np.testing.assert_array_equal(metrics["confusion_matrix"], confusion_matrix(y_true, y_pred))
+
+
+def test_case_store_pages_and_updates(tmp_path):
+    """Test that flagged rows become cases, keyset pages cover the queue once and updates move counts."""
+    rng = np.random.default_rng(5)
+    columns = ["Time", "V1", "Amount"]
+    raw = rng.normal(size=(300, 3))
+    probs = rng.random(300)
+    flags = probs >= 0.5
+    ids = [f"tx-{i}" for i in range(300)]
+
+    store = CaseStore(tmp_path / "cases.sqlite", columns)
+    store.record(raw, probs, flags, "v1", transaction_ids=ids, timestamp=1000.0)
+    assert store.flush() == flags.sum()
+    assert store.counts()["open"] == flags.sum()
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(status="open", sort="fraud_probability", limit=17, cursor=cursor)
+        seen.extend(page["cases"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [case["transaction_id"] for case in seen] == [ids[i] for i in np.argsort(-probs, kind="stable") if flags[i]]
+    assert store.query(sort="amount", descending=False, limit=1)["cases"][0]["amount"] == raw[flags, 2].min()
+
+    top = seen[0]["case_id"]
+    case = store.get(top)
+    assert case["features"]["Amount"] == seen[0]["amount"]
+    assert store.update_status([top, 10_000], "confirmed_fraud", assignee="analyst") == 1
+    assert store.get(top)["status"] == "confirmed_fraud" and store.get(top)["assignee"] == "analyst"
+    assert store.counts()["open"] == flags.sum() - 1 and store.counts()["confirmed_fraud"] == 1
+    assert top not in [c["case_id"] for c in store.query(status="open", limit=1000)["cases"]]
+
+    with pytest.raises(ValueError):
+        store.update_status([top], "lost")
+    with pytest.raises(KeyError):
+        store.get(10_000)